@@ -0,0 +1,76 @@
+"""Measures the wall time of the commands of `main.py` that do not plot, each
+run in a fresh interpreter, and checks that they do not import matplotlib.
+
+Usage: python benchmarks/cli_startup.py path/to/file.las [repeat] [template.json]
+
+The `vertices` command is only measured if a template is given. Use a JSON
+template, since YAML ones import yaml.
+"""
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Runs a command and reports the heavy modules it imported
+_SCRIPT = """
+import sys
+sys.path.insert(0, {root!r})
+import main
+main.main({argv!r})
+heavy = [m for m in ("matplotlib", "yaml", "logplot") if m in sys.modules]
+print("HEAVY:" + ",".join(heavy), file=sys.stderr)
+"""
+
+
+def run(argv):
+    script = _SCRIPT.format(root=ROOT, argv=argv)
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    )
+    elapsed = time.perf_counter() - start
+    heavy = result.stderr.strip().splitlines()[-1][len("HEAVY:") :]
+    return elapsed, heavy
+
+
+def main():
+    lasfile = sys.argv[1]
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    template = sys.argv[3] if len(sys.argv) > 3 else None
+
+    directory = tempfile.mkdtemp()
+    commands = {
+        "inspect": ["inspect", lasfile],
+        "inspect --json": ["inspect", "--json", lasfile],
+        "validate": ["validate", "--workers", "1", lasfile],
+    }
+    if template is not None:
+        commands["vertices"] = ["vertices", lasfile, template, directory]
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    baseline = time.perf_counter() - start
+    print(f"{'python -c pass':<16} {baseline:.3f} s")
+
+    try:
+        for name, argv in commands.items():
+            times = []
+            for _ in range(repeat):
+                elapsed, heavy = run(argv)
+                times.append(elapsed)
+            print(
+                f"{name:<16} {statistics.median(times):.3f} s"
+                f"  heavy imports: {heavy or 'none'}"
+            )
+            assert "matplotlib" not in heavy.split(","), f"{name} imports matplotlib"
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Repairs small LAS files with known defects using `las_validation.validate`,
+checks the repaired copies and reports the time of each repair.
+
+Usage: python benchmarks/las_repair.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np  # noqa: E402
+
+import las2  # noqa: E402
+import las_validation  # noqa: E402
+
+_HEADER = """~V
+VERS. 2.0 :
+WRAP. NO :
+~W
+STRT.M {start} :
+STOP.M {stop} :
+STEP.M {step} :
+NULL. -999.25 :
+~C
+DEPT.M :
+GR.API :
+~A
+"""
+
+# Each case is (name, STRT, STOP, STEP, rows, expected depths, expected GR)
+_CASES = [
+    (
+        "null_depth",
+        100.0,
+        101.0,
+        0.5,
+        ["100.0 10", "-999.25 15", "100.5 20", "101.0 30"],
+        [100.0, 100.5, 101.0],
+        [10.0, 20.0, 30.0],
+    ),
+    (
+        "null_variant",
+        100.0,
+        101.0,
+        0.5,
+        ["100.0 10", "100.5 -9999", "101.0 30"],
+        [100.0, 100.5, 101.0],
+        [10.0, np.nan, 30.0],
+    ),
+    (
+        "unsorted_repeated",
+        100.0,
+        101.0,
+        0.5,
+        ["100.0 10", "101.0 30", "100.5 20", "100.5 25"],
+        [100.0, 100.5, 101.0],
+        [10.0, 20.0, 30.0],
+    ),
+]
+
+
+def check(directory, name, start, stop, step, rows, depth, gr):
+    path = os.path.join(directory, f"{name}.las")
+    with open(path, "w") as f:
+        f.write(_HEADER.format(start=start, stop=stop, step=step))
+        f.write("\n".join(rows) + "\n")
+
+    repaired = os.path.join(directory, "repaired", f"{name}.las")
+    start_time = time.perf_counter()
+    report = las_validation.validate(path, repair=repaired)
+    elapsed = time.perf_counter() - start_time
+
+    lasfile = las2.read(repaired)
+    np.testing.assert_allclose(lasfile["data"][0], depth)
+    np.testing.assert_allclose(lasfile["data"][1], gr)
+    well = {
+        line["mnemonic"]: float(line["value"])
+        for line in lasfile["well"]
+        if line["mnemonic"] in ("STRT", "STOP", "STEP")
+    }
+    assert well == {"STRT": depth[0], "STOP": depth[-1], "STEP": step}, (
+        f"{name}: wrong header {well}"
+    )
+
+    codes = sorted({issue["code"] for issue in report["issues"]})
+    print(f"{name:<20} {elapsed * 1000:>8.2f} ms  issues: {', '.join(codes)}")
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        for case in _CASES:
+            check(directory, *case)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
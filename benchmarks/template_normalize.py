@@ -0,0 +1,82 @@
+"""Compares `logplot_template.normalize` with the multi-walk pipeline it
+replaces on large synthetic templates (e.g. multi-well correlation panels).
+
+Usage: python benchmarks/template_normalize.py [n_tracks ...]
+"""
+import copy
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import logplot_template  # noqa: E402
+
+
+def multiwalk(template):
+    template = logplot_template.expand_keys(template)
+    template = logplot_template.apply_defaults(template)
+    template = logplot_template.apply_legends(
+        template, logplot_template._DEFAULT_LEGEND_TYPES
+    )
+    template = logplot_template.apply_data_sources(
+        template, logplot_template._DEFAULT_DATA_SOURCES
+    )
+    references = logplot_template.get_references(template)
+    return logplot_template.apply_references(template, references)
+
+
+def make_template(n_tracks, n_layers=4):
+    tracks = []
+    for i in range(n_tracks):
+        layers = []
+        for j in range(n_layers):
+            layer = {
+                "type": "line",
+                "data.x.mnemonic": f"CURVE{j}",
+                "data.x.well.name": f"WELL-{i // 5}",
+                "limits.x": [0.0, 150.0],
+            }
+            if i == 0:
+                layer["line"] = {"id": f"style{j}", "color": "#4daf4a", "width": 1.0}
+            else:
+                layer["line"] = {"reference": f"style{j}"}
+            layers.append(layer)
+        tracks.append({"width": 2, "layers": layers})
+
+    return {
+        "schema": "appy-logplot-template-intermediate",
+        "figure": {"size": [1200, 900], "dpi": 100},
+        "defaults": {
+            "tracks.facecolor": "#ffffff",
+            "tracks.grid.x": {"type": "linear", "numticks": 6, "line.color": "#e0e0e0"},
+            "tracks.grid.y": {"type": "auto", "line.color": "#e0e0e0"},
+            "layers.data.y.mnemonic": "DEPTH",
+            "layers.position": [0.0, 1.0],
+        },
+        "tracks": tracks,
+    }
+
+
+def main(sizes):
+    print(f"{'tracks':>8} {'multi-walk (ms)':>16} {'normalize (ms)':>15} {'speedup':>8}")
+    for n_tracks in sizes:
+        template = make_template(n_tracks)
+        assert multiwalk(copy.deepcopy(template)) == logplot_template.normalize(
+            copy.deepcopy(template)
+        )
+
+        results = []
+        for function in (multiwalk, logplot_template.normalize):
+            templates = [copy.deepcopy(template) for _ in range(5)]
+            t = min(timeit.repeat(lambda: function(templates.pop()), number=1, repeat=5))
+            results.append(t * 1000.0)
+
+        print(
+            f"{n_tracks:>8} {results[0]:>16.2f} {results[1]:>15.2f}"
+            f" {results[0] / results[1]:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10, 100, 500, 1000])
@@ -0,0 +1,68 @@
+"""Compares `render_cache.render_cached`, cold and warm, with a plain render
+of the same depth window, and checks that the composited image is the same.
+
+Usage: python benchmarks/track_cache.py path/to/file.las template.appy [top bottom]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np  # noqa: E402
+
+import las2  # noqa: E402
+import render_cache  # noqa: E402
+from data_provider import DataProvider  # noqa: E402
+from logplot import LogPlot  # noqa: E402
+from logplot_template import load  # noqa: E402
+from tiling import get_depth_extent  # noqa: E402
+
+_TOLERANCE = 8
+
+
+def render_uncached(dataprovider, template, top, bottom):
+    logplot = LogPlot(dataprovider, template)
+    prepared = logplot.prepare()
+    if top is None or bottom is None:
+        data_top, data_bottom = get_depth_extent(prepared)
+        top = data_top if top is None else top
+        bottom = data_bottom if bottom is None else bottom
+    prepared = logplot.window(prepared, top, bottom)
+    return render_cache._render_rgba(dataprovider, template, prepared, (top, bottom))
+
+
+def main(lasfile, templatefile, top=None, bottom=None):
+    dataprovider = DataProvider(las2.read(lasfile))
+    template = load(templatefile)
+    directory = tempfile.mkdtemp()
+    try:
+        cache = render_cache.TrackRenderCache(directory)
+
+        start = time.perf_counter()
+        expected = render_uncached(dataprovider, template, top, bottom)
+        print(f"{'uncached':>8} {time.perf_counter() - start:>8.3f} s")
+
+        for name in ("cold", "warm"):
+            start = time.perf_counter()
+            image = render_cache.render_cached(
+                dataprovider, template, cache, top=top, bottom=bottom
+            )
+            print(f"{name:>8} {time.perf_counter() - start:>8.3f} s")
+
+            # Agg blends overlapping anti-aliased edges with 8-bit arithmetic,
+            # so a few pixels where tracks meet may be off by some levels
+            diff = np.abs(image.astype(int) - expected.astype(int)).max(axis=-1)
+            assert (diff <= _TOLERANCE).all(), (
+                f"{name}: {(diff > _TOLERANCE).sum()} pixels differ from the"
+                " uncached render"
+            )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(*args[:2], *[float(a) for a in args[2:4]])
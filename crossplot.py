@@ -0,0 +1,225 @@
+import numpy as np
+
+from logplot_template import expand_keys
+
+
+def _get_edges(limits, bins, scale):
+    if scale == "log":
+        return np.geomspace(limits[0], limits[1], bins + 1)
+    elif scale == "linear":
+        return np.linspace(limits[0], limits[1], bins + 1)
+    raise ValueError(f"Unknown scale: {scale}")
+
+
+def _get_bin(edges, values):
+    # Same bins as np.histogram2d: right edge included in the last bin, values
+    # outside the edges get -1
+    i = np.searchsorted(edges, values, side="right") - 1
+    i[values == edges[-1]] = len(edges) - 2
+    i[(values < edges[0]) | (values > edges[-1])] = -1
+    return i
+
+
+class Crossplot:
+    """Density crossplot of two curves, accumulated over any number of wells.
+
+    The samples are counted in a fixed grid of bins with `np.histogram2d`, so
+    only the bin counts are kept in memory, whatever the number of samples.
+    Optionally, a third curve is averaged in each bin.
+
+    Parameters
+    ----------
+    xlim, ylim : list of float
+        The [min, max] of each curve. Samples outside are not counted.
+    bins : int or list of int, optional
+        Number of bins along each axis. Default is 100.
+    xscale, yscale : string, optional
+        'linear' or 'log' spacing of the bins. Default is 'linear'.
+    z : bool, optional
+        Whether the mean of a third curve is computed in each bin.
+
+    Examples
+    --------
+    >>> cp = Crossplot.from_template({
+    ...     "data.x.mnemonic": "NPHI",
+    ...     "data.y.mnemonic": "RHOB",
+    ...     "data.z.mnemonic": "GR",
+    ...     "limits.x": [-0.15, 0.45],
+    ...     "limits.y": [1.95, 2.95],
+    ... })
+    >>> for path in paths:
+    ...     cp.add_dataprovider(DataProvider(las2.read(path)))
+    >>> cp.draw(ax, color="mean")
+    """
+
+    def __init__(self, xlim, ylim, bins=100, xscale="linear", yscale="linear", z=False):
+        if np.isscalar(bins):
+            bins = [bins, bins]
+        self.xedges = _get_edges(xlim, bins[0], xscale)
+        self.yedges = _get_edges(ylim, bins[1], yscale)
+        self.xscale = xscale
+        self.yscale = yscale
+        self.data = None
+        self.counts = np.zeros((bins[0], bins[1]))
+        if z:
+            self.zsums = np.zeros((bins[0], bins[1]))
+            self.zcounts = np.zeros((bins[0], bins[1]))
+        else:
+            self.zsums = None
+            self.zcounts = None
+
+    @classmethod
+    def from_template(cls, template):
+        """Creates a crossplot from a mapping with the same keys as a log plot
+        layer: 'data' (the DataProvider query, with 'x', 'y' and optionally
+        'z'), 'limits' ('x' and 'y'), 'bins' and 'scale' ('x' and 'y')."""
+        template = expand_keys(template)
+        scale = template.get("scale", {})
+        crossplot = cls(
+            template["limits"]["x"],
+            template["limits"]["y"],
+            template.get("bins", 100),
+            scale.get("x", "linear"),
+            scale.get("y", "linear"),
+            "z" in template["data"],
+        )
+        crossplot.data = dict(template["data"])
+        crossplot.data.setdefault("source", "well_log")
+        return crossplot
+
+    @property
+    def shape(self):
+        return self.counts.shape
+
+    def add(self, x, y, z=None):
+        """Counts the samples of a well.
+
+        Parameters
+        ----------
+        x, y : numpy.ndarray
+            Values of the two curves. Samples where either is NaN are ignored.
+        z : numpy.ndarray, optional
+            Values of the curve averaged in each bin. Required if the
+            crossplot was created with `z`.
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        valid = ~(np.isnan(x) | np.isnan(y))
+        x = x[valid]
+        y = y[valid]
+
+        counts, _, _ = np.histogram2d(x, y, bins=[self.xedges, self.yedges])
+        self.counts += counts
+
+        if self.zsums is None:
+            return
+        if z is None:
+            msg = "This crossplot needs the values of the z curve"
+            raise ValueError(msg)
+
+        z = np.asarray(z, dtype=float)[valid]
+        i = _get_bin(self.xedges, x)
+        j = _get_bin(self.yedges, y)
+        inside = (i >= 0) & (j >= 0) & ~np.isnan(z)
+        flat = i[inside] * self.shape[1] + j[inside]
+        size = self.counts.size
+        self.zsums += np.bincount(flat, weights=z[inside], minlength=size).reshape(
+            self.shape
+        )
+        self.zcounts += np.bincount(flat, minlength=size).reshape(self.shape)
+
+    def add_dataprovider(self, dataprovider, data=None):
+        """Counts the samples of a well given by a `DataProvider`, possibly
+        restricted to a depth window.
+
+        Parameters
+        ----------
+        dataprovider : DataProvider
+            The data of the well.
+        data : dict, optional
+            The query, with the 'x', 'y' and optionally 'z' curves. Defaults
+            to the one of the template given to `from_template`.
+        """
+        if data is None:
+            data = self.data
+        d = dataprovider.get_data(data)
+        z = d["z"]["data"] if "z" in d else None
+        self.add(d["x"]["data"], d["y"]["data"], z)
+
+    def merge(self, other):
+        """Adds the counts of another crossplot with the same bins, e.g. one
+        computed in another process."""
+        if not (
+            np.array_equal(self.xedges, other.xedges)
+            and np.array_equal(self.yedges, other.yedges)
+        ):
+            msg = "Cannot merge crossplots with different bins"
+            raise ValueError(msg)
+        self.counts += other.counts
+        if self.zsums is not None and other.zsums is not None:
+            self.zsums += other.zsums
+            self.zcounts += other.zcounts
+
+    @property
+    def mean(self):
+        """Mean of the z curve in each bin, NaN where there is no sample."""
+        if self.zsums is None:
+            return None
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.zsums / self.zcounts
+
+    def get_values(self, color="count"):
+        """Returns the values that color the bins, masked where there is no
+        sample, and the norm to use: ('log', vmin, vmax) or None.
+
+        `color` is 'count' or 'mean', as in `draw`.
+        """
+        if color == "count":
+            values = self.counts
+            if self.counts.any():
+                norm = ("log", float(values[values > 0].min()), float(values.max()))
+            else:
+                norm = None
+        elif color == "mean":
+            if self.zsums is None:
+                msg = "This crossplot has no z curve"
+                raise ValueError(msg)
+            values = self.mean
+            norm = None
+        else:
+            raise ValueError(f"Unknown color: {color}")
+
+        return np.ma.masked_where(self.counts == 0, values), norm
+
+    def draw(self, ax, color="count", colormap=None):
+        """Draws the crossplot as a mesh of bins.
+
+        Parameters
+        ----------
+        ax : matplotlib.axes.Axes
+            The axes to draw on.
+        color : string, optional
+            'count' to color the bins by their number of samples, in a
+            logarithmic scale, or 'mean' to color them by the mean of the z
+            curve.
+        colormap : string, optional
+            Name of a matplotlib colormap.
+
+        Returns
+        -------
+        matplotlib.collections.QuadMesh
+        """
+        from matplotlib.colors import LogNorm
+
+        values, norm = self.get_values(color)
+        if norm is not None:
+            _, vmin, vmax = norm
+            norm = LogNorm(vmin, vmax)
+        mesh = ax.pcolormesh(
+            self.xedges, self.yedges, values.T, cmap=colormap, norm=norm
+        )
+        ax.set_xscale(self.xscale)
+        ax.set_yscale(self.yscale)
+        ax.set_xlim(self.xedges[0], self.xedges[-1])
+        ax.set_ylim(self.yedges[0], self.yedges[-1])
+        return mesh
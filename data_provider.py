@@ -1,12 +1,76 @@
 import copy
 import numpy as np
 
+from depth_index import DepthIndex
+
+
+def _is_appended(old, new):
+    # Whether `new` extends `old` in place, i.e. starts with the same memory
+    return (
+        len(new) > len(old)
+        and old.base is not None
+        and old.base is new.base
+        and old.__array_interface__["data"] == new.__array_interface__["data"]
+        and old.strides == new.strides
+    )
+
 
 # TODO: try to generalize using __getattribute__
 # TODO: caching
 class DataProvider:
-    def __init__(self, lasfile):
+    def __init__(self, lasfile, window=None, depth_index=None):
         self.lasfile = lasfile
+        self.window = window
+        self._window_slice = None
+        self._depth_index = depth_index
+        self._window_depth_index = None
+
+    def with_window(self, top, bottom):
+        """Returns a data provider for the same data that only gives the
+        samples inside the [top, bottom] depth window."""
+        return DataProvider(self.lasfile, (top, bottom), self.get_depth_index())
+
+    def ready(self):
+        """Whether the data is available without blocking."""
+        return True
+
+    def get_depth_index(self):
+        # The first curve of a LAS 2.0 file is the index (depth). The index is
+        # rebuilt if the data was replaced, or extended if rows were appended
+        # in place (e.g. by las2.TailReader).
+        depth = self.lasfile["data"][0]
+        index = self._depth_index
+        if index is not None:
+            if index.size == len(depth) and index.depth.base is depth.base:
+                return index
+            if _is_appended(index.depth, depth):
+                self._depth_index = index.extend(depth)
+                return self._depth_index
+        self._depth_index = DepthIndex.from_lasfile(self.lasfile)
+        return self._depth_index
+
+    def get_depth_range(self):
+        return self.get_depth_index().get_range()
+
+    def _get_window_slice(self):
+        if self.window is None:
+            return slice(None)
+        if self._window_slice is None:
+            # Keep one sample on each side so lines reach the window edges
+            self._window_slice = self.get_depth_index().get_slice(*self.window, pad=True)
+        return self._window_slice
+
+    def _get_window_depth_index(self):
+        # Index of the depth samples given by this provider, built once and
+        # shared by every layer that uses the depth curve
+        index = self.get_depth_index()
+        if self.window is None:
+            return index
+        cached = self._window_depth_index
+        if cached is None or cached[0] is not index:
+            cached = (index, index.take(self._get_window_slice()))
+            self._window_depth_index = cached
+        return cached[1]
 
     def _find_well_log(self, data):
         if "mnemonic" in data:
@@ -40,6 +104,31 @@ class DataProvider:
         
         return label
 
+    def _get_well_log_text(self, data):
+        return {}
+
+    def _find_array_log(self, data):
+        # Array logs (e.g. borehole images) are kept in the 'array' section,
+        # with one row of channels per sample of the depth curve
+        mnemonic = data.get("mnemonic", "")
+        for array_log in self.lasfile.get("array", []):
+            if array_log["mnemonic"] == mnemonic:
+                return array_log
+        return False
+
+    def _get_array_log_label(self, data):
+        array_log = self._find_array_log(data["x"])
+
+        if not array_log:
+            msg = f"No array logs found for query: {data}"
+            raise ValueError(msg)
+        elif array_log.get("unit", ""):
+            label = f"{array_log['mnemonic']} ({array_log['unit']})"
+        else:
+            label = array_log["mnemonic"]
+
+        return label
+
     def get_label(self, data):
         data = copy.deepcopy(data)
         source = data.pop("source", "well_log")
@@ -69,12 +158,20 @@ class DataProvider:
         return rng
 
     def get_marker(self, data):
-        print(f"DataProvider.get_marker\n{data}\n")
-        raise NotImplementedError("DataProvider.get_marker")
+        data = copy.deepcopy(data)
+        source = data.pop("source", "well_logs")
+        method = getattr(self, f"_get_{source}_marker", None)
+        if method is None:
+            raise NotImplementedError(f"DataProvider._get_{source}_marker")
+        return method(data)
 
     def get_text(self, data):
-        print(f"DataProvider.get_text\n{data}\n")
-        raise NotImplementedError("DataProvider.get_text")
+        data = copy.deepcopy(data)
+        source = data.pop("source", "well_logs")
+        method = getattr(self, f"_get_{source}_text", None)
+        if method is None:
+            raise NotImplementedError(f"DataProvider._get_{source}_text")
+        return method(data)
 
     def _get_well_log_data(self, data):
         d = {}
@@ -84,17 +181,22 @@ class DataProvider:
             if not well_log:
                 msg = f"Well log not found for query {data}"
                 raise ValueError(msg)
+            if well_log is self.lasfile["curve"][0]:
+                # The depth curve comes with its index
+                well_log = dict(well_log, index=self._get_window_depth_index())
+            if self.window is not None:
+                well_log = dict(well_log, data=well_log["data"][self._get_window_slice()])
             d[k] = well_log
 
         return d
 
     def _get_well_logs_range(self, data):
-        well_log = self._find_well_logs(data)
+        well_log = self._find_well_log(data)
         if not well_log:
             msg = f"Well log not found for query {data}"
             raise ValueError(msg)
         else:
-            npdata = well_log["data"]
+            npdata = well_log["data"][self._get_window_slice()]
             value_range = [
                 np.nanmin(npdata),
                 np.nanmax(npdata),
@@ -102,6 +204,58 @@ class DataProvider:
 
         return value_range
 
+    def _get_array_logs_range(self, data):
+        array_log = self._find_array_log(data)
+        if not array_log:
+            msg = f"Array log not found for query {data}"
+            raise ValueError(msg)
+        npdata = array_log["data"][self._get_window_slice()]
+        return [np.nanmin(npdata), np.nanmax(npdata)]
+
+    def _get_array_log_data(self, data):
+        array_log = self._find_array_log(data["x"])
+        if not array_log:
+            msg = f"Array log not found for query {data}"
+            raise ValueError(msg)
+        if self.window is not None:
+            array_log = dict(array_log, data=array_log["data"][self._get_window_slice()])
+
+        d = self._get_well_log_data({"y": data["y"]})
+        d["x"] = array_log
+        return d
+
+    def _get_marker_families_data(self, data):
+        # Markers are kept sorted by depth (see markers.from_records), so the
+        # window is found with a binary search
+        markers = self.lasfile.get("markers", None)
+        if markers is None:
+            msg = f"No markers found for query {data}"
+            raise ValueError(msg)
+
+        depth = markers["depth"]
+        if self.window is None:
+            slc = slice(None)
+        else:
+            top, bottom = sorted(self.window)
+            slc = slice(
+                np.searchsorted(depth, top, side="left"),
+                np.searchsorted(depth, bottom, side="right"),
+            )
+        d = {k: v[slc] for k, v in markers.items()}
+
+        family = data.get("family", None)
+        if family is not None:
+            mask = d["family"] == family
+            d = {k: v[mask] for k, v in d.items()}
+
+        return d
+
+    def _get_marker_families_label(self, data):
+        return data.get("family", None) or "Markers"
+
+    def _get_marker_families_text(self, data):
+        return {}
+
     # def _get_well_logs_line(self, data):
     #     if "alias" in data:
     #         alias = data["alias"]
@@ -133,3 +287,28 @@ class DataProvider:
         if method is None:
             raise NotImplementedError(f"DataProvider._get_{source}_data")
         return method(data)
+
+
+class AsyncDataProvider(DataProvider):
+    """Data provider for a LAS file that is still being loaded.
+
+    Parameters
+    ----------
+    future : concurrent.futures.Future
+        Future of the LAS file contents, as returned by `las2.read`. Accessing
+        the data blocks until it is done.
+    """
+
+    def __init__(self, future, window=None, depth_index=None):
+        self.future = future
+        self.window = window
+        self._window_slice = None
+        self._depth_index = depth_index
+        self._window_depth_index = None
+
+    @property
+    def lasfile(self):
+        return self.future.result()
+
+    def ready(self):
+        return self.future.done()
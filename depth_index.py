@@ -0,0 +1,212 @@
+import numpy as np
+
+# Tolerance, as a fraction of the step, when checking for regular sampling.
+# LAS values are usually written with a few decimals only.
+_STEP_TOLERANCE = 1e-3
+
+
+def _get_header_value(lasfile, mnemonic):
+    for line in lasfile.get("well", []):
+        if line["mnemonic"] == mnemonic:
+            try:
+                return float(line["value"])
+            except ValueError:
+                return None
+    return None
+
+
+class DepthIndex:
+    """Maps depths to sample indexes of a depth curve.
+
+    If the depth is sampled at a constant step, lookups are computed in
+    constant time from the first depth and the step. Otherwise, if the depth
+    is monotonic, they use a binary search.
+
+    Parameters
+    ----------
+    depth : numpy.ndarray
+        The depth curve, increasing or decreasing.
+    step : float, optional
+        The expected sampling step, e.g. the STEP of the LAS file. It is only
+        used if the data agrees with it. By default it is estimated from the
+        first and last depths.
+    regular : bool, optional
+        If False, the data is not checked for regular sampling.
+    """
+
+    def __init__(self, depth, step=None, regular=True):
+        self.depth = np.asarray(depth)
+        self.size = len(self.depth)
+        self.step = None
+
+        if regular and self.size >= 2:
+            if step is None:
+                step = (self.depth[-1] - self.depth[0]) / (self.size - 1)
+            if step and np.isfinite(step):
+                grid = self.depth[0] + step * np.arange(self.size)
+                if np.all(np.abs(self.depth - grid) <= _STEP_TOLERANCE * abs(step)):
+                    self.step = float(step)
+
+        if self.step is not None:
+            self.increasing = self.step > 0
+            self.monotonic = True
+        else:
+            diff = np.diff(self.depth)
+            self.increasing = bool(np.all(diff > 0))
+            self.monotonic = self.increasing or bool(np.all(diff < 0))
+
+    @classmethod
+    def from_lasfile(cls, lasfile):
+        """Builds the index of the first curve of a LAS file, using its STEP
+        when it matches the data."""
+        depth = lasfile["data"][0]
+        step = _get_header_value(lasfile, "STEP")
+        start = _get_header_value(lasfile, "STRT")
+        if step is not None and start is not None and len(depth):
+            if abs(start - depth[0]) > _STEP_TOLERANCE * abs(step or 1.0):
+                step = None
+        return cls(depth, step)
+
+    @property
+    def regular(self):
+        return self.step is not None
+
+    def __repr__(self):
+        # Deterministic, so prepared data containing an index can be hashed
+        if self.regular:
+            return (
+                f"DepthIndex(size={self.size}, start={float(self.depth[0])!r}, "
+                f"step={self.step!r})"
+            )
+        return f"DepthIndex(size={self.size}, regular=False)"
+
+    def get_range(self):
+        """Returns the [min, max] of the depth."""
+        if self.monotonic and self.size:
+            return sorted([self.depth[0], self.depth[-1]])
+        return [np.nanmin(self.depth), np.nanmax(self.depth)]
+
+    def _searchsorted(self, value, side):
+        # Same as np.searchsorted on the depth sorted in increasing order
+        n = self.size
+        if not self.regular:
+            depth = self.depth if self.increasing else self.depth[::-1]
+            return int(np.searchsorted(depth, value, side=side))
+
+        def get(k):
+            return self.depth[k] if self.increasing else self.depth[n - 1 - k]
+
+        def before(d):
+            return d < value if side == "left" else d <= value
+
+        # The grid gives the answer up to one sample, since the data is within
+        # the tolerance of it. Check the neighbours to match np.searchsorted.
+        position = (value - get(0)) / abs(self.step)
+        if not np.isfinite(position):
+            return 0 if position < 0 else n
+        i = int(min(max(np.ceil(position), 0), n))
+        while i > 0 and not before(get(i - 1)):
+            i -= 1
+        while i < n and before(get(i)):
+            i += 1
+        return i
+
+    def get_slice(self, top, bottom, pad=False):
+        """Returns the slice of the samples inside a depth window.
+
+        Parameters
+        ----------
+        top, bottom : float or None
+            The depth window, in any order. None leaves that end of the window
+            open.
+        pad : bool, optional
+            If True, the slice also covers the samples right outside the
+            window, so lines drawn from it reach the window edges.
+        """
+        if not self.monotonic:
+            msg = "The depth is not monotonic"
+            raise ValueError(msg)
+
+        n = self.size
+        if top is None:
+            top = -np.inf
+        if bottom is None:
+            bottom = np.inf
+        vmin, vmax = sorted([top, bottom])
+        if pad:
+            i0 = max(self._searchsorted(vmin, "right") - 1, 0)
+            i1 = min(self._searchsorted(vmax, "left") + 1, n)
+        else:
+            i0 = self._searchsorted(vmin, "left")
+            i1 = self._searchsorted(vmax, "right")
+        i1 = max(i0, i1)
+
+        if self.increasing:
+            return slice(i0, i1)
+        return slice(n - i1, n - i0)
+
+    @classmethod
+    def _from_monotonic(cls, depth, step, increasing):
+        # Index of a depth already known to be monotonic, and regular with
+        # this step if it is not None, without checking it again
+        index = cls.__new__(cls)
+        index.depth = depth
+        index.size = len(depth)
+        index.step = step if index.size >= 2 else None
+        index.increasing = increasing
+        index.monotonic = True
+        return index
+
+    def extend(self, depth):
+        """Returns the index of a depth that starts with the depth of this
+        index, e.g. after rows were appended. If this index is monotonic, only
+        the new samples are checked."""
+        depth = np.asarray(depth)
+        n = self.size
+        if n < 2 or not self.monotonic:
+            return DepthIndex(depth)
+
+        # The last known sample is included, so the direction is checked
+        # across the boundary
+        new = depth[n - 1 :]
+        if self.regular:
+            grid = self.depth[0] + self.step * np.arange(n - 1, len(depth))
+            if np.all(np.abs(new - grid) <= _STEP_TOLERANCE * abs(self.step)):
+                return DepthIndex._from_monotonic(depth, self.step, self.increasing)
+
+        diff = np.diff(new)
+        if np.all(diff > 0) if self.increasing else np.all(diff < 0):
+            return DepthIndex._from_monotonic(depth, None, self.increasing)
+        return DepthIndex(depth, regular=False)
+
+    def take(self, slc):
+        """Returns the index of a contiguous slice of the depth. A slice of a
+        monotonic depth is not checked again."""
+        depth = self.depth[slc]
+        if not self.monotonic:
+            return DepthIndex(depth)
+        return DepthIndex._from_monotonic(depth, self.step, self.increasing)
+
+    def interp(self, depths, values):
+        """Linear interpolation of a curve sampled on this depth, like
+        `np.interp`, with the index lookups of `get_slice`."""
+        depths = np.asarray(depths, dtype=float)
+        n = self.size
+        if n == 0:
+            return np.full(depths.shape, np.nan)
+        if n == 1:
+            return np.full(depths.shape, values[0], dtype=float)
+
+        if self.regular:
+            i = np.floor((depths - self.depth[0]) / self.step).astype(int)
+        elif self.increasing:
+            i = np.searchsorted(self.depth, depths, side="right") - 1
+        else:
+            i = n - 1 - np.searchsorted(self.depth[::-1], depths, side="left")
+        i = np.clip(i, 0, n - 2)
+
+        d0 = self.depth[i]
+        d1 = self.depth[i + 1]
+        fraction = np.clip((depths - d0) / (d1 - d0), 0.0, 1.0)
+
+        return values[i] * (1.0 - fraction) + values[i + 1] * fraction
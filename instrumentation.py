@@ -0,0 +1,195 @@
+import contextlib
+import cProfile
+import time
+import tracemalloc
+
+
+def count_points(ax):
+    """Counts the number of vertices and texts drawn on an axes."""
+    n = 0
+    for line in ax.get_lines():
+        n += len(line.get_xydata())
+    for collection in ax.collections:
+        for path in collection.get_paths():
+            n += len(path.vertices)
+    for patch in ax.patches:
+        n += len(patch.get_path().vertices)
+    n += len(ax.texts)
+    return n
+
+
+class _TimedDataProvider:
+    """Forwards every call to a data provider, accumulating the time spent on
+    its `get_*` methods into a record."""
+
+    def __init__(self, dataprovider, record):
+        self._dataprovider = dataprovider
+        self._record = record
+
+    def __getattr__(self, name):
+        attr = getattr(self._dataprovider, name)
+        if not (name.startswith("get_") and callable(attr)):
+            return attr
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                self._record["fetch"] += time.perf_counter() - start
+
+        return timed
+
+
+class Instrumentation:
+    """Collects timings, point counts and memory usage of a `LogPlot.draw`.
+
+    Parameters
+    ----------
+    memory : bool, optional
+        If True, the net memory allocated by each step is traced with
+        `tracemalloc`. This slows down the drawing considerably.
+    profile : string, optional
+        Path of a `pstats` file where a `cProfile` profile of the whole
+        `LogPlot.draw` call will be dumped.
+
+    Notes
+    -----
+    Each measured step produces a record (a dict) with the keys 'kind'
+    ('figure', 'track', 'prepare', 'layer', 'legend', 'header' or 'ylim'),
+    'track' and 'layer' (indexes in the template, or None), 'type' (the
+    registered artist type, or None), 'time' (seconds spent building it),
+    'fetch' (seconds spent on the data provider), 'points' (vertices and
+    texts on its axes), 'memory' (bytes, or None) and 'draw' (seconds spent
+    on its last canvas draw, or None).
+    """
+
+    def __init__(self, memory=False, profile=None):
+        self.memory = memory
+        self.profile = profile
+        self.profiler = None
+        self.records = []
+        self._stop_tracemalloc = False
+
+    def reset(self):
+        self.records = []
+
+    @contextlib.contextmanager
+    def session(self):
+        """Wraps a whole `LogPlot.draw` call."""
+        self.reset()
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._stop_tracemalloc = True
+        if self.profile is not None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        try:
+            yield self
+        finally:
+            if self.profiler is not None:
+                self.profiler.disable()
+                self.profiler.dump_stats(self.profile)
+            if self._stop_tracemalloc:
+                tracemalloc.stop()
+                self._stop_tracemalloc = False
+
+    @contextlib.contextmanager
+    def measure(self, kind, track=None, layer=None, type=None):
+        record = {
+            "kind": kind,
+            "track": track,
+            "layer": layer,
+            "type": type,
+            "time": 0.0,
+            "fetch": 0.0,
+            "points": 0,
+            "memory": None,
+            "draw": None,
+        }
+        self.records.append(record)
+        if self.memory:
+            memory0, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["time"] = time.perf_counter() - start
+            if self.memory:
+                memory1, _ = tracemalloc.get_traced_memory()
+                record["memory"] = memory1 - memory0
+
+    def wrap_dataprovider(self, dataprovider, record):
+        return _TimedDataProvider(dataprovider, record)
+
+    def wrap_draw(self, artist, record):
+        """Times every draw of a matplotlib artist (an axes or the figure).
+
+        Wrapping the same artist again (e.g. on a new `LogPlot.draw`) replaces
+        the previous wrapper, so only the latest record gets the times."""
+        draw = getattr(artist, "_untimed_draw", None)
+        if draw is None:
+            draw = artist._untimed_draw = artist.draw
+
+        def timed_draw(renderer, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return draw(renderer, *args, **kwargs)
+            finally:
+                record["draw"] = time.perf_counter() - start
+
+        artist.draw = timed_draw
+
+    def report(self):
+        """Aggregates the records.
+
+        Returns
+        -------
+        dict
+            A dictionary with the keys 'total' (seconds building the plot),
+            'canvas' (seconds of the last canvas draw, or None), 'kinds' and
+            'types' (totals per record kind and per layer type), 'tracks' (a
+            list with the track record of each track, with the records of its
+            layers under 'prepares' and 'layers' and of its legends under
+            'legends') and 'records' (all the records).
+        """
+        kinds = {}
+        types = {}
+        tracks = {}
+        total = 0.0
+        canvas = None
+        for record in self.records:
+            if record["kind"] == "figure":
+                total += record["time"]
+                canvas = record["draw"]
+
+            keys = [(record["kind"], kinds)]
+            if record["kind"] == "layer":
+                keys.append((record["type"], types))
+            for key, totals in keys:
+                entry = totals.setdefault(
+                    key, {"count": 0, "time": 0.0, "fetch": 0.0, "points": 0, "draw": 0.0}
+                )
+                entry["count"] += 1
+                entry["time"] += record["time"]
+                entry["fetch"] += record["fetch"]
+                entry["points"] += record["points"]
+                entry["draw"] += record["draw"] or 0.0
+
+            if record["kind"] == "track":
+                tracks[record["track"]] = dict(
+                    record, prepares=[], layers=[], legends=[]
+                )
+
+        for record in self.records:
+            if record["kind"] in ("prepare", "layer", "legend"):
+                tracks[record["track"]][record["kind"] + "s"].append(record)
+
+        return {
+            "total": total,
+            "canvas": canvas,
+            "kinds": kinds,
+            "types": types,
+            "tracks": [tracks[i] for i in sorted(tracks)],
+            "records": list(self.records),
+        }
@@ -1,6 +1,10 @@
 import re
 import numpy as np
 import io
+import bz2
+import contextlib
+import gzip
+import lzma
 
 
 class LAS2Error(Exception):
@@ -81,14 +85,167 @@ _parsers = {
     "data": _parse_data_section,
 }
 
+_compressed_formats = [
+    (b"\x1f\x8b", gzip.open),
+    (b"BZh", bz2.open),
+    (b"\xfd7zXZ\x00", lzma.open),
+]
+
+_DATA_CHUNK_SIZE = 2**22
+
+
+@contextlib.contextmanager
+def _open(lasfile):
+    # Yields the file as a binary stream, decompressed if its first bytes match
+    # one of the `_compressed_formats`. Text streams are yielded unchanged.
+    with contextlib.ExitStack() as stack:
+        if isinstance(lasfile, io.TextIOBase):
+            lasfile.seek(0)
+            yield lasfile
+            return
+
+        if isinstance(lasfile, io.IOBase):
+            f = lasfile
+            if f.seekable():
+                f.seek(0)
+        else:
+            f = stack.enter_context(open(lasfile, "rb"))
+
+        if hasattr(f, "peek"):
+            magic = f.peek(6)
+        elif f.seekable():
+            magic = f.read(6)
+            f.seek(0)
+        else:
+            # Detached on exit so the caller's stream is not closed with it
+            f = io.BufferedReader(f)
+            stack.callback(f.detach)
+            magic = f.peek(6)
+
+        for prefix, decompressor in _compressed_formats:
+            if magic.startswith(prefix):
+                f = stack.enter_context(decompressor(f))
+                break
+
+        yield f
+
+
+def _decode(line, encoding):
+    # Decodes a line read in binary mode, with "\n" as the line ending like a
+    # text mode read
+    if encoding is not None:
+        text = line.decode(encoding)
+    else:
+        try:
+            text = line.decode("utf-8")
+        except UnicodeDecodeError:
+            text = line.decode("latin-1")
+    return text.replace("\r\n", "\n")
+
+
+def _split_sections(lines):
+    # Splits the lines into sections, stopping right after the '~A' line so
+    # the data can be read from what is left of the file
+    sections = {}
+    current_section_key = ""
+    current_section = []
+
+    for line in lines:
+        if line.lstrip().startswith("#"):
+            continue
+        elif line.lstrip().startswith("~"):
+            _, section_title = line.split("~", 1)
+            sections[current_section_key] = current_section
+            current_section_key = _sections[section_title[0].upper()]
+            current_section = []
+            if current_section_key == "data":
+                break
+        else:
+            current_section.append(line)
+    sections[current_section_key] = current_section
+
+    del sections[""]
 
-def read(lasfile):
+    return sections
+
+
+def _read_data(f, previous_sections):
+    # Parses the rows of a binary stream in blocks of whole lines, without
+    # decoding them to text
+    ncols = len(previous_sections["curve"])
+    nullvalue = _get_null_value(previous_sections)
+
+    blocks = []
+    leftover = b""
+    while True:
+        chunk = f.read(_DATA_CHUNK_SIZE)
+        if not chunk:
+            block = leftover
+        else:
+            end = chunk.rfind(b"\n") + 1
+            if end == 0:
+                leftover += chunk
+                continue
+            block = leftover + chunk[:end]
+            leftover = chunk[end:]
+
+        if b"#" in block:
+            block = b"\n".join(
+                line
+                for line in block.splitlines()
+                if not line.lstrip().startswith(b"#")
+            )
+        blocks.append(np.array(block.split(), dtype=float))
+
+        if not chunk:
+            break
+
+    data = np.concatenate(blocks)
+    data[data == nullvalue] = np.nan
+    data = data.reshape((-1, ncols)).transpose()
+
+    return data
+
+
+def _read(f, encoding, data):
+    if isinstance(f, io.TextIOBase):
+        sections = _split_sections(f)
+    else:
+        sections = _split_sections(
+            _decode(line, encoding) for line in iter(f.readline, b"")
+        )
+
+    if not data:
+        sections.pop("data", None)
+
+    parsed_sections = {}
+
+    for section_key in sections:
+        parser = _parsers[section_key]
+        section = sections[section_key]
+        if section_key != "data":
+            parsed_sections[section_key] = parser(section, parsed_sections)
+        elif isinstance(f, io.TextIOBase):
+            lines = [line for line in f if not line.lstrip().startswith("#")]
+            parsed_sections[section_key] = parser(lines, parsed_sections)
+        else:
+            parsed_sections[section_key] = _read_data(f, parsed_sections)
+
+    return parsed_sections
+
+
+def read(lasfile, encoding=None):
     """Reads the contents of a LAS 2.0 file.
 
     Parameters
     ----------
     lasfile : string or file-like object
         The path of the file to read or an existing file-like object to read from.
+        Files compressed with gzip, bzip2 or xz are detected by their first bytes
+        and decompressed while they are read.
+    encoding : string, optional
+        The encoding of the header lines. By default each line is decoded as
+        UTF-8, falling back to Latin-1. Ignored for text file-like objects.
 
     Returns
     -------
@@ -103,6 +260,8 @@ def read(lasfile):
     For more information on the contents of each section, please refer to the LAS 2.0 standard [1]_.
 
     The value of the 'data' section is a numpy ndarray where each row contains the data for a well log.
+    Unless `lasfile` is a text file-like object, the data section is parsed in blocks straight from the
+    bytes of the file, without decoding it to text.
 
     The value of the 'other' section is a list of lines exactly as found on the original file.
 
@@ -137,42 +296,159 @@ def read(lasfile):
            [25.0,     26.0, ...,   75.0],
            ...]])
     """
-    sections = {}
-    current_section_key = ""
-    current_section = []
+    with _open(lasfile) as f:
+        return _read(f, encoding, data=True)
 
-    if isinstance(lasfile, io.IOBase):
-        lasfile.seek(0)
-        close_file = False
-    else:
-        lasfile = open(lasfile, "r")
-        close_file = True
 
-    for line in lasfile:
-        if line.lstrip().startswith("#"):
-            continue
-        elif line.lstrip().startswith("~"):
-            _, section_title = line.split("~", 1)
-            sections[current_section_key] = current_section
-            current_section_key = _sections[section_title[0].upper()]
-            current_section = []
-        else:
-            current_section.append(line)
-    sections[current_section_key] = current_section
+def read_header(lasfile, encoding=None):
+    """Reads the sections of a LAS 2.0 file that come before the data section.
 
-    if close_file:
-        lasfile.close()
+    The file is only read up to the '~A' line, so this is much faster than
+    `read` for large files.
 
-    del sections[""]
+    Parameters
+    ----------
+    lasfile : string or file-like object
+        The path of the file to read or an existing file-like object to read from.
+        It may be compressed, as in `read`.
+    encoding : string, optional
+        The encoding of the file, as in `read`.
 
-    parsed_sections = {}
+    Returns
+    -------
+    dict
+        The same dictionary as returned by `read`, without the 'data' section.
+    """
+    with _open(lasfile) as f:
+        return _read(f, encoding, data=False)
 
-    for section_key in sections:
-        parser = _parsers[section_key]
-        section = sections[section_key]
-        parsed_sections[section_key] = parser(section, parsed_sections)
 
-    return parsed_sections
+class TailReader:
+    """Follows a LAS 2.0 file that is still being written.
+
+    The first call to `update` reads the whole file. The following calls only
+    parse the rows appended to the '~A' section since the previous call,
+    starting at the byte offset where it stopped. Incomplete lines are left
+    for the next call, unless the file is known to be complete (see
+    `update`).
+
+    The curves are kept in a buffer that grows geometrically, so appending
+    rows does not reallocate the data on every update. `lasfile['data']` is
+    a view of the filled part of the buffer.
+
+    Parameters
+    ----------
+    path : string
+        The path of the file to follow.
+    capacity : int, optional
+        Initial number of rows of the buffer. Default is 1024.
+
+    Examples
+    --------
+    >>> reader = las2.TailReader('path/to/the/las/file')
+    >>> reader.update()
+    True
+    >>> reader.lasfile['data'].shape
+    (6, 15000)
+    """
+
+    def __init__(self, path, capacity=1024):
+        self.path = path
+        self.capacity = capacity
+        self.lasfile = None
+        self.offset = 0
+        self.size = 0
+        self._buffer = None
+        self._leftover = np.empty(0)
+        self._nullvalue = None
+
+    def _read_header(self, f, final=False):
+        lines = []
+        for line in iter(f.readline, b""):
+            if not line.endswith(b"\n") and not final:
+                return False
+            lines.append(line)
+            if line.lstrip().startswith(b"~A") or line.lstrip().startswith(b"~a"):
+                break
+        else:
+            return False
+
+        self.lasfile = read(io.BytesIO(b"".join(lines)))
+        self._nullvalue = _get_null_value(self.lasfile)
+        ncols = len(self.lasfile["curve"])
+        self._buffer = np.empty((ncols, self.capacity))
+        self._leftover = np.empty(0)
+        self.size = 0
+        self.offset = f.tell()
+        self.lasfile["data"] = self._buffer[:, :0]
+        return True
+
+    def _append(self, values):
+        ncols = self._buffer.shape[0]
+        values = np.concatenate((self._leftover, values))
+        nrows = len(values) // ncols
+        self._leftover = values[nrows * ncols :]
+        if nrows == 0:
+            return False
+
+        rows = values[: nrows * ncols].reshape((-1, ncols)).transpose()
+        rows[rows == self._nullvalue] = np.nan
+
+        if self.size + nrows > self._buffer.shape[1]:
+            capacity = max(2 * self._buffer.shape[1], self.size + nrows)
+            buffer = np.empty((ncols, capacity))
+            buffer[:, : self.size] = self._buffer[:, : self.size]
+            self._buffer = buffer
+
+        self._buffer[:, self.size : self.size + nrows] = rows
+        self.size += nrows
+        self.lasfile["data"] = self._buffer[:, : self.size]
+        return True
+
+    def update(self, final=False):
+        """Parses the rows appended since the last call.
+
+        Parameters
+        ----------
+        final : bool, optional
+            If True, the writer is done with the file, so the text after the
+            last line break is parsed as well (e.g. a last row without a
+            trailing newline). Default is False.
+
+        Returns
+        -------
+        bool
+            Whether new rows were read (always True on the first successful
+            call, which also reads the header).
+        """
+        with open(self.path, "rb") as f:
+            f.seek(0, io.SEEK_END)
+            if f.tell() < self.offset:
+                # The file was truncated or replaced, start over
+                self.lasfile = None
+                self.offset = 0
+
+            f.seek(self.offset)
+            first = self.lasfile is None
+            if first and not self._read_header(f, final):
+                return False
+
+            chunk = f.read()
+
+        if final:
+            end = len(chunk)
+        else:
+            end = chunk.rfind(b"\n") + 1
+        self.offset += end
+
+        lines = [
+            line
+            for line in chunk[:end].decode("latin-1").splitlines()
+            if not line.lstrip().startswith("#")
+        ]
+        values = np.array(" ".join(lines).split(), dtype=float)
+
+        return self._append(values) or first
 
 
 def _compose_line(line, format):
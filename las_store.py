@@ -0,0 +1,311 @@
+import json
+import os
+import uuid
+
+import numpy as np
+
+from depth_index import DepthIndex
+
+SCHEMA = "appy-las-store"
+
+# Bump when the layout of the store changes
+STORE_VERSION = 1
+
+_HEADER_FILENAME = "header.json"
+
+_HEADER_SECTIONS = ["version", "well", "parameter", "curve", "other"]
+
+_DTYPE = "<f8"
+
+
+def _write_json(path, obj):
+    # Write to a temporary file first so readers never see a partial header
+    tmppath = os.path.join(os.path.dirname(path), uuid.uuid4().hex + ".tmp")
+    with open(tmppath, "w") as f:
+        json.dump(obj, f, indent=4)
+    os.replace(tmppath, path)
+
+
+def create(directory, lasfile):
+    """Creates a columnar store from the contents of a LAS 2.0 file.
+
+    Parameters
+    ----------
+    directory : string
+        Directory of the store. Created if needed; an existing store in it is
+        overwritten.
+    lasfile : dict
+        The contents of a LAS 2.0 file, as returned by `las2.read`. It may
+        also have an 'array' section with array logs (see `LASStore`).
+
+    Returns
+    -------
+    LASStore
+        The new store.
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    ncols = len(lasfile["curve"])
+    header = {
+        "schema": SCHEMA,
+        "version": STORE_VERSION,
+        "dtype": _DTYPE,
+        "size": 0,
+        "sections": {k: lasfile[k] for k in _HEADER_SECTIONS if k in lasfile},
+        "files": [f"curve_{i:04d}.bin" for i in range(ncols)],
+        "arrays": [],
+    }
+
+    arrays = {}
+    for i, array_log in enumerate(lasfile.get("array", [])):
+        info = {k: v for k, v in array_log.items() if k != "data"}
+        info["file"] = f"array_{i:04d}.bin"
+        info["channels"] = int(array_log["data"].shape[1])
+        header["arrays"].append(info)
+        arrays[info["mnemonic"]] = array_log["data"]
+
+    for filename in header["files"] + [a["file"] for a in header["arrays"]]:
+        open(os.path.join(directory, filename), "wb").close()
+    _write_json(os.path.join(directory, _HEADER_FILENAME), header)
+
+    store = LASStore(directory)
+    data = lasfile.get("data", None)
+    if data is not None and data.size:
+        store.append(data, arrays)
+    return store
+
+
+class LASStore:
+    """Columnar on-disk store of a LAS 2.0 file.
+
+    Each curve is kept in its own file as a contiguous array of little-endian
+    64 bit floats (NULL values are stored as NaN). The other sections are kept
+    in 'header.json', with the same structure as returned by `las2.read`,
+    along with the number of rows. Rows can be appended and curves are read
+    through memory maps, so reading a depth window only touches the pages
+    that contain it.
+
+    The store can also hold array logs (e.g. borehole images or spectral
+    logs), which have several channels per depth and cannot be represented in
+    a LAS 2.0 file. Each one is kept in its own file as a row-major matrix of
+    (number of rows, number of channels), so a depth window is a contiguous
+    block of the file.
+
+    Parameters
+    ----------
+    directory : string
+        Directory of an existing store, as created by `create`.
+
+    Examples
+    --------
+    >>> import las2, las_store
+    >>> store = las_store.create('path/to/the/store', las2.read('path/to/the/las/file'))
+    >>> store.get_curve('GR', top=1500.0, bottom=1600.0)
+    memmap([ 93.2, 95.1, ..., 101.7])
+    >>> store.to_las() # Same as las2.read
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.header = self._read_header()
+        self._depth_index = None
+
+    def _read_header(self):
+        with open(os.path.join(self.directory, _HEADER_FILENAME), "r") as f:
+            header = json.load(f)
+        if header.get("schema", None) != SCHEMA:
+            msg = f"{self.directory} is not a LAS store"
+            raise ValueError(msg)
+        if header["version"] != STORE_VERSION:
+            msg = f"Unsupported LAS store version: {header['version']}"
+            raise ValueError(msg)
+        return header
+
+    def reload(self):
+        """Reads the header again, e.g. after rows were appended by another
+        process."""
+        self.header = self._read_header()
+
+    @property
+    def size(self):
+        return self.header["size"]
+
+    @property
+    def mnemonics(self):
+        return [curve["mnemonic"] for curve in self.header["sections"]["curve"]]
+
+    @property
+    def arrays(self):
+        # Stores created before array logs were supported have none
+        return self.header.get("arrays", [])
+
+    def _get_index(self, curve):
+        if isinstance(curve, int):
+            return curve
+        try:
+            return self.mnemonics.index(curve)
+        except ValueError:
+            msg = f"Curve not found: {curve}"
+            raise ValueError(msg) from None
+
+    def _path(self, index):
+        return os.path.join(self.directory, self.header["files"][index])
+
+    def _memmap(self, index):
+        if self.size == 0:
+            return np.empty(0, dtype=self.header["dtype"])
+        return np.memmap(
+            self._path(index), dtype=self.header["dtype"], mode="r", shape=(self.size,)
+        )
+
+    def _get_array_info(self, mnemonic):
+        for info in self.arrays:
+            if info["mnemonic"] == mnemonic:
+                return info
+        msg = f"Array log not found: {mnemonic}"
+        raise ValueError(msg)
+
+    def _memmap_array(self, info):
+        shape = (self.size, info["channels"])
+        if self.size == 0:
+            return np.empty(shape, dtype=self.header["dtype"])
+        path = os.path.join(self.directory, info["file"])
+        return np.memmap(path, dtype=self.header["dtype"], mode="r", shape=shape)
+
+    @staticmethod
+    def _write_at(path, nbytes, array):
+        with open(path, "r+b") as f:
+            # Drop the leftovers of an interrupted append
+            f.truncate(nbytes)
+            f.seek(nbytes)
+            f.write(np.ascontiguousarray(array).tobytes())
+
+    def append(self, data, arrays=None):
+        """Appends rows to the store.
+
+        Parameters
+        ----------
+        data : numpy.ndarray
+            Array with shape (number of curves, number of rows), in the same
+            layout as the 'data' section returned by `las2.read`.
+        arrays : dict, optional
+            The rows of each array log of the store, by mnemonic, as arrays
+            with shape (number of rows, number of channels). Required if the
+            store has array logs.
+        """
+        data = np.asarray(data, dtype=self.header["dtype"])
+        if data.ndim != 2 or data.shape[0] != len(self.header["files"]):
+            msg = (
+                f"Expected an array with {len(self.header['files'])} rows, got "
+                f"shape {data.shape}"
+            )
+            raise ValueError(msg)
+
+        if arrays is None:
+            arrays = {}
+        array_rows = []
+        for info in self.arrays:
+            if info["mnemonic"] not in arrays:
+                msg = f"Missing rows for array log {info['mnemonic']}"
+                raise ValueError(msg)
+            rows = np.asarray(arrays[info["mnemonic"]], dtype=self.header["dtype"])
+            if rows.shape != (data.shape[1], info["channels"]):
+                msg = (
+                    f"Expected an array with shape "
+                    f"{(data.shape[1], info['channels'])} for array log "
+                    f"{info['mnemonic']}, got shape {rows.shape}"
+                )
+                raise ValueError(msg)
+            array_rows.append((info, rows))
+
+        itemsize = np.dtype(self.header["dtype"]).itemsize
+        nbytes = self.size * itemsize
+        for index, row in enumerate(data):
+            self._write_at(self._path(index), nbytes, row)
+        for info, rows in array_rows:
+            path = os.path.join(self.directory, info["file"])
+            self._write_at(path, nbytes * info["channels"], rows)
+
+        # The header is updated last, so the new rows only become visible
+        # once every curve has them
+        self.header["size"] += data.shape[1]
+        _write_json(os.path.join(self.directory, _HEADER_FILENAME), self.header)
+
+    def get_depth_index(self):
+        # The first curve is the depth. The index is rebuilt once rows were
+        # appended.
+        index = self._depth_index
+        if index is None or index.size != self.size:
+            index = DepthIndex(self._memmap(0))
+            self._depth_index = index
+        return index
+
+    def get_window(self, top=None, bottom=None):
+        """Returns the slice of rows whose depth (first curve) is inside
+        [top, bottom]. The depth must be monotonic."""
+        if top is None and bottom is None:
+            return slice(0, self.size)
+        return self.get_depth_index().get_slice(top, bottom)
+
+    def get_curve(self, curve, top=None, bottom=None):
+        """Returns the values of a curve, optionally inside a depth window.
+
+        Parameters
+        ----------
+        curve : string or int
+            The mnemonic or the index of the curve.
+        top, bottom : float, optional
+            Depth window. Defaults to all the rows.
+
+        Returns
+        -------
+        numpy.memmap
+            A read-only memory map of the values.
+        """
+        return self._memmap(self._get_index(curve))[self.get_window(top, bottom)]
+
+    def get_array(self, mnemonic, top=None, bottom=None):
+        """Returns the values of an array log, optionally inside a depth
+        window.
+
+        Parameters
+        ----------
+        mnemonic : string
+            The mnemonic of the array log.
+        top, bottom : float, optional
+            Depth window. Defaults to all the rows.
+
+        Returns
+        -------
+        numpy.memmap
+            A read-only memory map with shape (number of rows, number of
+            channels).
+        """
+        info = self._get_array_info(mnemonic)
+        return self._memmap_array(info)[self.get_window(top, bottom)]
+
+    def to_las(self, top=None, bottom=None):
+        """Returns the contents of the store with the same structure as
+        `las2.read`, optionally restricted to a depth window.
+
+        If the store has array logs, they are returned in an additional
+        'array' section: a list of dicts like the ones of the 'curve' section,
+        with a 'data' key holding a memory map of the values. They are not
+        read into memory.
+        """
+        slc = self.get_window(top, bottom)
+        lasfile = json.loads(json.dumps(self.header["sections"]))
+        ncols = len(self.header["files"])
+        data = np.empty((ncols, slc.stop - slc.start))
+        for index in range(ncols):
+            data[index] = self._memmap(index)[slc]
+        lasfile["data"] = data
+        if self.arrays:
+            lasfile["array"] = []
+            for info in self.arrays:
+                array_log = {
+                    k: v for k, v in info.items() if k not in ("file", "channels")
+                }
+                array_log["data"] = self._memmap_array(info)[slc]
+                lasfile["array"].append(array_log)
+        return lasfile
@@ -0,0 +1,443 @@
+import lzma
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import las2
+
+# Values commonly used as NULL by logging software, besides the declared one
+_NULL_VARIANTS = [-999.0, -999.25, -9999.0, -9999.25, -99999.0]
+
+# Tolerance, as a fraction of STEP, when comparing depths
+_DEPTH_TOLERANCE = 1e-3
+
+_COMPRESSED_EXTENSIONS = [".gz", ".bz2", ".xz"]
+
+
+def _issue(issues, code, severity, message, count=None, lines=None):
+    issue = {"code": code, "severity": severity, "message": message}
+    if count is not None:
+        issue["count"] = int(count)
+    if lines is not None:
+        # Keep reports small on badly broken files
+        issue["lines"] = [int(a) for a in lines[:20]]
+    issues.append(issue)
+
+
+def _read_raw_sections(path, issues):
+    sections = {}
+    current_section_key = None
+    current_section = []
+
+    with las2._open(path) as f:
+        for lineno, line in enumerate(f, 1):
+            line = las2._decode(line, None)
+            stripped = line.strip()
+            if not stripped or stripped.startswith("#"):
+                continue
+            if stripped.startswith("~"):
+                if current_section_key is not None:
+                    sections[current_section_key] = current_section
+                key = las2._sections.get(stripped[1:2].upper(), None)
+                if key is None:
+                    _issue(
+                        issues,
+                        "unknown_section",
+                        "warning",
+                        f"Unknown section '{stripped}'",
+                        lines=[lineno],
+                    )
+                    key = "?" + stripped
+                current_section_key = key
+                current_section = []
+            elif current_section_key is None:
+                _issue(
+                    issues,
+                    "line_outside_section",
+                    "error",
+                    "Line before the first section",
+                    lines=[lineno],
+                )
+            else:
+                current_section.append((lineno, line))
+    if current_section_key is not None:
+        sections[current_section_key] = current_section
+
+    return sections
+
+
+def _parse_header_sections(raw, issues):
+    parsed = {}
+    for key in ["version", "well", "parameter", "curve"]:
+        if key not in raw:
+            continue
+        lines = []
+        bad = []
+        for lineno, line in raw[key]:
+            try:
+                lines.append(las2._parse_line(line))
+            except las2.LAS2Error:
+                bad.append(lineno)
+        if bad:
+            _issue(
+                issues,
+                "invalid_line",
+                "error",
+                f"Invalid lines in the {key} section",
+                count=len(bad),
+                lines=bad,
+            )
+        parsed[key] = lines
+    if "other" in raw:
+        parsed["other"] = [line for _, line in raw["other"]]
+    return parsed
+
+
+def _get_value(section, mnemonic):
+    for line in section:
+        if line["mnemonic"].upper() == mnemonic:
+            try:
+                return float(line["value"])
+            except ValueError:
+                return None
+    return None
+
+
+def _set_value(section, mnemonic, value):
+    for line in section:
+        if line["mnemonic"].upper() == mnemonic:
+            line["value"] = f"{value:.4f}"
+
+
+def _is_wrapped(sections):
+    for line in sections.get("version", []):
+        if line["mnemonic"].upper() == "WRAP":
+            return line["value"].upper().startswith("Y")
+    return False
+
+
+def _parse_data(raw_lines, ncols, wrapped, issues):
+    """Returns the data as an array with one row per depth, dropping the rows
+    that cannot be parsed."""
+    linenos = np.array([lineno for lineno, _ in raw_lines], dtype=int)
+    lines = [line for _, line in raw_lines]
+
+    if wrapped:
+        tokens = " ".join(lines).split()
+        if len(tokens) % ncols:
+            _issue(
+                issues,
+                "ragged_rows",
+                "error",
+                f"{len(tokens)} values is not a multiple of {ncols} curves",
+                count=len(tokens) % ncols,
+            )
+            tokens = tokens[: len(tokens) - len(tokens) % ncols]
+        rows_linenos = None
+    else:
+        counts = np.fromiter((len(line.split()) for line in lines), int, len(lines))
+        ragged = counts != ncols
+        if ragged.any():
+            _issue(
+                issues,
+                "ragged_rows",
+                "error",
+                f"Data rows without exactly {ncols} values",
+                count=ragged.sum(),
+                lines=linenos[ragged].tolist(),
+            )
+            lines = [line for line, bad in zip(lines, ragged) if not bad]
+        tokens = " ".join(lines).split()
+        rows_linenos = linenos[~ragged]
+
+    try:
+        return np.array(tokens, dtype=float).reshape((-1, ncols))
+    except ValueError:
+        pass
+
+    # Slow path, only for files with non-numeric values
+    rows = [tokens[i : i + ncols] for i in range(0, len(tokens), ncols)]
+    keep = []
+    for row in rows:
+        try:
+            [float(a) for a in row]
+            keep.append(True)
+        except ValueError:
+            keep.append(False)
+    keep = np.array(keep)
+    _issue(
+        issues,
+        "non_numeric",
+        "error",
+        "Data rows with non-numeric values",
+        count=(~keep).sum(),
+        lines=None if rows_linenos is None else rows_linenos[~keep].tolist(),
+    )
+    return np.array([row for row, k in zip(rows, keep) if k], dtype=float).reshape(
+        (-1, ncols)
+    )
+
+
+def _check_mnemonics(sections, issues):
+    mnemonics = np.array([line["mnemonic"] for line in sections.get("curve", [])])
+    if len(mnemonics) == 0:
+        return
+    unique, counts = np.unique(mnemonics, return_counts=True)
+    duplicated = unique[counts > 1]
+    if len(duplicated):
+        _issue(
+            issues,
+            "duplicated_mnemonics",
+            "warning",
+            f"Duplicated mnemonics: {', '.join(duplicated)}",
+            count=len(duplicated),
+        )
+
+
+def _check_nulls(data, null, issues):
+    if null is None:
+        _issue(issues, "missing_null", "error", "No NULL value in the well section")
+        return None
+    variants = [v for v in _NULL_VARIANTS if v != null]
+    variant_mask = np.isin(data[:, 1:], variants)
+    if variant_mask.any():
+        found = np.unique(data[:, 1:][variant_mask])
+        _issue(
+            issues,
+            "null_variant",
+            "warning",
+            f"Values {found.tolist()} look like NULL, declared NULL is {null}",
+            count=variant_mask.sum(),
+        )
+    return variants
+
+
+def _check_depth(data, sections, issues):
+    depth = data[:, 0]
+    if len(depth) == 0:
+        _issue(issues, "no_data", "error", "The data section is empty")
+        return
+
+    if np.isnan(depth).any():
+        _issue(
+            issues,
+            "null_depth",
+            "error",
+            "NULL values in the depth curve",
+            count=np.isnan(depth).sum(),
+        )
+
+    well = sections.get("well", [])
+    start = _get_value(well, "STRT")
+    stop = _get_value(well, "STOP")
+    step = _get_value(well, "STEP")
+
+    diff = np.diff(depth)
+    direction = np.sign(np.nanmedian(diff)) if len(diff) else 0.0
+    if direction == 0.0 and step:
+        direction = np.sign(step)
+    backwards = (diff * direction) < 0
+    repeated = diff == 0
+    if backwards.any():
+        _issue(
+            issues,
+            "non_monotonic_depth",
+            "error",
+            "Depth goes backwards",
+            count=backwards.sum(),
+        )
+    if repeated.any():
+        _issue(
+            issues,
+            "repeated_depth",
+            "error",
+            "Repeated depth values",
+            count=repeated.sum(),
+        )
+
+    tolerance = _DEPTH_TOLERANCE * abs(step) if step else 1e-6
+    if start is not None and abs(start - depth[0]) > tolerance:
+        _issue(
+            issues,
+            "strt_mismatch",
+            "warning",
+            f"STRT is {start} but the first depth is {depth[0]}",
+        )
+    if stop is not None and abs(stop - depth[-1]) > tolerance:
+        _issue(
+            issues,
+            "stop_mismatch",
+            "warning",
+            f"STOP is {stop} but the last depth is {depth[-1]}",
+        )
+    if step is None:
+        _issue(issues, "missing_step", "warning", "No STEP in the well section")
+    elif step != 0 and len(diff):
+        off_step = np.abs(diff - step) > tolerance
+        if off_step.any():
+            _issue(
+                issues,
+                "step_mismatch",
+                "warning",
+                f"Depth increments differ from STEP {step}",
+                count=off_step.sum(),
+            )
+
+
+def _repair(sections, data, null, variants):
+    lasfile = {k: v for k, v in sections.items() if not k.startswith("?")}
+    data = data.copy()
+
+    if null is not None:
+        # Including the depth, so rows with a NULL depth are dropped below
+        data[np.isin(data, [null] + variants)] = np.nan
+
+    # Drop rows without depth, sort by depth and keep the first of repeated
+    # depths
+    data = data[~np.isnan(data[:, 0])]
+    step = _get_value(lasfile.get("well", []), "STEP")
+    descending = step is not None and step < 0
+    order = np.argsort(-data[:, 0] if descending else data[:, 0], kind="stable")
+    data = data[order]
+    _, first = np.unique(data[:, 0], return_index=True)
+    data = data[np.sort(first)]
+    if descending:
+        data = data[np.argsort(-data[:, 0], kind="stable")]
+
+    well = lasfile.get("well", [])
+    if len(data):
+        _set_value(well, "STRT", data[0, 0])
+        _set_value(well, "STOP", data[-1, 0])
+        if step:
+            diff = np.diff(data[:, 0])
+            tolerance = _DEPTH_TOLERANCE * abs(step)
+            if len(diff) and np.any(np.abs(diff - step) > tolerance):
+                # Irregular sampling
+                _set_value(well, "STEP", 0.0)
+
+    # Make mnemonics unique, following the LAS 'MNEM:n' convention
+    seen = {}
+    for line in lasfile.get("curve", []):
+        mnemonic = line["mnemonic"]
+        if mnemonic in seen:
+            seen[mnemonic] += 1
+            line["mnemonic"] = f"{mnemonic}:{seen[mnemonic]}"
+        else:
+            seen[mnemonic] = 0
+
+    lasfile["data"] = data.transpose()
+    return lasfile
+
+
+def validate(path, repair=None):
+    """Checks a LAS 2.0 file and optionally writes a repaired copy.
+
+    Parameters
+    ----------
+    path : string
+        The path of the file to check.
+    repair : string, optional
+        If given, a repaired copy of the file is written to this path with
+        `las2.write`: NULL variants and ragged or non-numeric rows are
+        removed, rows with a NULL depth are dropped, the depth is sorted
+        without repeated values, STRT, STOP and STEP are updated and
+        duplicated mnemonics are renamed.
+
+    Returns
+    -------
+    dict
+        The report, with the keys 'path', 'valid' (False if any issue is an
+        error), 'rows', 'curves', 'issues' (a list of dicts with the keys
+        'code', 'severity' and 'message', and optionally 'count' and 'lines')
+        and 'repaired' (the path of the repaired copy, or None).
+    """
+    issues = []
+    report = {
+        "path": path,
+        "valid": False,
+        "rows": 0,
+        "curves": 0,
+        "issues": issues,
+        "repaired": None,
+    }
+
+    try:
+        raw = _read_raw_sections(path, issues)
+    except (OSError, EOFError, lzma.LZMAError, UnicodeDecodeError) as e:
+        _issue(issues, "unreadable", "error", str(e))
+        return report
+
+    for key in ["version", "well", "curve", "data"]:
+        if key not in raw:
+            _issue(issues, "missing_section", "error", f"Missing {key} section")
+
+    sections = _parse_header_sections(raw, issues)
+    ncols = len(sections.get("curve", []))
+    report["curves"] = ncols
+    _check_mnemonics(sections, issues)
+
+    if ncols == 0 or "data" not in raw:
+        return report
+
+    data = _parse_data(raw["data"], ncols, _is_wrapped(sections), issues)
+    report["rows"] = len(data)
+
+    null = _get_value(sections.get("well", []), "NULL")
+    variants = _check_nulls(data, null, issues)
+    depth = data.copy()
+    if null is not None:
+        depth[depth == null] = np.nan
+    _check_depth(depth, sections, issues)
+
+    report["valid"] = not any(issue["severity"] == "error" for issue in issues)
+
+    if repair is not None and null is not None and len(data):
+        os.makedirs(os.path.dirname(os.path.abspath(repair)), exist_ok=True)
+        las2.write(repair, _repair(sections, data, null, variants or []))
+        report["repaired"] = repair
+
+    return report
+
+
+def _validate_job(job):
+    path, repair = job
+    return validate(path, repair)
+
+
+def validate_files(paths, repair_dir=None, max_workers=None, chunksize=16):
+    """Checks many LAS 2.0 files in parallel worker processes.
+
+    Parameters
+    ----------
+    paths : list of string
+        The paths of the files to check.
+    repair_dir : string, optional
+        If given, repaired copies are written to this directory, with the
+        same file names. Copies of compressed files are written uncompressed,
+        without the '.gz', '.bz2' or '.xz' extension.
+    max_workers : int, optional
+        Maximum number of worker processes. Defaults to the number of CPUs.
+    chunksize : int, optional
+        Number of files sent to a worker at once.
+
+    Returns
+    -------
+    list of dict
+        The report of each file, in the same order as `paths`.
+    """
+    jobs = []
+    for path in paths:
+        repair = None
+        if repair_dir is not None:
+            name, ext = os.path.splitext(os.path.basename(path))
+            if ext.lower() not in _COMPRESSED_EXTENSIONS:
+                name += ext
+            repair = os.path.join(repair_dir, name)
+        jobs.append((path, repair))
+
+    if max_workers == 1 or len(jobs) <= 1:
+        return [_validate_job(job) for job in jobs]
+
+    with ProcessPoolExecutor(max_workers) as executor:
+        return list(executor.map(_validate_job, jobs, chunksize=chunksize))
@@ -0,0 +1,769 @@
+import contextlib
+import copy
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from crossplot import Crossplot
+from depth_index import DepthIndex
+from zonal_statistics import get_zonal_statistics, zones_from_markers
+
+
+def get_starting_nans(x):
+    return np.sum(np.cumsum(np.isnan(x)) == np.arange(1, len(x) + 1))
+
+
+def get_window_slice(index, vmin, vmax):
+    # Samples covering [vmin, vmax], plus one on each side so that lines
+    # reach the window edges. Non-monotonic depths are not windowed.
+    if not index.monotonic:
+        return slice(None)
+    return index.get_slice(vmin, vmax, pad=True)
+
+
+def get_depth_index(well_log, slc):
+    """Returns the `DepthIndex` of a slice of the y curve of a layer.
+
+    The index of the depth curve comes from the data provider, which builds it
+    once for all the layers, so only the slice is taken. Other curves are
+    indexed on their own.
+    """
+    index = well_log.get("index", None)
+    if index is None:
+        return DepthIndex(well_log["data"][slc])
+    return index.take(slc)
+
+
+_TR_TEXT_MATPLOTLIB_TEXT = {
+    "font": "family",
+    "style": "style",
+    "variant": "variant",
+    "stretch": "stretch",
+    "weight": "weight",
+    "size": "size",
+}
+
+_TR_LINE_MATPLOTLIB_LINE = {
+    "color": "color",
+    "style": "linestyle",
+    "width": "linewidth",
+    "alpha": "alpha",
+}
+
+_TR_MARKER_MATPLOTLIB_MARKER = {
+    "color": "markerfacecolor",
+    "style": "marker",
+    "size": "markersize",
+    "edgecolor": "markeredgecolor",
+    "edgewidth": "markeredgewidth",
+    "alpha": "alpha",
+}
+
+_TR_PATCH_MATPLOTLIB_PATCH = {
+    "color": "facecolor",
+    "hatch": "hatch",
+    "alpha": "alpha",
+    "hatchcolor": "edgecolor",
+}
+
+
+def get_depth_extent(prepared):
+    """Returns the (top, bottom) depth covering all the prepared layers.
+
+    Raises a ValueError if no layer has depth limits, e.g. when all of them
+    are empty.
+    """
+    ylims = []
+    for track_prepared in prepared:
+        for layer_prepared in track_prepared:
+            if layer_prepared is None or layer_prepared.get("ylim", None) is None:
+                continue
+            ylims.extend(layer_prepared["ylim"])
+    ylims = [a for a in ylims if np.isfinite(a)]
+    if not ylims:
+        msg = "The template has no layers with depth limits"
+        raise ValueError(msg)
+    return min(ylims), max(ylims)
+
+
+class LogPlotData:
+    """Prepares the data of the layers of a log plot, without drawing it.
+
+    This is the part of `LogPlot` that does not need matplotlib. The data of
+    each layer is fetched, trimmed and translated to artist properties by the
+    `prepare` static method registered for its type, and restricted to a
+    depth window by `window`. `LogPlot` draws the prepared data; exporters
+    (e.g. `vertex_export`) can use it directly.
+
+    Parameters
+    ----------
+    dataprovider : DataProvider
+        The data of the well.
+    template : dict
+        A parsed template, as returned by `logplot_template.parse`.
+    instrumentation : Instrumentation, optional
+        Records the time spent preparing each layer.
+    parallel : bool, optional
+        If True (default), layers are prepared in parallel threads.
+    max_workers : int, optional
+        Maximum number of threads used when `parallel` is True.
+    lazy : bool, optional
+        If True, a ValueError raised while preparing a layer is returned in
+        place of its data instead of being raised.
+    """
+
+    _layer_data = {}
+
+    def __init__(
+        self,
+        dataprovider,
+        template,
+        instrumentation=None,
+        parallel=True,
+        max_workers=None,
+        lazy=False,
+    ):
+        self.dataprovider = dataprovider
+        self.template = template
+        self.instrumentation = instrumentation
+        self.parallel = parallel
+        self.max_workers = max_workers
+        self.lazy = lazy
+
+    def _measure(self, kind, **kwargs):
+        if self.instrumentation is None:
+            return contextlib.nullcontext({})
+        return self.instrumentation.measure(kind, **kwargs)
+
+    def get_depth_window(self):
+        """Returns the (top, bottom) depth window set by the template, or None
+        if the whole data should be shown."""
+        depth = self.template.get("depth", None)
+        if depth is None:
+            return None
+
+        top, bottom = depth["range"]
+        span = depth.get("span", None)
+        if top is None and bottom is None and span is None:
+            return None
+
+        if top is None:
+            if bottom is not None and span is not None:
+                top = bottom - span
+            else:
+                top = self.dataprovider.get_depth_range()[0]
+        if span is not None:
+            bottom = top + span
+        elif bottom is None:
+            bottom = self.dataprovider.get_depth_range()[1]
+
+        return top, bottom
+
+    def get_dataprovider(self):
+        window = self.get_depth_window()
+        if window is None:
+            return self.dataprovider
+        return self.dataprovider.with_window(*window)
+
+    def _prepare_layer(self, i, j, layer, track, dataprovider):
+        prepare = getattr(self._get_layer_data(layer["type"]), "prepare", None)
+        if prepare is None:
+            return None
+
+        layer = copy.deepcopy(layer)
+        track = copy.deepcopy(track)
+
+        with self._measure("prepare", track=i, layer=j, type=layer["type"]) as record:
+            if self.instrumentation is not None:
+                dataprovider = self.instrumentation.wrap_dataprovider(
+                    dataprovider, record
+                )
+            try:
+                return prepare(dataprovider, layer, track)
+            except ValueError as e:
+                if not self.lazy:
+                    raise
+                # Reported when the layer is built, as a warning
+                return e
+
+    def prepare(self, dataprovider=None, tracks=None):
+        # Preparing the layers data (fetching, NaN trimming, etc) does not
+        # touch the figure, so it can run concurrently. NumPy releases the GIL
+        # on most of that work. Artists are attached on the main thread later.
+        if dataprovider is None:
+            dataprovider = self.get_dataprovider()
+
+        jobs = []
+        for i, track in enumerate(self.template["tracks"]):
+            if tracks is not None and i not in tracks:
+                continue
+            for j, layer in enumerate(track["layers"]):
+                jobs.append((i, j, layer, track, dataprovider))
+
+        if self.parallel and len(jobs) > 1:
+            with ThreadPoolExecutor(self.max_workers) as executor:
+                results = list(executor.map(lambda job: self._prepare_layer(*job), jobs))
+        else:
+            results = [self._prepare_layer(*job) for job in jobs]
+
+        prepared = [[None] * len(track["layers"]) for track in self.template["tracks"]]
+        for (i, j, _, _, _), result in zip(jobs, results):
+            prepared[i][j] = result
+
+        return prepared
+
+    def window(self, prepared, ymin, ymax):
+        """Restricts prepared layers data (as returned by `prepare`) to a depth
+        window."""
+        windowed = []
+        for track, track_prepared in zip(self.template["tracks"], prepared):
+            track_windowed = []
+            for layer, layer_prepared in zip(track["layers"], track_prepared):
+                window = getattr(self._get_layer_data(layer["type"]), "window", None)
+                if layer_prepared is not None and window is not None:
+                    layer_prepared = window(layer_prepared, ymin, ymax)
+                track_windowed.append(layer_prepared)
+            windowed.append(track_windowed)
+        return windowed
+
+    def _get_layer_data(self, layer_type):
+        return self._layer_data.get(layer_type, None)
+
+    @classmethod
+    def register_layer_data(cls, name):
+        def decorator(layer_data):
+            cls._layer_data[name] = layer_data
+            return layer_data
+
+        return decorator
+
+
+@LogPlotData.register_layer_data("line")
+class LineLayerData:
+    @staticmethod
+    def prepare(dataprovider, layer, track):
+        xlim = layer.get("limits", {}).get("x", None)
+        if xlim is None:
+            xlim = dataprovider.get_range(layer["data"]["x"])
+        # Line can be None, so the approach above won't work
+        if "line" in layer:
+            line = layer["line"]
+        else:
+            line = dataprovider.get_line(layer["data"]["x"])
+        marker = layer.get("marker", None)
+        if marker is None:
+            # TODO: implement
+            # marker = dataprovider.get_marker(layer["data"]["x"])
+            marker = {}
+
+        linekwargs = {}
+        if line is not None:
+            for k, v in line.items():
+                linekwargs[_TR_LINE_MATPLOTLIB_LINE[k]] = v
+        else:
+            linekwargs["linestyle"] = "none"
+
+        markerkwargs = {}
+        if marker is not None:
+            for k, v in marker.items():
+                markerkwargs[_TR_MARKER_MATPLOTLIB_MARKER[k]] = v
+
+        data = dataprovider.get_data(layer["data"])
+        xdata = data["x"]["data"]
+        ydata = data["y"]["data"]
+
+        idx0 = max(get_starting_nans(a) for a in (xdata, ydata))
+        idxn = len(xdata) - 1 - max(get_starting_nans(a[::-1]) for a in (xdata, ydata))
+        slc = slice(idx0, idxn + 1)
+
+        # No valid samples, e.g. outside the depth window
+        if idx0 > idxn:
+            ylim = None
+        else:
+            ymin = min(ydata[idx0], ydata[idxn])
+            ymax = max(ydata[idx0], ydata[idxn])
+            ylim = (ymax, ymin)
+
+        return {
+            "x": xdata[slc],
+            "y": ydata[slc],
+            "kwargs": {**linekwargs, **markerkwargs},
+            "xlim": xlim,
+            "ylim": ylim,
+            "scale": track.get("scale", "linear"),
+            "slice": (idx0, idxn + 1),
+            "size": len(xdata),
+            "index": get_depth_index(data["y"], slc),
+        }
+
+    @staticmethod
+    def window(prepared, ymin, ymax):
+        index = prepared["index"]
+        slc = get_window_slice(index, ymin, ymax)
+        return dict(
+            prepared, x=prepared["x"][slc], y=prepared["y"][slc], index=index.take(slc)
+        )
+
+
+@LogPlotData.register_layer_data("text")
+class TextLayerData:
+    @staticmethod
+    def prepare(dataprovider, layer, track):
+        text = layer.get("text", None)
+        if text is None:
+            # TODO: implement
+            # text = dataprovider.get_text(layer["data"]["x"])
+            text = {}
+
+        x_is_y = layer["data"]["x"] == layer["data"]["y"]
+
+        if x_is_y:
+            return {
+                "text": text,
+                "x_is_y": x_is_y,
+                "x": None,
+                "y": None,
+                "ylim": None,
+                "index": None,
+            }
+
+        data = dataprovider.get_data(layer["data"])
+        ydata = data["y"]["data"]
+        xdata = data["x"]["data"]
+
+        idx0 = max(get_starting_nans(a) for a in (ydata, xdata))
+        idxn = len(ydata) - 1 - max(get_starting_nans(a[::-1]) for a in (ydata, xdata))
+        slc = slice(idx0, idxn + 1)
+
+        if idx0 > idxn:
+            return {
+                "text": text,
+                "x_is_y": x_is_y,
+                "x": xdata[slc],
+                "y": ydata[slc],
+                "ylim": None,
+                "index": get_depth_index(data["y"], slc),
+            }
+
+        return {
+            "text": text,
+            "x_is_y": x_is_y,
+            "x": xdata[slc],
+            "y": ydata[slc],
+            "ylim": (max(ydata[idx0], ydata[idxn]), min(ydata[idx0], ydata[idxn])),
+            "index": get_depth_index(data["y"], slc),
+        }
+
+    @staticmethod
+    def window(prepared, ymin, ymax):
+        if prepared["x_is_y"]:
+            return prepared
+        index = prepared["index"]
+        slc = get_window_slice(index, ymin, ymax)
+        return dict(
+            prepared, x=prepared["x"][slc], y=prepared["y"][slc], index=index.take(slc)
+        )
+
+
+@LogPlotData.register_layer_data("fillbetween")
+class FillBetweenLayerData:
+    @staticmethod
+    def prepare(dataprovider, layer, track):
+        patches = {}
+        transforms = {}
+
+        def get_transform(a, b):
+            def transform(x):
+                return (x - a) / (b - a)
+
+            return transform
+
+        for side in ["left", "right"]:
+            patch = {}
+            for k, v in layer[side]["patch"].items():
+                patch[_TR_PATCH_MATPLOTLIB_PATCH[k]] = v
+            patch["linewidth"] = 0.0
+
+            patches[side] = patch
+
+            # TODO: get it properly, like on other artists
+            xlim = layer[side].get("limits", {}).get("x", None)
+            if xlim is None:
+                xlim = dataprovider.get_range(layer[side]["data"]["x"])
+            a, b = xlim
+
+            transforms[side] = get_transform(a, b)
+
+        # TODO: y???
+        layer_data = {
+            "left": layer["left"]["data"]["x"],
+            "right": layer["right"]["data"]["x"],
+            "y": layer.get("data", layer["left"]["data"])["y"],
+            "source": "well_log",
+        }
+
+        data = dataprovider.get_data(layer_data)
+
+        ldata = transforms["left"](data["left"]["data"])
+        rdata = transforms["right"](data["right"]["data"])
+        ydata = data["y"]["data"]
+
+        idx0 = max(get_starting_nans(a) for a in (ldata, rdata, ydata))
+        idxn = (
+            len(ldata)
+            - 1
+            - max(get_starting_nans(a[::-1]) for a in (ldata, rdata, ydata))
+        )
+        slc = slice(idx0, idxn + 1)
+
+        not_nan = ~(np.isnan(ldata[slc]) | np.isnan(rdata[slc]))
+        lwhere = np.zeros(len(not_nan), dtype=bool)
+        rwhere = np.zeros(len(not_nan), dtype=bool)
+        lwhere[not_nan] = ldata[slc][not_nan] > rdata[slc][not_nan]
+        rwhere[not_nan] = rdata[slc][not_nan] > ldata[slc][not_nan]
+
+        # No valid samples, e.g. outside the depth window
+        if idx0 > idxn:
+            ylim = None
+        else:
+            ymin = min(ydata[idx0], ydata[idxn])
+            ymax = max(ydata[idx0], ydata[idxn])
+            ylim = (ymax, ymin)
+
+        return {
+            "left": ldata[slc],
+            "right": rdata[slc],
+            "y": ydata[slc],
+            "lwhere": lwhere,
+            "rwhere": rwhere,
+            "patches": patches,
+            "ylim": ylim,
+            "index": get_depth_index(data["y"], slc),
+        }
+
+    @staticmethod
+    def window(prepared, ymin, ymax):
+        index = prepared["index"]
+        slc = get_window_slice(index, ymin, ymax)
+        windowed = dict(prepared, index=index.take(slc))
+        for key in ("left", "right", "y", "lwhere", "rwhere"):
+            windowed[key] = prepared[key][slc]
+        return windowed
+
+
+@LogPlotData.register_layer_data("intervals")
+class IntervalsLayerData:
+    @staticmethod
+    def prepare(dataprovider, layer, track):
+        well_interval_lists = {}
+        zones = {}
+        for well_interval in dataprovider.get_data(layer["data"]):
+            if well_interval.zone.id not in well_interval_lists:
+                well_interval_lists[well_interval.zone.id] = []
+                zones[well_interval.zone.id] = well_interval.zone
+            well_interval_lists[well_interval.zone.id].append(well_interval)
+
+        ymin = np.inf
+        ymax = -np.inf
+
+        prepared_zones = []
+        for zone_id, well_intervals in well_interval_lists.items():
+            tops = np.array([wi.depth_interval.top.depth for wi in well_intervals])
+            bottoms = np.array(
+                [wi.depth_interval.bottom.depth for wi in well_intervals]
+            )
+            patch_property = zones[zone_id].patch_property
+            patchkwargs = {
+                "facecolor": patch_property.color,
+                "hatch": patch_property.hatch,
+                "edgecolor": patch_property.hatchcolor,
+                "alpha": patch_property.alpha,
+                "linewidth": 0.0,
+            }
+            prepared_zones.append((patchkwargs, tops, bottoms))
+
+            ymin = min(ymin, np.min(tops), np.min(bottoms))
+            ymax = max(ymax, np.max(tops), np.max(bottoms))
+
+        return {"zones": prepared_zones, "ylim": (ymax, ymin)}
+
+    @staticmethod
+    def window(prepared, ymin, ymax):
+        zones = []
+        for patchkwargs, tops, bottoms in prepared["zones"]:
+            inside = (np.maximum(tops, bottoms) >= ymin) & (
+                np.minimum(tops, bottoms) <= ymax
+            )
+            zones.append((patchkwargs, tops[inside], bottoms[inside]))
+        return dict(prepared, zones=zones)
+
+
+def get_runs(x):
+    """Run-length encoding of a discrete curve.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        The start and stop (exclusive) indexes of each run of equal values.
+        Consecutive NaNs form a single run.
+    """
+    n = len(x)
+    if n == 0:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+    isnan = np.isnan(x)
+    changed = (x[1:] != x[:-1]) & ~(isnan[1:] & isnan[:-1])
+    boundaries = np.flatnonzero(changed) + 1
+    starts = np.concatenate(([0], boundaries))
+    stops = np.concatenate((boundaries, [n]))
+    return starts, stops
+
+
+@LogPlotData.register_layer_data("lithology")
+class LithologyLayerData:
+    @staticmethod
+    def _get_patch_kwargs(patch):
+        patchkwargs = {}
+        for k, v in patch.items():
+            patchkwargs[_TR_PATCH_MATPLOTLIB_PATCH[k]] = v
+        patchkwargs["linewidth"] = 0.0
+        return patchkwargs
+
+    @staticmethod
+    def prepare(dataprovider, layer, track):
+        styles = {}
+        for code in layer.get("codes", []):
+            styles[float(code["code"])] = code.get("patch", {})
+        default = layer.get("patch", None)
+
+        data = dataprovider.get_data(layer["data"])
+        xdata = data["x"]["data"]
+        ydata = data["y"]["data"]
+
+        # Each sample covers the depth up to half way to its neighbours
+        valid = ~np.isnan(ydata)
+        xdata = xdata[valid]
+        ydata = ydata[valid]
+        edges = np.concatenate((ydata[:1], (ydata[1:] + ydata[:-1]) / 2.0, ydata[-1:]))
+
+        starts, stops = get_runs(xdata)
+        codes = xdata[starts]
+        tops = edges[starts]
+        bottoms = edges[stops]
+
+        keep = ~np.isnan(codes)
+        codes = codes[keep]
+        tops = tops[keep]
+        bottoms = bottoms[keep]
+
+        prepared_codes = []
+        unique, inverse = np.unique(codes, return_inverse=True)
+        for k, code in enumerate(unique):
+            patch = styles.get(float(code), default)
+            if patch is None:
+                continue
+            patchkwargs = LithologyLayerData._get_patch_kwargs(patch)
+            group = inverse == k
+            prepared_codes.append(
+                (float(code), patchkwargs, tops[group], bottoms[group])
+            )
+
+        if len(codes):
+            ymin = min(np.min(tops), np.min(bottoms))
+            ymax = max(np.max(tops), np.max(bottoms))
+            ylim = (ymax, ymin)
+        else:
+            ylim = None
+
+        return {"codes": prepared_codes, "ylim": ylim}
+
+    @staticmethod
+    def window(prepared, ymin, ymax):
+        codes = []
+        for code, patchkwargs, tops, bottoms in prepared["codes"]:
+            inside = (np.maximum(tops, bottoms) >= ymin) & (
+                np.minimum(tops, bottoms) <= ymax
+            )
+            codes.append((code, patchkwargs, tops[inside], bottoms[inside]))
+        return dict(prepared, codes=codes)
+
+
+@LogPlotData.register_layer_data("image")
+class ImageLayerData:
+    @staticmethod
+    def prepare(dataprovider, layer, track):
+        clim = layer.get("limits", {}).get("color", None)
+        if clim is None:
+            clim = dataprovider.get_range(dict(layer["data"]["x"], source="array_logs"))
+
+        data = dataprovider.get_data(layer["data"])
+        xdata = data["x"]["data"]
+        ydata = data["y"]["data"]
+
+        idx0 = get_starting_nans(ydata)
+        idxn = len(ydata) - 1 - get_starting_nans(ydata[::-1])
+        slc = slice(idx0, idxn + 1)
+
+        if idx0 > idxn:
+            ylim = None
+        else:
+            ylim = (max(ydata[idx0], ydata[idxn]), min(ydata[idx0], ydata[idxn]))
+
+        return {
+            "x": xdata[slc],
+            "y": ydata[slc],
+            "kwargs": {
+                "cmap": layer.get("colormap", None),
+                "vmin": clim[0],
+                "vmax": clim[1],
+            },
+            "channels": xdata.shape[1],
+            "ylim": ylim,
+            "index": get_depth_index(data["y"], slc),
+        }
+
+    @staticmethod
+    def window(prepared, ymin, ymax):
+        index = prepared["index"]
+        slc = get_window_slice(index, ymin, ymax)
+        return dict(
+            prepared, x=prepared["x"][slc], y=prepared["y"][slc], index=index.take(slc)
+        )
+
+
+@LogPlotData.register_layer_data("zonestats")
+class ZoneStatsLayerData:
+    @staticmethod
+    def get_default_limits(dataprovider, layer):
+        statistic = layer.get("statistic", "mean")
+        if statistic == "net_to_gross":
+            return [0.0, 1.0]
+        elif statistic in ("gross", "net"):
+            zones_query = dict(layer["data"]["zones"], source="marker_families")
+            zones = zones_from_markers(dataprovider.get_data(zones_query))
+            gross = zones["bottom"] - zones["top"]
+            return [0.0, float(np.max(gross))] if len(gross) else [0.0, 1.0]
+        return dataprovider.get_range(layer["data"]["x"])
+
+    @staticmethod
+    def prepare(dataprovider, layer, track):
+        statistic = layer.get("statistic", "mean")
+        cutoff = layer.get("cutoff", None)
+
+        zones_query = dict(layer["data"]["zones"], source="marker_families")
+        zones = zones_from_markers(dataprovider.get_data(zones_query))
+
+        query = {
+            "x": layer["data"]["x"],
+            "y": layer["data"]["y"],
+            "source": layer["data"].get("source", "well_log"),
+        }
+        if cutoff is not None:
+            query["cutoff"] = cutoff["data"]
+            cutoff = dict(cutoff, curve="cutoff")
+        stats = get_zonal_statistics(dataprovider, zones, query, cutoff=cutoff)
+
+        if statistic in ("gross", "net", "net_to_gross"):
+            values = stats[statistic]
+        else:
+            values = stats["x"][statistic] if "x" in stats else stats["top"][:0]
+        values = np.asarray(values, dtype=float)
+
+        xlim = layer.get("limits", {}).get("x", None)
+        if xlim is None:
+            xlim = ZoneStatsLayerData.get_default_limits(dataprovider, layer)
+
+        linekwargs = {}
+        for k, v in layer.get("line", {"color": "#000000"}).items():
+            linekwargs[_TR_LINE_MATPLOTLIB_LINE[k]] = v
+
+        if len(stats["top"]):
+            ylim = (np.max(stats["bottom"]), np.min(stats["top"]))
+        else:
+            ylim = None
+
+        return {
+            "top": stats["top"],
+            "bottom": stats["bottom"],
+            "value": values,
+            "xlim": xlim,
+            "patch": LithologyLayerData._get_patch_kwargs(layer.get("patch", {})),
+            "line": linekwargs,
+            "text": layer.get("text", {}),
+            "format": layer.get("format", "{:.2f}"),
+            "ylim": ylim,
+        }
+
+    @staticmethod
+    def window(prepared, ymin, ymax):
+        tops = prepared["top"]
+        bottoms = prepared["bottom"]
+        inside = (bottoms >= ymin) & (tops <= ymax)
+        return dict(
+            prepared,
+            top=tops[inside],
+            bottom=bottoms[inside],
+            value=prepared["value"][inside],
+        )
+
+
+def _get_axes_fraction(edges, scale):
+    # Position of the bin edges along an axis going from the first to the
+    # last edge, in that scale
+    if scale == "log":
+        edges = np.log10(edges)
+    return (edges - edges[0]) / (edges[-1] - edges[0])
+
+
+@LogPlotData.register_layer_data("crossplot")
+class CrossplotLayerData:
+    @staticmethod
+    def prepare(dataprovider, layer, track):
+        crossplot = Crossplot.from_template(layer)
+        crossplot.add_dataprovider(dataprovider)
+        values, norm = crossplot.get_values(layer.get("color", "count"))
+
+        return {
+            "x": _get_axes_fraction(crossplot.xedges, crossplot.xscale),
+            "y": _get_axes_fraction(crossplot.yedges, crossplot.yscale),
+            "values": values.T,
+            "norm": norm,
+            "colormap": layer.get("colormap", None),
+        }
+
+
+@LogPlotData.register_layer_data("markers")
+class MarkersLayerData:
+    @staticmethod
+    def prepare(dataprovider, layer, track):
+        text = layer.get("text", None)
+        if text is None:
+            text = {}
+
+        linekwargs = {}
+        for k, v in layer.get("line", {}).items():
+            linekwargs[_TR_LINE_MATPLOTLIB_LINE[k]] = v
+
+        data = dataprovider.get_data(layer["data"])
+        depth = np.asarray(data["depth"], dtype=float)
+
+        if len(depth):
+            ylim = (depth[-1], depth[0])
+        else:
+            ylim = None
+
+        return {
+            "depth": depth,
+            "name": data["name"],
+            "kwargs": linekwargs,
+            "text": text,
+            "ylim": ylim,
+        }
+
+    @staticmethod
+    def window(prepared, ymin, ymax):
+        depth = prepared["depth"]
+        slc = slice(
+            np.searchsorted(depth, ymin, side="left"),
+            np.searchsorted(depth, ymax, side="right"),
+        )
+        return dict(prepared, depth=depth[slc], name=prepared["name"][slc])
@@ -4,7 +4,9 @@ import uuid
 
 import numpy as np
 from matplotlib.figure import Figure
-from matplotlib.collections import PatchCollection
+from matplotlib.collections import LineCollection, PatchCollection
+from matplotlib.colors import LogNorm
+from matplotlib.font_manager import FontProperties
 from matplotlib.patches import Rectangle
 from matplotlib.ticker import (
     NullFormatter,
@@ -15,6 +17,24 @@ from matplotlib.ticker import (
     AutoLocator,
 )
 
+from instrumentation import count_points
+from layer_data import (
+    LogPlotData,
+    LineLayerData,
+    TextLayerData,
+    FillBetweenLayerData,
+    IntervalsLayerData,
+    LithologyLayerData,
+    ImageLayerData,
+    ZoneStatsLayerData,
+    CrossplotLayerData,
+    MarkersLayerData,
+    get_window_slice,
+    _TR_TEXT_MATPLOTLIB_TEXT,
+    _TR_LINE_MATPLOTLIB_LINE,
+    _TR_MARKER_MATPLOTLIB_MARKER,
+)
+
 _LINEAR_TICK_LOCATORS = {
     "multiple": MultipleLocator,
     "linear": LinearLocator,
@@ -30,8 +50,61 @@ def monkeypatchmethod(obj, name, method):
     setattr(obj, name, original)
 
 
-def get_starting_nans(x):
-    return np.sum(np.cumsum(np.isnan(x)) == np.arange(1, len(x) + 1))
+# Rows of the source data averaged at once by block_average. Bounds the memory
+# used when downsampling memory-mapped array logs.
+_BLOCK_AVERAGE_CHUNK = 2**16
+
+
+def get_block_factor(n, size):
+    """Number of samples averaged in each block by `block_average` to reduce
+    `n` samples to at most `size`. The last block may be shorter."""
+    return max(int(np.ceil(n / max(size, 1))), 1)
+
+
+def block_average(data, rows, cols):
+    """Downsamples a 2D array to at most (rows, cols) samples by averaging
+    blocks of samples, ignoring NaNs.
+
+    The data is read in chunks of rows, so it can be a memory map larger than
+    the available memory.
+    """
+    n, m = data.shape
+    row_factor = get_block_factor(n, rows)
+    col_factor = get_block_factor(m, cols)
+    if row_factor == 1 and col_factor == 1:
+        return np.asarray(data, dtype=float)
+
+    col_starts = np.arange(0, m, col_factor)
+    chunk = row_factor * max(_BLOCK_AVERAGE_CHUNK // row_factor, 1)
+    averaged = [np.empty((0, len(col_starts)))]
+    for i in range(0, n, chunk):
+        block = np.asarray(data[i : i + chunk], dtype=float)
+        valid = ~np.isnan(block)
+        row_starts = np.arange(0, len(block), row_factor)
+        sums = np.add.reduceat(np.where(valid, block, 0.0), row_starts, axis=0)
+        counts = np.add.reduceat(valid.astype(int), row_starts, axis=0)
+        sums = np.add.reduceat(sums, col_starts, axis=1)
+        counts = np.add.reduceat(counts, col_starts, axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            averaged.append(sums / counts)
+    return np.concatenate(averaged)
+
+
+def spread_labels(positions, spacing):
+    """Moves sorted label positions forward, as little as possible, so that
+    consecutive labels are at least `spacing` apart.
+
+    The greedy placement p[i] = max(positions[i], p[i - 1] + spacing) is
+    computed without a loop as p[i] = max over k <= i of
+    positions[k] + (i - k) * spacing.
+    """
+    offsets = spacing * np.arange(len(positions))
+    return np.maximum.accumulate(positions - offsets) + offsets
+
+
+def is_in_view(ax):
+    x0, y0, x1, y1 = ax.get_position().extents
+    return x1 > 0.0 and x0 < 1.0 and y1 > 0.0 and y0 < 1.0
 
 
 def prepare_clean_ax(ax, facecolor, edgecolor, alpha, **kwargs):
@@ -48,52 +121,37 @@ def prepare_transparent_ax(ax, **kwargs):
     ax.axis("off")
 
 
-_TR_TEXT_MATPLOTLIB_TEXT = {
-    "font": "family",
-    "style": "style",
-    "variant": "variant",
-    "stretch": "stretch",
-    "weight": "weight",
-    "size": "size",
-}
-
-_TR_LINE_MATPLOTLIB_LINE = {
-    "color": "color",
-    "style": "linestyle",
-    "width": "linewidth",
-    "alpha": "alpha",
-}
-
-_TR_MARKER_MATPLOTLIB_MARKER = {
-    "color": "markerfacecolor",
-    "style": "marker",
-    "size": "markersize",
-    "edgecolor": "markeredgecolor",
-    "edgewidth": "markeredgewidth",
-    "alpha": "alpha",
-}
-
-_TR_PATCH_MATPLOTLIB_PATCH = {
-    "color": "facecolor",
-    "hatch": "hatch",
-    "alpha": "alpha",
-    "hatchcolor": "edgecolor",
-}
-
-
-class LogPlot:
+class LogPlot(LogPlotData):
     _layer_artists = {}
     _legend_artists = {}
     _header_artists = {}
 
-    def __init__(self, dataprovider, template, figure=None):
-        self.dataprovider = dataprovider
-        self.template = template
+    def __init__(
+        self,
+        dataprovider,
+        template,
+        figure=None,
+        instrumentation=None,
+        parallel=True,
+        max_workers=None,
+        lazy=False,
+        max_builds=None,
+    ):
+        super().__init__(
+            dataprovider, template, instrumentation, parallel, max_workers, lazy
+        )
         self._fig = figure
+        self.auto_build = True
+        self.max_builds = max_builds
+        self._builds_left = None
+        self._skipped_builds = False
+        self._draw_cid = None
         self.dummy = None
+        self._pending = {}
         self.axes = {}
         self.artists = {}
         self.track_axes_map = []
+        self.drawn_tracks = []
         self.layer_axes_map = []
         self.legend_axes_map = []
         self.header_axes_map = []
@@ -109,7 +167,34 @@ class LogPlot:
     def fig(self, value):
         self._fig = value
 
-    def draw(self):
+    @property
+    def report(self):
+        if self.instrumentation is None:
+            return None
+        return self.instrumentation.report()
+
+    def _instrument(self, artist, record, dataprovider=None):
+        if self.instrumentation is None:
+            return dataprovider
+        self.instrumentation.wrap_draw(artist, record)
+        if dataprovider is not None:
+            return self.instrumentation.wrap_dataprovider(dataprovider, record)
+
+    def _count_points(self, ax, record):
+        if self.instrumentation is not None:
+            record["points"] = count_points(ax)
+
+    def draw(self, prepared=None, tracks=None, header=True):
+        if self.instrumentation is None:
+            session = contextlib.nullcontext()
+        else:
+            session = self.instrumentation.session()
+
+        with session, self._measure("figure") as record:
+            self._instrument(self.fig, record)
+            self._draw(prepared, tracks, header)
+
+    def _draw(self, prepared, tracks, header):
         figsize = [
             a / self.template["figure"]["dpi"] for a in self.template["figure"]["size"]
         ]
@@ -124,49 +209,274 @@ class LogPlot:
 
         self.ylims = []
 
-        for track in self.template["tracks"]:
-            track_layer_axes_map = []
-            track_legend_axes_map = []
+        window, dataprovider = self._get_draw_dataprovider()
 
-            track_ax, track_ax_id = self._draw_track(track)
+        # Lazy plots also prepare the data upfront: it is cheap next to
+        # building the artists, and gives the same depth extent as eager plots
+        if prepared is None and dataprovider is not None:
+            prepared = self.prepare(dataprovider, tracks)
+
+        if self.lazy:
+            self._start_builds()
+
+        for i, track in enumerate(self.template["tracks"]):
+            if tracks is not None and i not in tracks:
+                continue
+
+            track_ax_id, track_layer_axes_map, track_legend_axes_map = (
+                self._draw_full_track(i, track, prepared, dataprovider)
+            )
 
-            self.axes[track_ax_id] = track_ax
             self.track_axes_map.append(track_ax_id)
+            self.drawn_tracks.append(i)
+            self.layer_axes_map.append(track_layer_axes_map)
+            self.legend_axes_map.append(track_legend_axes_map)
+
+        if header and "header" in self.template:
+            self._draw_full_header(dataprovider)
+
+        self._set_initial_ylim(window, prepared)
+
+    def _set_initial_ylim(self, window, prepared):
+        if window is not None:
+            self.set_ylim(window[1], window[0])
+            return
+
+        if self.lazy and prepared is not None:
+            # The layers are not built yet, take the limits they will set from
+            # their prepared data
+            for track_prepared in prepared:
+                for layer_prepared in track_prepared:
+                    if isinstance(layer_prepared, dict):
+                        ylim = layer_prepared.get("ylim", None)
+                        if ylim is not None:
+                            self.ylims.append(list(ylim))
+
+        if not self.ylims:
+            return
+
+        with self._measure("ylim"):
+            ymax = max(filter(np.isfinite, (max(a) for a in self.ylims)))
+            ymin = min(filter(np.isfinite, (min(a) for a in self.ylims)))
+            self.set_ylim(ymax, ymin)
+
+    def _get_draw_dataprovider(self):
+        if self.lazy and not self.dataprovider.ready():
+            # The data is still being loaded, deferred layers get their data
+            # provider when they are built
+            return None, None
+        return self.get_depth_window(), self.get_dataprovider()
+
+    def _draw_full_track(self, i, track, prepared, dataprovider):
+        with self._measure("track", track=i) as record:
+            track_ax, track_ax_id = self._draw_track(track, record)
+            self.axes[track_ax_id] = track_ax
+
+            track_layer_axes_map, track_legend_axes_map = self._draw_track_layers(
+                i, track, prepared, dataprovider
+            )
+
+        return track_ax_id, track_layer_axes_map, track_legend_axes_map
 
-            for layer in track["layers"]:
-                legend = layer.get("legend", None)
+    def _draw_track_layers(self, i, track, prepared, dataprovider, k=None):
+        # If `k` is given, the axes of the k-th drawn track are reused
+        track_layer_axes_map = []
+        track_legend_axes_map = []
 
-                layer_ax, layer_ax_id = self._draw_layer(layer, track)
-                self.axes[layer_ax_id] = layer_ax
-                track_layer_axes_map.append(layer_ax_id)
+        for j, layer in enumerate(track["layers"]):
+            legend = layer.get("legend", None)
+            layer_prepared = None if prepared is None else prepared[i][j]
 
-                if legend is not None:
-                    legend_ax, legend_ax_id = self._draw_legend(legend, layer, track)
-                    self.axes[legend_ax_id] = legend_ax
-                    track_legend_axes_map.append(legend_ax_id)
+            axes = None
+            if k is not None:
+                axes = self._clear_axes(self.layer_axes_map[k][j])
+
+            if self.lazy:
+                layer_ax, layer_ax_id = self._defer_layer(
+                    i, j, layer, track, layer_prepared, dataprovider, axes
+                )
+            else:
+                with self._measure(
+                    "layer", track=i, layer=j, type=layer["type"]
+                ) as record:
+                    layer_ax, layer_ax_id = self._draw_layer(
+                        layer, track, record, layer_prepared, dataprovider, axes
+                    )
+            self.axes[layer_ax_id] = layer_ax
+            track_layer_axes_map.append(layer_ax_id)
+
+            if legend is not None:
+                axes = None
+                if k is not None:
+                    axes = self._clear_axes(self.legend_axes_map[k][j])
+
+                if self.lazy:
+                    legend_ax, legend_ax_id = self._defer_legend(
+                        i, j, legend, layer, track, dataprovider, axes
+                    )
                 else:
-                    track_legend_axes_map.append(None)
+                    with self._measure(
+                        "legend", track=i, layer=j, type=legend["type"]
+                    ) as record:
+                        legend_ax, legend_ax_id = self._draw_legend(
+                            legend, layer, track, record, dataprovider, axes
+                        )
+                self.axes[legend_ax_id] = legend_ax
+                track_legend_axes_map.append(legend_ax_id)
+            else:
+                track_legend_axes_map.append(None)
 
-            self.layer_axes_map.append(track_layer_axes_map)
-            self.legend_axes_map.append(track_legend_axes_map)
+        return track_layer_axes_map, track_legend_axes_map
+
+    def _draw_full_header(self, dataprovider):
+        header = self.template["header"]
+        track = self.template["tracks"]
+        with self._measure("header", type=header["type"]) as record:
+            header_ax, header_ax_id = self._draw_header(
+                header, track, record, dataprovider
+            )
+
+        self.axes[header_ax_id] = header_ax
+        self.header_axes_map.append(header_ax_id)
+
+    def redraw(self, tracks=(), header=False):
+        """Rebuilds some tracks in place, keeping the current depth limits.
+
+        Parameters
+        ----------
+        tracks : iterable of int, optional
+            Indexes, in the template, of the tracks to rebuild. They must
+            have been drawn before.
+        header : bool, optional
+            If True, the header is also rebuilt.
+        """
+        tracks = list(tracks)
+        ylim = self.get_ylim()
+
+        _, dataprovider = self._get_draw_dataprovider()
+
+        prepared = None
+        if tracks and dataprovider is not None:
+            prepared = self.prepare(dataprovider, tracks)
+
+        for i in tracks:
+            k = self.drawn_tracks.index(i)
+            self._remove_axes(
+                [self.track_axes_map[k]]
+                + self.layer_axes_map[k]
+                + self.legend_axes_map[k]
+            )
 
-        if "header" in self.template:
-            header = self.template["header"]
-            track = self.template["tracks"]
-            header_ax, header_ax_id = self._draw_header(header, track)
+            track = self.template["tracks"][i]
+            track_ax_id, track_layer_axes_map, track_legend_axes_map = (
+                self._draw_full_track(i, track, prepared, dataprovider)
+            )
 
-            self.axes[header_ax_id] = header_ax
-            self.header_axes_map.append(header_ax_id)
+            self.track_axes_map[k] = track_ax_id
+            self.layer_axes_map[k] = track_layer_axes_map
+            self.legend_axes_map[k] = track_legend_axes_map
+
+        if header:
+            self._remove_axes(self.header_axes_map)
+            self.header_axes_map = []
+            if "header" in self.template:
+                self._draw_full_header(dataprovider)
+
+        self.set_ylim(ylim)
+
+    def update(self):
+        """Shows the samples appended to the data since the plot was drawn.
+
+        Only the layers whose artist has an `update` method (e.g. lines) are
+        updated, the others keep showing the data they were built with.
+
+        Returns
+        -------
+        bool
+            Whether any artist changed.
+        """
+        dataprovider = self.get_dataprovider()
+        changed = False
+        for k, i in enumerate(self.drawn_tracks):
+            track = self.template["tracks"][i]
+            for layer, ax_id in zip(track["layers"], self.layer_axes_map[k]):
+                update = getattr(self.artists.get(ax_id, None), "update", None)
+                if update is not None and update(dataprovider, layer, track):
+                    changed = True
+        return changed
+
+    def replace_data(self, dataprovider, prepared=None):
+        """Shows other data (e.g. another well) in the plot already drawn.
+
+        The figure and the axes, with the tracks grids, are kept. The
+        layers, legends and header are cleared and drawn again in the same
+        axes, and the depth limits are set as `draw` would for the new data.
+
+        Parameters
+        ----------
+        dataprovider : DataProvider
+            The new data.
+        prepared : list, optional
+            The layers data already prepared from `dataprovider`, as returned
+            by `prepare`.
+        """
+        self.dataprovider = dataprovider
+        self.ylims = []
 
-        ymax = max(filter(np.isfinite, (max(a) for a in self.ylims)))
-        ymin = min(filter(np.isfinite, (min(a) for a in self.ylims)))
-        self.set_ylim(ymax, ymin)
+        window, dataprovider = self._get_draw_dataprovider()
+
+        if prepared is None and dataprovider is not None:
+            prepared = self.prepare(dataprovider, self.drawn_tracks)
+
+        if self.lazy:
+            self._start_builds()
+
+        for k, i in enumerate(self.drawn_tracks):
+            track = self.template["tracks"][i]
+            with self._measure("track", track=i):
+                self._draw_track_layers(i, track, prepared, dataprovider, k)
+
+        if self.header_axes_map:
+            # The header is drawn last, so a new axes keeps the drawing order
+            self._remove_axes(self.header_axes_map)
+            self.header_axes_map = []
+            self._draw_full_header(dataprovider)
+
+        self._set_initial_ylim(window, prepared)
+
+    def _remove_axes(self, ax_ids):
+        for ax_id in ax_ids:
+            if ax_id is None:
+                continue
+            artist = self.artists.pop(ax_id, None)
+            remove = getattr(artist, "remove", None)
+            if remove is not None:
+                remove()
+            self._pending.pop(ax_id, None)
+            self.axes.pop(ax_id).remove()
+
+    def _clear_axes(self, ax_id):
+        artist = self.artists.pop(ax_id, None)
+        remove = getattr(artist, "remove", None)
+        if remove is not None:
+            remove()
+        if self._pending.pop(ax_id, None) is not None:
+            # Restore the draw method replaced by `_defer`
+            del self.axes[ax_id].draw
+        ax = self.axes[ax_id]
+        ax.cla()
+        return ax, ax_id
+
+    def _get_layer_data(self, layer_type):
+        # Layer artists derive from the layer data classes, and custom artists
+        # may bring their own `prepare` and `window`
+        return self._layer_artists[layer_type]
 
     def set_ylim(self, *args, **kwargs):
         self.dummy.set_ylim(*args, **kwargs)
 
     def get_ylim(self, *args, **kwargs):
-        self.dummy.get_ylim(*args, **kwargs)
+        return self.dummy.get_ylim(*args, **kwargs)
 
     def _set_linear_grid(self, axis, grid):
         g = copy.deepcopy(grid)
@@ -199,7 +509,7 @@ class LogPlot:
         if minor is not None:
             numticks = minor.get("numticks", int(base))
             subs = np.linspace(1.0, base, numticks)[1:-1]
-            line = minor.pop("line", {})
+            line = minor.get("line", {})
             axis.set_minor_locator(LogLocator(base=base, subs=subs))
             linekwargs = {}
             for k, v in line.items():
@@ -211,8 +521,9 @@ class LogPlot:
         ax = self.fig.add_axes(rect, sharey=self.dummy, label=ax_id)
         return ax, ax_id
 
-    def _draw_track(self, track):
+    def _draw_track(self, track, record=None):
         ax, ax_id = self._create_ax(track["rect"])
+        self._instrument(ax, record)
         # prepare_clean_ax(ax, **track)
         xgrid = track.get("grid", {}).get("x", None)
         ygrid = track.get("grid", {}).get("y", None)
@@ -232,50 +543,198 @@ class LogPlot:
             self._set_linear_grid(ax.yaxis, ygrid)
         return ax, ax_id
 
-    def _draw_layer(self, layer, track):
+    def _draw_layer(
+        self, layer, track, record=None, prepared=None, dataprovider=None, axes=None
+    ):
+        ax, ax_id = self._create_ax(layer["rect"]) if axes is None else axes
+        prepare_transparent_ax(ax, **track)
+        self._attach_layer(ax, ax_id, layer, track, record, prepared, dataprovider)
+        return ax, ax_id
+
+    def _attach_layer(
+        self, ax, ax_id, layer, track, record=None, prepared=None, dataprovider=None
+    ):
         layer = copy.deepcopy(layer)
         track = copy.deepcopy(track)
 
-        ax, ax_id = self._create_ax(layer["rect"])
-        prepare_transparent_ax(ax, **track)
+        if dataprovider is None:
+            dataprovider = self.dataprovider
+        dataprovider = self._instrument(ax, record, dataprovider)
 
         layer_artist = self._layer_artists[layer["type"]]
 
-        def set_ylim(s, *args):
+        def set_ylim(s, *args, **kwargs):
             if len(args) == 1:
                 self.ylims.append(args[0])
             else:
                 self.ylims.append(list(args))
 
+        kwargs = {}
+        if prepared is not None:
+            kwargs["prepared"] = prepared
+
         with monkeypatchmethod(ax, "set_ylim", set_ylim):
-            artist = layer_artist(ax, self.dataprovider, layer, track)
+            artist = layer_artist(ax, dataprovider, layer, track, **kwargs)
         self.artists[ax_id] = artist
+        self._count_points(ax, record)
 
+    def _draw_legend(
+        self, legend, layer, track, record=None, dataprovider=None, axes=None
+    ):
+        ax, ax_id = self._create_ax(legend["rect"]) if axes is None else axes
+        prepare_clean_ax(ax, **track)
+        self._attach_legend(ax, ax_id, legend, layer, track, record, dataprovider)
         return ax, ax_id
 
-    def _draw_legend(self, legend, layer, track):
+    def _attach_legend(
+        self, ax, ax_id, legend, layer, track, record=None, dataprovider=None
+    ):
         legend = copy.deepcopy(legend)
         layer = copy.deepcopy(layer)
         track = copy.deepcopy(track)
 
-        ax, ax_id = self._create_ax(legend["rect"])
-        prepare_clean_ax(ax, **track)
+        if dataprovider is None:
+            dataprovider = self.dataprovider
+        dataprovider = self._instrument(ax, record, dataprovider)
 
         legend_artist = self._legend_artists[legend["type"]]
 
-        artist = legend_artist(ax, self.dataprovider, legend, layer, track)
+        artist = legend_artist(ax, dataprovider, legend, layer, track)
         self.artists[ax_id] = artist
+        self._count_points(ax, record)
+
+    def _start_builds(self):
+        # With `max_builds`, each canvas draw builds at most that many deferred
+        # axes and asks for another draw if some visible ones were left out
+        self._builds_left = self.max_builds
+        self._skipped_builds = False
+        if self.max_builds is not None and self._draw_cid is None:
+            self._draw_cid = self.fig.canvas.mpl_connect(
+                "draw_event", self._on_draw_event
+            )
+
+    def _on_draw_event(self, event):
+        self._builds_left = self.max_builds
+        if self._skipped_builds:
+            self._skipped_builds = False
+            self.fig.canvas.draw_idle()
+
+    def _defer(self, ax, ax_id, build):
+        # Runs `build` right before the first draw of the axes that happens
+        # while it is visible and inside the figure
+        draw = ax.draw
+        self._pending[ax_id] = build
+
+        def lazy_draw(renderer, *args, **kwargs):
+            if not (self.auto_build and ax.get_visible() and is_in_view(ax)):
+                return draw(renderer, *args, **kwargs)
+            # Saved images always get all the layers
+            saving = getattr(ax.figure.canvas, "_is_saving", False)
+            if self._builds_left == 0 and not saving:
+                self._skipped_builds = True
+                return draw(renderer, *args, **kwargs)
+            ax.draw = draw
+            self._build(ax_id)
+            if self._builds_left is not None:
+                self._builds_left -= 1
+            return ax.draw(renderer, *args, **kwargs)
+
+        ax.draw = lazy_draw
+
+    def _build(self, ax_id):
+        build = self._pending.pop(ax_id, None)
+        if build is None:
+            return
+        # Artists may change the shared y limits (e.g. legends), restoring
+        # them also notifies the new artists of the current limits
+        ylim = self.get_ylim()
+        try:
+            build()
+        except ValueError as e:
+            # TODO: warning
+            msg = f"WARNING: {e}"
+            print(msg)
+        self.set_ylim(ylim)
+
+    def _defer_layer(
+        self, i, j, layer, track, prepared=None, dataprovider=None, axes=None
+    ):
+        ax, ax_id = self._create_ax(layer["rect"]) if axes is None else axes
+        prepare_transparent_ax(ax, **track)
 
+        def build():
+            if isinstance(prepared, Exception):
+                raise prepared
+            with self._measure("layer", track=i, layer=j, type=layer["type"]) as record:
+                self._attach_layer(
+                    ax,
+                    ax_id,
+                    layer,
+                    track,
+                    record,
+                    prepared,
+                    self._get_build_dataprovider(dataprovider),
+                )
+
+        self._defer(ax, ax_id, build)
         return ax, ax_id
 
-    def _draw_header(self, header, track):
+    def _defer_legend(self, i, j, legend, layer, track, dataprovider=None, axes=None):
+        ax, ax_id = self._create_ax(legend["rect"]) if axes is None else axes
+        prepare_clean_ax(ax, **track)
+
+        def build():
+            with self._measure("legend", track=i, layer=j, type=legend["type"]) as record:
+                self._attach_legend(
+                    ax,
+                    ax_id,
+                    legend,
+                    layer,
+                    track,
+                    record,
+                    self._get_build_dataprovider(dataprovider),
+                )
+
+        self._defer(ax, ax_id, build)
+        return ax, ax_id
+
+    def _get_build_dataprovider(self, dataprovider):
+        # Layers deferred while the data was loading did not get one
+        if dataprovider is None:
+            return self.get_dataprovider()
+        return dataprovider
+
+    def build(self, count=None):
+        """Builds the layers and legends still deferred by a lazy plot.
+
+        Parameters
+        ----------
+        count : int, optional
+            Maximum number of axes to build. Defaults to all of them.
+
+        Returns
+        -------
+        int
+            Number of axes still deferred.
+        """
+        for ax_id in list(self._pending)[:count]:
+            self._build(ax_id)
+        return len(self._pending)
+
+    def _draw_header(self, header, track, record=None, dataprovider=None):
+        header = copy.deepcopy(header)
+
         ax, ax_id = self._create_ax(header["rect"])
         prepare_clean_ax(ax, **header)
+        if dataprovider is None:
+            dataprovider = self.dataprovider
+        dataprovider = self._instrument(ax, record, dataprovider)
 
         header_artist = self._header_artists[header["type"]]
 
-        artist = header_artist(ax, self.dataprovider, header, track)
+        artist = header_artist(ax, dataprovider, header, track)
         self.artists[ax_id] = artist
+        self._count_points(ax, record)
 
         return ax, ax_id
 
@@ -433,285 +892,759 @@ class DummyLegendArtist:
         self.ax = ax
 
 
+@LogPlot.register_legend_artist("lithology")
+class LithologyLegendArtist:
+    # TODO: text properties
+    LABEL_VERTICAL_POSITION = 0.75
+    SWATCHES_BOTTOM = 0.05
+    SWATCHES_HEIGHT = 0.4
+
+    def __init__(self, ax, dataprovider, legend, layer, track):
+        self.ax = ax
+
+        label = legend.get("label", layer.get("label", None))
+        if label is None:
+            label = dataprovider.get_label(layer["data"])
+
+        self.label_text = ax.text(
+            0.5,
+            self.LABEL_VERTICAL_POSITION,
+            label,
+            ha="center",
+            va="center",
+            transform=self.ax.transAxes,
+        )
+
+        codes = layer.get("codes", [])
+        width = 1.0 / max(len(codes), 1)
+        self.swatches = []
+        self.swatch_texts = []
+        for k, code in enumerate(codes):
+            patchkwargs = LithologyLayerArtist._get_patch_kwargs(code.get("patch", {}))
+            swatch = Rectangle(
+                (k * width, self.SWATCHES_BOTTOM),
+                width,
+                self.SWATCHES_HEIGHT,
+                transform=self.ax.transAxes,
+                **patchkwargs,
+            )
+            self.ax.add_patch(swatch)
+            self.swatches.append(swatch)
+
+            text = ax.text(
+                (k + 0.5) * width,
+                self.SWATCHES_BOTTOM + self.SWATCHES_HEIGHT / 2.0,
+                str(code.get("label", code["code"])),
+                ha="center",
+                va="center",
+                fontsize="x-small",
+                transform=self.ax.transAxes,
+            )
+            self.swatch_texts.append(text)
+
+        self.ax.set_xlim(0.0, 1.0)
+        self.ax.set_ylim(0.0, 1.0)
+
+
+@LogPlot.register_legend_artist("image")
+class ImageLegendArtist:
+    # TODO: text properties
+    LIMITS_VERTICAL_POSITION = 0.1
+    LIMITS_HORIZONTAL_POSITION = 0.02
+    LABEL_VERTICAL_POSITION = 0.75
+    COLORBAR_EXTENT = (0.25, 0.75, 0.15, 0.35)
+
+    def __init__(self, ax, dataprovider, legend, layer, track):
+        self.ax = ax
+
+        label = legend.get("label", layer.get("label", None))
+        if label is None:
+            label = dataprovider.get_label(layer["data"])
+        limits = legend.get("limits", layer.get("limits", None))
+        if limits is None:
+            limits = {}
+        if "color" not in limits:
+            limits["color"] = dataprovider.get_range(
+                dict(layer["data"]["x"], source="array_logs")
+            )
+        limits_format = legend.get("format", "{:.3g}")
+
+        self.left_text = ax.text(
+            self.LIMITS_HORIZONTAL_POSITION,
+            self.LIMITS_VERTICAL_POSITION,
+            limits_format.format(limits["color"][0]),
+            ha="left",
+            va="baseline",
+            transform=self.ax.transAxes,
+        )
+
+        self.right_text = ax.text(
+            1.0 - self.LIMITS_HORIZONTAL_POSITION,
+            self.LIMITS_VERTICAL_POSITION,
+            limits_format.format(limits["color"][1]),
+            ha="right",
+            va="baseline",
+            transform=self.ax.transAxes,
+        )
+
+        self.label_text = ax.text(
+            0.5,
+            self.LABEL_VERTICAL_POSITION,
+            label,
+            va="center",
+            ha="center",
+            transform=self.ax.transAxes,
+        )
+
+        self.colorbar = ax.imshow(
+            np.linspace(0.0, 1.0, 256)[np.newaxis, :],
+            cmap=layer.get("colormap", None),
+            aspect="auto",
+            extent=self.COLORBAR_EXTENT,
+            transform=self.ax.transAxes,
+        )
+
+        self.ax.set_xlim(0.0, 1.0)
+        self.ax.set_ylim(0.0, 1.0)
+
+
+@LogPlot.register_legend_artist("zonestats")
+class ZoneStatsLegendArtist:
+    # TODO: text properties
+    LIMITS_VERTICAL_POSITION = 0.1
+    LIMITS_HORIZONTAL_POSITION = 0.02
+    LABEL_VERTICAL_POSITION = 0.75
+    SWATCH_RECT = (0.25, 0.15, 0.5, 0.2)
+
+    def __init__(self, ax, dataprovider, legend, layer, track):
+        self.ax = ax
+
+        label = legend.get("label", layer.get("label", None))
+        if label is None:
+            label = dataprovider.get_label(layer["data"])
+        statistic = layer.get("statistic", "mean")
+        limits = legend.get("limits", layer.get("limits", None))
+        if limits is None:
+            limits = {}
+        if "x" not in limits:
+            limits["x"] = ZoneStatsLayerArtist.get_default_limits(dataprovider, layer)
+
+        self.label_text = ax.text(
+            0.5,
+            self.LABEL_VERTICAL_POSITION,
+            f"{label} {statistic}",
+            va="center",
+            ha="center",
+            transform=self.ax.transAxes,
+        )
+
+        self.left_text = ax.text(
+            self.LIMITS_HORIZONTAL_POSITION,
+            self.LIMITS_VERTICAL_POSITION,
+            str(limits["x"][0]),
+            ha="left",
+            va="baseline",
+            transform=self.ax.transAxes,
+        )
+
+        self.right_text = ax.text(
+            1.0 - self.LIMITS_HORIZONTAL_POSITION,
+            self.LIMITS_VERTICAL_POSITION,
+            str(limits["x"][1]),
+            ha="right",
+            va="baseline",
+            transform=self.ax.transAxes,
+        )
+
+        patchkwargs = LithologyLayerArtist._get_patch_kwargs(layer.get("patch", {}))
+        left, bottom, width, height = self.SWATCH_RECT
+        self.swatch = Rectangle(
+            (left, bottom), width, height, transform=self.ax.transAxes, **patchkwargs
+        )
+        self.ax.add_patch(self.swatch)
+
+        self.ax.set_xlim(0.0, 1.0)
+        self.ax.set_ylim(0.0, 1.0)
+
+
 # @LogPlot.register_legend_artist("patches")
 # class PatchesLegendArtist:
 #     pass
 
 
 @LogPlot.register_layer_artist("line")
-class LineLayerArtist:
-    def __init__(self, ax, dataprovider, layer, track):
+class LineLayerArtist(LineLayerData):
+    # matplotlib copies the whole data of a line on `set_data`, so samples
+    # appended by `update` go to a tail line, which is frozen and replaced by a
+    # new one once it holds this many samples. The cost of an update therefore
+    # does not grow with the length of the curve (the pattern of dashed lines
+    # restarts at each tail).
+    TAIL_SIZE = 4096
+
+    def __init__(self, ax, dataprovider, layer, track, prepared=None):
         self.ax = ax
 
-        xlim = layer.get("limits", {}).get("x", None)
-        if xlim is None:
-            xlim = dataprovider.get_range(layer["data"]["x"])
-        # Line can be None, so the approach above won't work
-        if "line" in layer:
-            line = layer["line"]
-        else:
-            line = dataprovider.get_line(layer["data"]["x"])
-        marker = layer.get("marker", None)
-        if marker is None:
-            # TODO: implement
-            # marker = dataprovider.get_marker(layer["data"]["x"])
-            marker = {}
+        if prepared is None:
+            prepared = self.prepare(dataprovider, layer, track)
 
-        linekwargs = {}
-        if line is not None:
-            for k, v in line.items():
-                linekwargs[_TR_LINE_MATPLOTLIB_LINE[k]] = v
-        else:
-            linekwargs["linestyle"] = "none"
+        self.kwargs = prepared["kwargs"]
+        (self.line,) = self.ax.plot(prepared["x"], prepared["y"], **self.kwargs)
+        self.start, self.stop = prepared["slice"]
+        self.size = prepared["size"]
 
-        markerkwargs = {}
-        if marker is not None:
-            for k, v in marker.items():
-                markerkwargs[_TR_MARKER_MATPLOTLIB_MARKER[k]] = v
+        # The line receiving the appended samples, starting at `tail_start`
+        self.tail = self.line
+        self.tail_start = self.start
+
+        self.ax.set_xlim(prepared["xlim"])
+        if prepared["scale"] == "log":
+            self.ax.set_xscale("log")
+        if prepared["ylim"] is not None:
+            self.ax.set_ylim(*prepared["ylim"])
 
+    def update(self, dataprovider, layer, track):
         data = dataprovider.get_data(layer["data"])
         xdata = data["x"]["data"]
         ydata = data["y"]["data"]
 
-        idx0 = max(get_starting_nans(a) for a in (xdata, ydata))
-        idxn = len(xdata) - 1 - max(get_starting_nans(a[::-1]) for a in (xdata, ydata))
-        slc = slice(idx0, idxn + 1)
+        size = len(xdata)
+        if size <= self.size:
+            return False
 
-        (self.line,) = self.ax.plot(
-            xdata[slc], ydata[slc], **linekwargs, **markerkwargs
-        )
+        # Only the appended samples can move the end of the valid data
+        new = slice(self.size, size)
+        valid = np.flatnonzero(~(np.isnan(xdata[new]) | np.isnan(ydata[new])))
+        self.size = size
+        if len(valid) == 0:
+            return False
 
-        ymin = min(ydata[idx0], ydata[idxn])
-        ymax = max(ydata[idx0], ydata[idxn])
-        scale = track.get("scale", "linear")
-        self.ax.set_xlim(xlim)
-        if scale == "log":
-            self.ax.set_xscale("log")
-        self.ax.set_ylim(ymax, ymin)
+        if self.start >= self.stop:
+            self.start = self.tail_start = new.start + valid[0]
+        elif self.stop - self.tail_start >= self.TAIL_SIZE:
+            # The new tail starts at the last drawn sample, so the curve stays
+            # connected; its marker is already drawn by the previous line.
+            self.tail_start = self.stop - 1
+            (self.tail,) = self.ax.plot([], [], markevery=slice(1, None), **self.kwargs)
+        self.stop = new.start + valid[-1] + 1
+
+        slc = slice(self.tail_start, self.stop)
+        self.tail.set_data(xdata[slc], ydata[slc])
+        return True
 
 
 @LogPlot.register_layer_artist("text")
-class TextLayerArtist:
-    def __init__(self, ax, dataprovider, layer, track):
+class TextLayerArtist(TextLayerData):
+    def __init__(self, ax, dataprovider, layer, track, prepared=None):
         self.ax = ax
-        self._cid = self.ax.callbacks.connect("ylim_changed", self._callback)
 
+        # Depending on the matplotlib version, shared axes may only emit
+        # ylim_changed on the axes that was changed directly, so listen on
+        # every axes this one shares its y axis with.
+        self._cids = []
+        for sibling in self.ax.get_shared_y_axes().get_siblings(self.ax):
+            cid = sibling.callbacks.connect("ylim_changed", self._callback)
+            self._cids.append((sibling, cid))
+
+        # Pool of Text artists, reused across callbacks. Only the first
+        # `n_visible` are shown.
         self.texts = []
+        self.n_visible = 0
+        self._ylim = None
 
-        text = layer.get("text", None)
-        if text is None:
-            # TODO: implement
-            # text = dataprovider.get_text(layer["data"]["x"])
-            text = {}
+        if prepared is None:
+            prepared = self.prepare(dataprovider, layer, track)
 
-        self.text_properties = text
+        self.text_properties = prepared["text"]
+        self.x_is_y = prepared["x_is_y"]
+        self.xdata = prepared["x"]
+        self.ydata = prepared["y"]
+        self.index = prepared["index"]
 
-        self.x_is_y = layer["data"]["x"] == layer["data"]["y"]
+        if prepared["ylim"] is not None:
+            self.ax.set_ylim(*prepared["ylim"])
 
-        if self.x_is_y:
-            self.xdata = None
-            self.ydata = None
-        else:
-            data = dataprovider.get_data(layer["data"])
-            self.ydata = data["y"].data
-            self.xdata = data["x"].data
-
-            idx0 = max(get_starting_nans(a) for a in (self.ydata, self.xdata))
-            idxn = (
-                len(self.ydata)
-                - 1
-                - max(get_starting_nans(a[::-1]) for a in (self.ydata, self.xdata))
-            )
-            ymin = min(self.ydata[idx0], self.ydata[idxn])
-            ymax = max(self.ydata[idx0], self.ydata[idxn])
+    def _interp(self, ypositions):
+        return self.index.interp(ypositions, self.xdata)
 
-            self.ax.set_ylim(ymax, ymin)
+    def _get_text(self, i):
+        if i < len(self.texts):
+            return self.texts[i]
+
+        text = self.ax.text(
+            0.5,
+            0.0,
+            "",
+            ha="center",
+            va="center",
+            transform=self.ax.get_yaxis_transform(),
+            **self.text_properties,
+        )
+        self.texts.append(text)
+        return text
+
+    def remove(self):
+        for sibling, cid in self._cids:
+            sibling.callbacks.disconnect(cid)
+        self._cids = []
 
     def _callback(self, ax):
-        if self.ax is not ax:
+        if not self.ax.get_shared_y_axes().joined(self.ax, ax):
             return
 
-        for i in range(len(self.texts)):
-            text = self.texts.pop()
-            text.remove()
+        # Siblings are updated only after the callbacks run, so read the
+        # limits from the axes that emitted the event and ask the locator
+        # for the ticks explicitly instead of relying on its axis state
+        ymin, ymax = sorted(ax.get_ylim())
+        if (ymin, ymax) == self._ylim:
+            return
+        self._ylim = (ymin, ymax)
 
-        ypositions = self.ax.get_yticks()
+        locator = self.ax.yaxis.get_major_locator()
+        ypositions = np.asarray(locator.tick_values(ymin, ymax))
+        ypositions = ypositions[(ypositions > ymin) & (ypositions < ymax)]
         if self.x_is_y:
             xpositions = ypositions
         else:
-            xpositions = np.interp(ypositions, self.ydata, self.xdata)
+            xpositions = self._interp(ypositions)
 
-        ymin, ymax = sorted(self.ax.get_ylim())
+        for i, (y, x) in enumerate(zip(ypositions, xpositions)):
+            text = self._get_text(i)
+            text.set_y(y)
+            text.set_text(str(x))
+            text.set_visible(True)
 
-        for y, x in zip(ypositions, xpositions):
-            if not (ymin < y < ymax):
-                continue
+        for text in self.texts[len(ypositions) : self.n_visible]:
+            text.set_visible(False)
 
-            text = self.ax.text(
-                0.5,
-                y,
-                str(x),
-                ha="center",
-                va="center",
-                transform=self.ax.get_yaxis_transform(),
-                **self.text_properties,
-            )
-            self.texts.append(text)
+        self.n_visible = len(ypositions)
 
     def __del__(self):
-        self.ax.callbacks.disconnect(self._cid)
+        for ax, cid in self._cids:
+            ax.callbacks.disconnect(cid)
 
 
 @LogPlot.register_layer_artist("fillbetween")
-class FillBetweenLayerArtist:
+class FillBetweenLayerArtist(FillBetweenLayerData):
     # TODO: logscale ?
-    def __init__(self, ax, dataprovider, layer, track):
+    def __init__(self, ax, dataprovider, layer, track, prepared=None):
+        self.ax = ax
+
+        if prepared is None:
+            prepared = self.prepare(dataprovider, layer, track)
+
+        interp = True
+
+        self.left_fill = ax.fill_betweenx(
+            prepared["y"],
+            prepared["left"],
+            prepared["right"],
+            prepared["lwhere"],
+            interpolate=interp,
+            **prepared["patches"]["left"],
+        )
+        self.right_fill = ax.fill_betweenx(
+            prepared["y"],
+            prepared["left"],
+            prepared["right"],
+            prepared["rwhere"],
+            interpolate=interp,
+            **prepared["patches"]["right"],
+        )
+
+        self.ax.set_xlim(0.0, 1.0)
+        if prepared["ylim"] is not None:
+            self.ax.set_ylim(*prepared["ylim"])
+
+
+@LogPlot.register_layer_artist("intervals")
+class IntervalsLayerArtist(IntervalsLayerData):
+    # TODO: allow text
+    def __init__(self, ax, dataprovider, layer, track, prepared=None):
         self.ax = ax
 
-        patches = {}
-        transforms = {}
+        if prepared is None:
+            prepared = self.prepare(dataprovider, layer, track)
+
+        self.patch_collections = []
+
+        for patchkwargs, tops, bottoms in prepared["zones"]:
+            rectangles = []
+            for top, bottom in zip(tops, bottoms):
+                rect = Rectangle((0.0, top), 1.0, bottom - top)
+                rectangles.append(rect)
+
+            pc = PatchCollection(
+                rectangles, transform=self.ax.get_yaxis_transform(), **patchkwargs
+            )
+            self.ax.add_collection(pc)
+            self.patch_collections.append(pc)
+
+        self.ax.set_xlim(0.0, 1.0)
+        self.ax.set_ylim(*prepared["ylim"])
+
+
+@LogPlot.register_layer_artist("lithology")
+class LithologyLayerArtist(LithologyLayerData):
+    """Discrete curve (e.g. lithology codes) drawn as filled intervals.
 
-        def get_transform(a, b):
-            def transform(x):
-                return (x - a) / (b - a)
+    Runs of samples with the same code become one rectangle spanning the
+    whole layer, each sample covering the depth up to half way to its
+    neighbours. The rectangles of a code share a single `PatchCollection`.
 
-            return transform
+    The style of each code is given in the 'codes' list of the layer, as
+    mappings with the 'code' and 'patch' keys. Codes not listed use the
+    'patch' of the layer, or are not drawn if there is none.
+    """
 
-        for side in ["left", "right"]:
-            patch = {}
-            for k, v in layer[side]["patch"].items():
-                patch[_TR_PATCH_MATPLOTLIB_PATCH[k]] = v
-            patch["linewidth"] = 0.0
+    def __init__(self, ax, dataprovider, layer, track, prepared=None):
+        self.ax = ax
 
-            patches[side] = patch
+        if prepared is None:
+            prepared = self.prepare(dataprovider, layer, track)
 
-            # TODO: get it properly, like on other artists
-            xlim = layer[side].get("limits", {}).get("x", None)
-            if xlim is None:
-                xlim = dataprovider.get_range(layer[side]["data"]["x"])
-            a, b = xlim
+        self.patch_collections = []
 
-            def transform(x):
-                return (x - a) / (b - a)
+        for code, patchkwargs, tops, bottoms in prepared["codes"]:
+            rectangles = []
+            for top, bottom in zip(tops, bottoms):
+                rect = Rectangle((0.0, top), 1.0, bottom - top)
+                rectangles.append(rect)
 
-            transforms[side] = get_transform(a, b)
+            pc = PatchCollection(
+                rectangles, transform=self.ax.get_yaxis_transform(), **patchkwargs
+            )
+            self.ax.add_collection(pc)
+            self.patch_collections.append(pc)
 
-        # TODO: y???
-        layer_data = {
-            "left": layer["left"]["data"]["x"],
-            "right": layer["right"]["data"]["x"],
-            "y": layer.get("data", layer["left"]["data"])["y"],
-            "source": "well_logs",
-        }
+        self.ax.set_xlim(0.0, 1.0)
+        if prepared["ylim"] is not None:
+            self.ax.set_ylim(*prepared["ylim"])
 
-        self.left_fills = []
-        self.right_fills = []
-        ymin = np.inf
-        ymax = -np.inf
 
-        data = dataprovider.get_data(layer_data)
+@LogPlot.register_layer_artist("image")
+class ImageLayerArtist(ImageLayerData):
+    """Array log (e.g. a borehole image or a spectral log) drawn as an image,
+    with depth on the vertical axis and channels on the horizontal one.
 
-        ldata = transforms["left"](data["left"].data)
-        rdata = transforms["right"](data["right"].data)
-        ydata = data["y"].data
+    Only the samples inside the visible depth range are read, and they are
+    block averaged down to the pixel size of the axes before being handed to
+    matplotlib, so the array log can be a memory map of any size. The image is
+    resampled whenever the depth range changes. The depth is assumed to be
+    regularly sampled.
 
-        idx0 = max(get_starting_nans(a) for a in (ldata, rdata, ydata))
-        idxn = (
-            len(ldata)
-            - 1
-            - max(get_starting_nans(a[::-1]) for a in (ldata, rdata, ydata))
+    The colors are set by the 'colormap' of the layer (a matplotlib colormap
+    name) and by its 'limits.color', which defaults to the range of the data.
+    Setting the limits avoids reading the whole array log to compute it.
+    """
+
+    def __init__(self, ax, dataprovider, layer, track, prepared=None):
+        self.ax = ax
+
+        # Same as TextLayerArtist, listen on every axes sharing the y axis
+        self._cids = []
+        for sibling in self.ax.get_shared_y_axes().get_siblings(self.ax):
+            cid = sibling.callbacks.connect("ylim_changed", self._callback)
+            self._cids.append((sibling, cid))
+        self._ylim = None
+
+        if prepared is None:
+            prepared = self.prepare(dataprovider, layer, track)
+
+        self.xdata = prepared["x"]
+        self.ydata = prepared["y"]
+        self.index = prepared["index"]
+        self.channels = prepared["channels"]
+
+        self.image = self.ax.imshow(
+            np.full((1, 1), np.nan),
+            aspect="auto",
+            interpolation="nearest",
+            origin="upper",
+            **prepared["kwargs"],
         )
-        slc = slice(idx0, idxn + 1)
+        self.image.set_visible(False)
+
+        self.ax.set_xlim(0.0, self.channels)
+        if prepared["ylim"] is not None:
+            self.ax.set_ylim(*prepared["ylim"])
+
+    def _render(self, ymin, ymax):
+        slc = get_window_slice(self.index, ymin, ymax)
+        xdata = self.xdata[slc]
+        ydata = self.ydata[slc]
+        n = len(ydata)
+        if n == 0:
+            self.image.set_visible(False)
+            return
 
-        not_nan = ~(np.isnan(ldata[slc]) | np.isnan(rdata[slc]))
-        lwhere = np.zeros(idxn - idx0 + 1, dtype=bool)
-        rwhere = np.zeros(idxn - idx0 + 1, dtype=bool)
-        lwhere[not_nan] = ldata[slc][not_nan] > rdata[slc][not_nan]
-        rwhere[not_nan] = rdata[slc][not_nan] > ldata[slc][not_nan]
+        bbox = self.ax.get_window_extent()
+        rows = max(int(np.ceil(bbox.height)), 1)
+        cols = max(int(np.ceil(bbox.width)), 1)
+        image = block_average(xdata, rows, cols)
+
+        # Each sample covers half a step on each side. The image rows and
+        # columns are all drawn with the same size, so the extent covers whole
+        # blocks, a short last block included
+        step = (ydata[-1] - ydata[0]) / (n - 1) if n > 1 else 1.0
+        top = ydata[0] - step / 2
+        bottom = top + image.shape[0] * get_block_factor(n, rows) * step
+        right = image.shape[1] * get_block_factor(self.channels, cols)
+        self.image.set_data(image)
+        self.image.set_extent((0.0, right, bottom, top))
+        self.image.set_visible(True)
+
+    def remove(self):
+        for sibling, cid in self._cids:
+            sibling.callbacks.disconnect(cid)
+        self._cids = []
 
-        interp = True
+    def _callback(self, ax):
+        if not self.ax.get_shared_y_axes().joined(self.ax, ax):
+            return
 
-        self.left_fill = ax.fill_betweenx(
-            ydata[slc],
-            ldata[slc],
-            rdata[slc],
-            lwhere,
-            interpolate=interp,
-            **patches["left"],
+        # Siblings are updated only after the callbacks run, so read the
+        # limits from the axes that emitted the event
+        ymin, ymax = sorted(ax.get_ylim())
+        if (ymin, ymax) == self._ylim:
+            return
+        self._ylim = (ymin, ymax)
+        self._render(ymin, ymax)
+
+    def __del__(self):
+        for ax, cid in self._cids:
+            ax.callbacks.disconnect(cid)
+
+
+@LogPlot.register_layer_artist("zonestats")
+class ZoneStatsLayerArtist(ZoneStatsLayerData):
+    """Statistics of a well log in each zone, drawn as a bar and a value
+    spanning the zone.
+
+    Zones go from a marker down to the next one, using the markers given by
+    the 'zones' query of the layer data (e.g. 'data.zones.family: tops'). The
+    'statistic' of the layer is one of the keys computed by
+    `get_zonal_statistics` for the curve ('mean', 'p50', ...), or 'net' or
+    'net_to_gross' along with a 'cutoff' mapping with the 'data' query of the
+    cutoff curve and its 'max' and/or 'min'. The bars are scaled by
+    'limits.x' and styled by 'patch'; the values are formatted with 'format'.
+    """
+
+    TEXT_HORIZONTAL_POSITION = 0.98
+
+    def __init__(self, ax, dataprovider, layer, track, prepared=None):
+        self.ax = ax
+
+        if prepared is None:
+            prepared = self.prepare(dataprovider, layer, track)
+
+        tops = prepared["top"]
+        bottoms = prepared["bottom"]
+        values = prepared["value"]
+        a, b = prepared["xlim"]
+        widths = np.clip((values - a) / (b - a), 0.0, 1.0)
+
+        rectangles = []
+        for top, bottom, width in zip(tops, bottoms, widths):
+            if np.isfinite(width):
+                rectangles.append(Rectangle((0.0, top), width, bottom - top))
+        self.bars = PatchCollection(
+            rectangles, transform=self.ax.get_yaxis_transform(), **prepared["patch"]
         )
-        self.right_fill = ax.fill_betweenx(
-            ydata[slc],
-            ldata[slc],
-            rdata[slc],
-            rwhere,
-            interpolate=interp,
-            **patches["right"],
+        self.ax.add_collection(self.bars)
+
+        segments = np.empty((2 * len(tops), 2, 2))
+        segments[:, :, 0] = [0.0, 1.0]
+        segments[:, :, 1] = np.concatenate((tops, bottoms))[:, np.newaxis]
+        self.boundaries = LineCollection(
+            segments, transform=self.ax.get_yaxis_transform(), **prepared["line"]
         )
+        self.ax.add_collection(self.boundaries)
 
-        ymin = min(ydata[idx0], ydata[idxn])
-        ymax = max(ydata[idx0], ydata[idxn])
+        self.texts = []
+        for top, bottom, value in zip(tops, bottoms, values):
+            if not np.isfinite(value):
+                continue
+            text = self.ax.text(
+                self.TEXT_HORIZONTAL_POSITION,
+                (top + bottom) / 2.0,
+                prepared["format"].format(value),
+                ha="right",
+                va="center",
+                clip_on=True,
+                transform=self.ax.get_yaxis_transform(),
+                **prepared["text"],
+            )
+            self.texts.append(text)
 
         self.ax.set_xlim(0.0, 1.0)
-        self.ax.set_ylim(ymax, ymin)
+        if prepared["ylim"] is not None:
+            self.ax.set_ylim(*prepared["ylim"])
 
 
-@LogPlot.register_layer_artist("intervals")
-class IntervalsLayerArtist:
-    # TODO: allow text
+@LogPlot.register_layer_artist("crossplot")
+class CrossplotLayerArtist(CrossplotLayerData):
+    """Density crossplot of two curves (see `crossplot.Crossplot`) drawn in a
+    track, next to the logs.
+
+    The layer takes the same keys as `Crossplot.from_template`, plus 'color'
+    ('count' or 'mean') and 'colormap'. The samples counted are those inside
+    the depth window of the plot. The crossplot has its own x and y axes, so
+    it is drawn in axes coordinates and does not follow later changes of the
+    depth limits.
+    """
+
+    def __init__(self, ax, dataprovider, layer, track, prepared=None):
+        self.ax = ax
+
+        if prepared is None:
+            prepared = self.prepare(dataprovider, layer, track)
+
+        # The prepared data only holds plain values, so it can be hashed
+        norm = prepared["norm"]
+        if norm is not None:
+            _, vmin, vmax = norm
+            norm = LogNorm(vmin, vmax)
+
+        self.mesh = self.ax.pcolormesh(
+            prepared["x"],
+            prepared["y"],
+            prepared["values"],
+            cmap=prepared["colormap"],
+            norm=norm,
+            transform=self.ax.transAxes,
+        )
+
+
+@LogPlot.register_layer_artist("dummy")
+class DummyLayerArtist:
     def __init__(self, ax, dataprovider, layer, track):
         self.ax = ax
-        well_interval_lists = {}
-        zones = {}
-        for well_interval in dataprovider.get_data(layer["data"]):
-            if well_interval.zone.id not in well_interval_lists:
-                well_interval_lists[well_interval.zone.id] = []
-                zones[well_interval.zone.id] = well_interval.zone
-            well_interval_lists[well_interval.zone.id].append(well_interval)
 
-        self.patch_collections = []
 
-        ymin = np.inf
-        ymax = -np.inf
+@LogPlot.register_layer_artist("markers")
+class MarkersLayerArtist(MarkersLayerData):
+    """Markers (e.g. formation tops) drawn as horizontal lines with labels.
 
-        for zone_id, well_intervals in well_interval_lists.items():
-            zone = zones[zone_id]
-            patchkwargs = {
-                "facecolor": zone.patch_property.color,
-                "hatch": zone.patch_property.hatch,
-                "edgecolor": zone.patch_property.hatchcolor,
-                "alpha": zone.patch_property.alpha,
-                "linewidth": 0.0,
-                "transform": self.ax.get_yaxis_transform(),
-            }
+    All the lines are a single `LineCollection`. Labels are only created for
+    the markers in the visible depth range, from a pool of reused `Text`
+    artists. When they would overlap, they are pushed down just enough to
+    fit. If there are more markers than labels fit in the layer, only the
+    first marker of each label-sized depth slot is labeled.
+    """
 
-            rectangles = []
+    LABEL_HORIZONTAL_POSITION = 0.98
+    # Minimum distance between labels, in font sizes
+    LABEL_SPACING = 1.2
 
-            for well_interval in well_intervals:
-                top = well_interval.depth_interval.top.depth
-                bottom = well_interval.depth_interval.bottom.depth
-                rect = Rectangle((0.0, top), 1.0, bottom - top)
-                rectangles.append(rect)
+    def __init__(self, ax, dataprovider, layer, track, prepared=None):
+        self.ax = ax
 
-                ymin = min(ymin, min(top, bottom))
-                ymax = max(ymax, max(top, bottom))
+        # Same as TextLayerArtist, listen on every axes sharing the y axis
+        self._cids = []
+        for sibling in self.ax.get_shared_y_axes().get_siblings(self.ax):
+            cid = sibling.callbacks.connect("ylim_changed", self._callback)
+            self._cids.append((sibling, cid))
 
-            pc = PatchCollection(rectangles, **patchkwargs)
-            self.ax.add_collection(pc)
-            self.patch_collections.append(pc)
+        self.texts = []
+        self.n_visible = 0
+        self._ylim = None
+
+        if prepared is None:
+            prepared = self.prepare(dataprovider, layer, track)
+
+        self.depth = prepared["depth"]
+        self.names = prepared["name"]
+        self.text_properties = prepared["text"]
+
+        segments = np.empty((len(self.depth), 2, 2))
+        segments[:, :, 0] = [0.0, 1.0]
+        segments[:, :, 1] = self.depth[:, np.newaxis]
+        self.lines = LineCollection(
+            segments, transform=self.ax.get_yaxis_transform(), **prepared["kwargs"]
+        )
+        self.ax.add_collection(self.lines)
 
         self.ax.set_xlim(0.0, 1.0)
-        self.ax.set_ylim(ymax, ymin)
+        if prepared["ylim"] is not None:
+            self.ax.set_ylim(*prepared["ylim"])
 
+    def _get_text(self, i):
+        if i < len(self.texts):
+            return self.texts[i]
 
-@LogPlot.register_layer_artist("dummy")
-class DummyLayerArtist:
-    def __init__(self, ax, dataprovider, layer, track):
-        self.ax = ax
+        text = self.ax.text(
+            self.LABEL_HORIZONTAL_POSITION,
+            0.0,
+            "",
+            ha="right",
+            va="bottom",
+            transform=self.ax.get_yaxis_transform(),
+            **self.text_properties,
+        )
+        self.texts.append(text)
+        return text
+
+    def _get_label_spacing(self, ymin, ymax):
+        # Height of a label in depth units
+        size = FontProperties(size=self.text_properties.get("size", None))
+        height = size.get_size_in_points() * self.ax.figure.dpi / 72.0
+        pixels = self.ax.get_window_extent().height
+        if pixels <= 0.0:
+            return np.inf
+        return self.LABEL_SPACING * height * (ymax - ymin) / pixels
+
+    def remove(self):
+        for sibling, cid in self._cids:
+            sibling.callbacks.disconnect(cid)
+        self._cids = []
 
+    def _callback(self, ax):
+        if not self.ax.get_shared_y_axes().joined(self.ax, ax):
+            return
 
-# @LogPlot.register_layer_artist("markers")
-# class MarkersLayerArtist:
-#     pass
+        # Siblings are updated only after the callbacks run, so read the
+        # limits from the axes that emitted the event
+        ymin, ymax = sorted(ax.get_ylim())
+        if (ymin, ymax) == self._ylim:
+            return
+        self._ylim = (ymin, ymax)
+
+        i0 = np.searchsorted(self.depth, ymin, side="left")
+        i1 = np.searchsorted(self.depth, ymax, side="right")
+        depth = self.depth[i0:i1]
+        names = self.names[i0:i1]
+
+        spacing = self._get_label_spacing(ymin, ymax)
+        if np.isfinite(spacing) and len(depth) > (ymax - ymin) / spacing:
+            # Too many markers to label them all, keep one per slot
+            slots = np.floor((depth - ymin) / spacing)
+            _, keep = np.unique(slots, return_index=True)
+            depth = depth[keep]
+            names = names[keep]
+
+        if np.isfinite(spacing):
+            ypositions = spread_labels(depth, spacing)
+            inside = ypositions <= ymax
+            ypositions = ypositions[inside]
+            names = names[inside]
+        else:
+            ypositions = depth[:0]
+            names = names[:0]
+
+        for i, (y, name) in enumerate(zip(ypositions, names)):
+            text = self._get_text(i)
+            text.set_y(y)
+            text.set_text(str(name))
+            text.set_visible(True)
+
+        for text in self.texts[len(ypositions) : self.n_visible]:
+            text.set_visible(False)
+
+        self.n_visible = len(ypositions)
+
+    def __del__(self):
+        for ax, cid in self._cids:
+            ax.callbacks.disconnect(cid)
 
 
 @LogPlot.register_header_artist("simple")
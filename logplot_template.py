@@ -1,6 +1,16 @@
 import copy
+import hashlib
+import json
+import os
+import pickle
+import uuid
 from collections.abc import Mapping, MutableSequence
 
+# Bump whenever `parse` changes its output, so compiled templates are rebuilt
+PARSER_VERSION = 4
+
+_COMPILED_TEMPLATES_DIR = "__appycache__"
+
 
 # TODO: register this together with the artists
 _DEFAULT_LEGEND_TYPES = {
@@ -8,7 +18,11 @@ _DEFAULT_LEGEND_TYPES = {
     "text": "simple",
     "fillbetween": "patches",
     "intervals": "patches",
+    "lithology": "lithology",
+    "image": "image",
+    "zonestats": "zonestats",
     "markers": "simple",
+    "crossplot": "simple",
     "dummy": "dummy",
 }
 
@@ -17,21 +31,49 @@ _DEFAULT_DATA_SOURCES = {
     "text": "well_log",
     "fillbetween": "well_log",
     "intervals": "zone_families",
+    "lithology": "well_log",
+    "image": "array_log",
+    "zonestats": "well_log",
     "markers": "marker_families",
+    "crossplot": "well_log",
     "dummy": None
 }
 #
 
+_SCALAR_TYPES = frozenset((str, int, float, bool, type(None)))
+
+
+# Templates are made of plain dicts and lists (loaded from YAML or JSON), so
+# check for those first and only fall back to the much slower abstract classes
+def _is_mapping(value):
+    t = type(value)
+    if t is dict:
+        return True
+    if t is list or t in _SCALAR_TYPES:
+        return False
+    return isinstance(value, Mapping)
+
+
+def _is_sequence(value):
+    t = type(value)
+    if t is list:
+        return True
+    if t is dict or t in _SCALAR_TYPES:
+        return False
+    return isinstance(value, MutableSequence)
+
+
 def deep_update(d1, d2):
     for key, value in d2.items():
-        if isinstance(value, Mapping):
+        if _is_mapping(value):
             d1[key] = deep_update(d1.get(key, {}), value)
         else:
             d1[key] = value
     return d1
 
 
-def expand_keys(d1):
+def _group_keys(d1):
+    # Non-recursive part of expand_keys: groups the dotted keys of a mapping
     d2 = {}
     for key, value in d1.items():
         if "." in key:
@@ -45,8 +87,8 @@ def expand_keys(d1):
                 raise ValueError(msg)
         else:
             if key in d2:
-                if isinstance(d2[key], Mapping):
-                    if isinstance(value, Mapping):
+                if _is_mapping(d2[key]):
+                    if _is_mapping(value):
                         for k, v in value.items():
                             if k not in d2[key]:
                                 d2[key][k] = v
@@ -61,13 +103,18 @@ def expand_keys(d1):
                     raise ValueError(msg)
             else:
                 d2[key] = value
+    return d2
+
+
+def expand_keys(d1):
+    d2 = _group_keys(d1)
     for key, value in d2.items():
-        if isinstance(value, Mapping):
+        if _is_mapping(value):
             d2[key] = expand_keys(value)
-        elif isinstance(value, MutableSequence):
+        elif _is_sequence(value):
             li = []
             for el in value:
-                if isinstance(el, Mapping):
+                if _is_mapping(el):
                     li.append(expand_keys(el))
                 else:
                     li.append(el)
@@ -116,14 +163,14 @@ def get_references(template):
     references = {}
 
     for key, value in template.items():
-        if isinstance(value, Mapping):
+        if _is_mapping(value):
             if "id" in value:
                 key = value.pop("id")
                 references[key] = value
             references = deep_update(references, get_references(value))
-        elif isinstance(value, MutableSequence):
+        elif _is_sequence(value):
             for el in value:
-                if isinstance(el, Mapping):
+                if _is_mapping(el):
                     if "id" in el:
                         key = el.pop("id")
                         references[key] = el
@@ -134,14 +181,14 @@ def get_references(template):
 
 def apply_references(template, references):
     for key, value in template.items():
-        if isinstance(value, Mapping):
+        if _is_mapping(value):
             if "reference" in value:
                 key = value.pop("reference")
                 value = deep_update(value, references[key])
             apply_references(value, references)
-        elif isinstance(value, MutableSequence):
+        elif _is_sequence(value):
             for el in value:
-                if isinstance(el, Mapping):
+                if _is_mapping(el):
                     if "reference" in el:
                         key = el.pop("reference")
                         el = deep_update(el, references[key])
@@ -332,15 +379,277 @@ def apply_axes_rectangles(template, track_rects, layer_rects, legend_rects, head
     return template
 
 
+# Length of one inch in each depth unit
+_INCH = {
+    "m": 0.0254,
+    "ft": 1.0 / 12.0,
+}
+
+
+def get_depth_span(template, scale, unit="m"):
+    """Depth shown by the tracks when plotted at a 1:`scale` depth scale."""
+    height = template["figure"]["size"][1] / template["figure"]["dpi"]
+    track_height = height * template["tracks"][0]["rect"][3]
+    return track_height * _INCH[unit] * scale
+
+
+def apply_depth(template):
+    if "depth" not in template:
+        return template
+
+    depth = template["depth"]
+    rng = depth.get("range", None)
+    if rng is None:
+        rng = [None, None]
+    if len(rng) != 2:
+        raise ValueError(f"Depth range must be [top, bottom], got {rng}")
+    depth["range"] = list(rng)
+
+    scale = depth.get("scale", None)
+    if scale is not None:
+        unit = depth.setdefault("unit", "m")
+        if unit not in _INCH:
+            raise ValueError(f"Unknown depth unit: {unit}")
+        depth["span"] = get_depth_span(template, scale, unit)
+    else:
+        depth["span"] = None
+
+    return template
+
+
+def _copy_tree(value):
+    # Same as copy.deepcopy for the plain mappings and sequences of a template,
+    # without the memo bookkeeping
+    if _is_mapping(value):
+        return {k: _copy_tree(v) for k, v in value.items()}
+    elif _is_sequence(value):
+        return [_copy_tree(v) for v in value]
+    return value
+
+
+def _copy_mappings(value):
+    # Same as deep_update({}, value): copies the mappings, shares the rest
+    return {k: _copy_mappings(v) if _is_mapping(v) else v for k, v in value.items()}
+
+
+def _has_key(value, key):
+    if _is_mapping(value):
+        return key in value or any(_has_key(v, key) for v in value.values())
+    elif _is_sequence(value):
+        return any(_has_key(v, key) for v in value)
+    return False
+
+
+def _register_reference(ids, key, value, nested):
+    if key in ids:
+        # Ids are expected to be unique, repeated ones are merged
+        value = deep_update(_copy_mappings(ids[key][0]), value)
+        nested = True
+    ids[key] = (value, nested)
+
+
+def _collect_references(value, ids, nested):
+    for v in value.values():
+        if _is_mapping(v):
+            children = (v,)
+        elif _is_sequence(v):
+            children = [el for el in v if _is_mapping(el)]
+        else:
+            continue
+        for child in children:
+            key = child.pop("id", None)
+            _collect_references(child, ids, True)
+            if key is not None:
+                _register_reference(ids, key, child, nested)
+
+
+def _expand_merge(d1, d2, state, nested):
+    # Same as deep_update(d1, expand_keys(d2)) in a single walk over d2. When
+    # `state` is given, also pops and registers the ids of the resulting
+    # mappings and flags whether any reference was found.
+    for key, value in _group_keys(d2).items():
+        if _is_mapping(value):
+            d1[key] = _expand_merge(d1.get(key, {}), value, state, True)
+        elif _is_sequence(value):
+            d1[key] = [
+                _expand_merge({}, el, state, True) if _is_mapping(el) else el
+                for el in value
+            ]
+        else:
+            d1[key] = value
+    if state is not None:
+        if "id" in d1:
+            _register_reference(state["ids"], d1.pop("id"), d1, nested)
+        if "reference" in d1:
+            state["references"] = True
+    return d1
+
+
+def normalize(template):
+    """Single-pass equivalent of `expand_keys`, `apply_defaults`,
+    `apply_legends`, `apply_data_sources` and `get_references`, followed by
+    `apply_references`.
+
+    Each track and layer is expanded, merged with its defaults, completed with
+    its legend and data source and has its ids gathered in one walk. The
+    references are then applied in a second walk, skipped if there are none.
+    """
+    root = _group_keys(template)
+
+    defaults = expand_keys(root.pop("defaults", {}))
+    tracks_defaults = defaults.get("tracks", {})
+    layers_defaults = defaults.get("layers", {})
+
+    # Ids coming from the defaults would be copied on every track or layer, so
+    # in that unusual case gather the ids in a separate walk
+    if _has_key(defaults, "id"):
+        state = None
+    else:
+        state = {"ids": {}, "references": _has_key(defaults, "reference")}
+
+    template = {}
+    for key, value in root.items():
+        if key == "tracks":
+            template[key] = None
+        elif key == "header":
+            header_defaults = _copy_tree(defaults.get("header", {}))
+            template[key] = _expand_merge(header_defaults, value, state, False)
+        elif _is_mapping(value):
+            template[key] = _expand_merge({}, value, state, False)
+        elif _is_sequence(value):
+            template[key] = [
+                _expand_merge({}, el, state, False) if _is_mapping(el) else el
+                for el in value
+            ]
+        else:
+            template[key] = value
+
+    tracks = []
+    for t in root["tracks"]:
+        t = _group_keys(t)
+        raw_layers = t.pop("layers")
+
+        layers = []
+        for raw_layer in raw_layers:
+            raw_layer = _group_keys(raw_layer)
+            if raw_layer.get("inherit", True):
+                layer = _expand_merge(
+                    _copy_tree(layers_defaults), raw_layer, state, True
+                )
+            else:
+                layer = _expand_merge({}, raw_layer, state, True)
+
+            if "legend" not in layer:
+                legend_type = _DEFAULT_LEGEND_TYPES[layer["type"]]
+                if legend_type is not None:
+                    layer["legend"] = {"type": legend_type}
+                else:
+                    layer["legend"] = None
+            if "data" in layer and "source" not in layer["data"]:
+                data_source = _DEFAULT_DATA_SOURCES[layer["type"]]
+                if data_source is not None:
+                    layer["data"]["source"] = data_source
+
+            layers.append(layer)
+
+        if t.get("inherit", True):
+            track = _expand_merge(_copy_tree(tracks_defaults), t, state, False)
+        else:
+            track = _expand_merge({}, t, state, False)
+        track["layers"] = layers
+        tracks.append(track)
+
+    template["tracks"] = tracks
+
+    if state is None:
+        ids = {}
+        _collect_references(template, ids, False)
+    else:
+        ids = state["ids"]
+
+    # Like get_references, nested ids refer to a snapshot of the mapping taken
+    # before any reference is applied, while top level ones are live
+    references = {}
+    for key, (value, nested) in ids.items():
+        references[key] = _copy_mappings(value) if nested else value
+
+    if state is None or state["references"]:
+        apply_references(template, references)
+
+    return template
+
+
 def parse(template):
-    template = expand_keys(template)
-    template = apply_defaults(template)
-    template = apply_legends(template, _DEFAULT_LEGEND_TYPES)
-    template = apply_data_sources(template, _DEFAULT_DATA_SOURCES)
-    ref = get_references(template)
-    template = apply_references(template, ref)
+    template = normalize(template)
     track_rects, layer_rects, legend_rects, header_rects = get_axes_rectangles(template)
     apply_axes_rectangles(template, track_rects, layer_rects, legend_rects, header_rects)
+    template = apply_depth(template)
     template["schema"] = "appy-logplot-template-final"
 
     return template
+
+
+def read(path):
+    """Reads a template file without parsing it. The format ('appy' for YAML or
+    'json') is given by the file extension."""
+    templateformat = path.split(".")[-1]
+    if templateformat == "appy":
+        import yaml
+
+        with open(path, "r") as f:
+            return yaml.safe_load(f)
+    elif templateformat == "json":
+        with open(path, "r") as f:
+            return json.load(f)
+    else:
+        raise NotImplementedError(f"Not valid template file format: {templateformat}")
+
+
+def get_compiled_path(path, cache_dir=None):
+    if cache_dir is None:
+        directory = os.path.dirname(os.path.abspath(path))
+        cache_dir = os.path.join(directory, _COMPILED_TEMPLATES_DIR)
+    return os.path.join(cache_dir, os.path.basename(path) + ".pickle")
+
+
+def load(path, cache_dir=None):
+    """Reads and parses a template file, reusing its compiled version if the file
+    did not change.
+
+    The compiled template is the output of `parse` pickled together with the
+    SHA-256 of the template file and `PARSER_VERSION`. It is stored in
+    `cache_dir`, which defaults to a '__appycache__' directory next to the
+    template file. Failing to write the compiled template is not an error.
+    """
+    with open(path, "rb") as f:
+        source = f.read()
+    digest = hashlib.sha256(source).hexdigest()
+
+    compiled_path = get_compiled_path(path, cache_dir)
+    try:
+        with open(compiled_path, "rb") as f:
+            compiled = pickle.load(f)
+        if compiled["version"] == PARSER_VERSION and compiled["hash"] == digest:
+            return compiled["template"]
+    except (OSError, pickle.UnpicklingError, EOFError, KeyError, TypeError):
+        pass
+
+    template = parse(read(path))
+
+    compiled = {"version": PARSER_VERSION, "hash": digest, "template": template}
+    # Write to a temporary file first, so concurrent readers never see a
+    # partially written file
+    tmppath = f"{compiled_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.makedirs(os.path.dirname(compiled_path), exist_ok=True)
+        with open(tmppath, "wb") as f:
+            pickle.dump(compiled, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmppath, compiled_path)
+    except OSError:
+        # Do not leave the partial file behind (e.g. the disk is full)
+        try:
+            os.remove(tmppath)
+        except OSError:
+            pass
+
+    return template
@@ -1,61 +1,384 @@
+"""Command line interface.
+
+Usage: python main.py [--timings] <command> [options]
+
+Commands
+--------
+inspect   Prints the header of a LAS file or LAS store.
+convert   Converts a LAS file or LAS store to a LAS file or LAS store.
+validate  Checks LAS files, optionally writing repaired copies.
+render    Renders a log plot to an image file, or shows it in a window.
+report    Renders many wells into a multi-page PDF file.
+vertices  Exports the geometry of a log plot for clients that draw it.
+serve     Renders log plots on request over HTTP, keeping the data in memory.
+view      Shows the log plot set up in 'config.json' (the default command).
+
+Modules are imported by the commands that need them, when they run, so the
+commands that do not plot never import matplotlib or the plotting modules.
+`--timings` prints the time spent importing modules and running the command.
+"""
+import argparse
+import importlib
 import json
-import yaml
-import matplotlib.pyplot as plt
+import os
+import sys
+import time
+
+_timings = {"import": 0.0}
 
-import las2
-from logplot import LogPlot
-from data_provider import DataProvider
-from logplot_template import parse as parse_template
+# Layers and legends built on each draw of the interactive views, the others
+# are built on the following (idle) draws
+_MAX_BUILDS_PER_DRAW = 4
+
+
+def _import(name):
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    _timings["import"] += time.perf_counter() - start
+    return module
 
 
 def get_well_name(lasfile):
+    well_name = None
     for row in lasfile["well"]:
         if row["mnemonic"] == "WELL":
             well_name = row["value"]
-    
+
     return well_name
 
-print("Loading configuration file.")
 
-with open("config.json", "r") as f:
-    config = json.load(f)
+def _read_lasfile(path, header_only=False):
+    # LAS stores are directories, anything else is read as a LAS file
+    if os.path.isdir(path):
+        store = _import("las_store").LASStore(path)
+        if header_only:
+            lasfile = dict(store.header["sections"])
+            lasfile["rows"] = store.size
+            lasfile["array"] = store.arrays
+            return lasfile
+        return store.to_las()
+
+    las2 = _import("las2")
+    if header_only:
+        return las2.read_header(path)
+    return las2.read(path)
+
+
+def inspect(args):
+    lasfile = _read_lasfile(args.path, header_only=True)
+
+    if args.json:
+        print(json.dumps(lasfile, indent=4))
+        return 0
+
+    print(f"Well: {get_well_name(lasfile)}")
+    for row in lasfile.get("well", []):
+        print("    {mnemonic:<8} {value:<24} {description}".format(**row))
+    if "rows" in lasfile:
+        print(f"Rows: {lasfile['rows']}")
+    print(f"Curves: {len(lasfile.get('curve', []))}")
+    for row in lasfile.get("curve", []):
+        print("    {mnemonic:<8} {unit:<8} {description}".format(**row))
+    if lasfile.get("array", []):
+        print(f"Array logs: {len(lasfile['array'])}")
+        for row in lasfile["array"]:
+            line = "    {mnemonic:<8} {unit:<8} {channels:>5} channels  {description}"
+            print(line.format(**row))
+    return 0
+
+
+def convert(args):
+    lasfile = _read_lasfile(args.source)
+
+    if args.destination.lower().endswith(".las"):
+        if lasfile.pop("array", []):
+            print("WARNING: Array logs cannot be written to a LAS file, skipping them.")
+        _import("las2").write(args.destination, lasfile)
+    else:
+        _import("las_store").create(args.destination, lasfile)
+    return 0
+
+
+def validate(args):
+    las_validation = _import("las_validation")
+    reports = las_validation.validate_files(
+        args.paths, repair_dir=args.repair_dir, max_workers=args.workers
+    )
+
+    if args.json:
+        print(json.dumps(reports, indent=4))
+    else:
+        for report in reports:
+            status = "OK" if report["valid"] else "INVALID"
+            print(f"{report['path']}: {status}")
+            for issue in report["issues"]:
+                print(f"    {issue['severity']}: {issue['message']}")
+            if report["repaired"] is not None:
+                print(f"    Repaired copy written to {report['repaired']}")
+
+    return 0 if all(report["valid"] for report in reports) else 1
+
+
+def _load_dataprovider(path, markerspath=None):
+    lasfile = _read_lasfile(path)
+    if markerspath is not None:
+        lasfile["markers"] = _import("markers").read(markerspath)
+    return _import("data_provider").DataProvider(lasfile), lasfile
+
+
+def render(args):
+    template = _import("logplot_template").load(args.template)
+    if args.top is not None or args.bottom is not None:
+        # The compiled template is shared, only replace its depth window
+        template = dict(template)
+        template["depth"] = {"range": [args.top, args.bottom], "span": None}
+
+    dataprovider, lasfile = _load_dataprovider(args.lasfile, args.markers)
+    LogPlot = _import("logplot").LogPlot
+
+    if args.output is not None:
+        logplot = LogPlot(dataprovider, template)
+        logplot.draw()
+        logplot.fig.savefig(args.output, dpi=args.dpi)
+        return 0
+
+    plt = _import("matplotlib.pyplot")
+    fig = plt.figure()
+    try:
+        well_name = get_well_name(lasfile)
+        if well_name is not None:
+            fig.canvas.manager.set_window_title(well_name)
+        logplot = LogPlot(
+            dataprovider, template, fig, lazy=True, max_builds=_MAX_BUILDS_PER_DRAW
+        )
+        logplot.draw()
+        plt.show()
+    finally:
+        plt.close(fig)
+    return 0
+
+
+def report(args):
+    template = _import("logplot_template").load(args.template)
+    metadata = {"Title": args.title} if args.title is not None else None
+    pages = _import("report").export_pdf(args.output, args.lasfiles, template, metadata)
+    print(f"{pages} pages written to {args.output}")
+    return 0 if pages == len(args.lasfiles) else 1
+
+
+def vertices(args):
+    template = _import("logplot_template").load(args.template)
+    dataprovider, _ = _load_dataprovider(args.lasfile, args.markers)
+    _import("vertex_export").export_vertices(
+        dataprovider, template, args.directory, chunk_size=args.chunk_size
+    )
+    return 0
+
+
+def serve(args):
+    render_server = _import("render_server")
+    service = render_server.RenderService(
+        args.root, max_lasfiles=args.max_lasfiles, max_plots=args.max_plots
+    )
+    server = render_server.RenderServer(
+        (args.host, args.port), service, max_workers=args.workers, verbose=True
+    )
+    print(f"Serving {service.root} on http://{args.host}:{args.port}/render")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def view(args):
+    print("Loading configuration file.")
+
+    with open(args.config, "r") as f:
+        config = json.load(f)
+
+    lasfilepath = config["lasfile"].pop("path")
+    templatepath = config["template"].pop("path")
+    background = config.get("viewer", {}).get("background_loading", False)
+    watch = config.get("viewer", {}).get("watch", False)
+    follow = config.get("viewer", {}).get("follow", False)
+    markerspath = config.get("markers", {}).get("path", None)
+
+    plt = _import("matplotlib.pyplot")
+    load_template = _import("logplot_template").load
+
+    if watch:
+        print("Loading the view. The files are watched for changes.")
+
+        fig = plt.figure()
+        watcher = _import("watch").Watcher(args.config, fig)
+    elif follow:
+        print("Reading template file.")
+
+        template = load_template(templatepath)
+
+        print("Loading the view. The LAS file is followed as it grows.")
+
+        fig = plt.figure()
+        viewer = _import("viewer").FollowViewer(lasfilepath, template, fig)
+    elif background:
+        print("Reading template file.")
+
+        template = load_template(templatepath)
+
+        print("Loading the view. The LAS file is read in the background.")
+
+        fig = plt.figure()
+        viewer = _import("viewer").AsyncViewer(lasfilepath, template, fig)
+    else:
+        print("Reading template file.")
+
+        template = load_template(templatepath)
+
+        print("Reading LAS file.")
+
+        lasfile = _import("las2").read(lasfilepath)
+        if markerspath is not None:
+            print("Reading markers file.")
+
+            lasfile["markers"] = _import("markers").read(markerspath)
+        dataprovider = _import("data_provider").DataProvider(lasfile)
+        well_name = get_well_name(lasfile)
+
+        print("Loading the view.")
+
+        fig = plt.figure()
+        if well_name is not None:
+            fig.canvas.manager.set_window_title(well_name)
+    try:
+        if watch:
+            watcher.start()
+        elif follow or background:
+            viewer.start()
+        else:
+            LogPlot = _import("logplot").LogPlot
+            logplot = LogPlot(
+                dataprovider, template, fig, lazy=True, max_builds=_MAX_BUILDS_PER_DRAW
+            )
+            logplot.draw()
+
+        plt.show()
+    finally:
+        plt.close(fig)
+
+    print("Closing program.")
+    return 0
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        prog="main.py", description="Log plots of LAS 2.0 files."
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="print the time spent importing modules and running the command",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    p = subparsers.add_parser("inspect", help="print the header of a LAS file or store")
+    p.add_argument("path", help="LAS file or LAS store directory")
+    p.add_argument("--json", action="store_true", help="print the header as JSON")
+    p.set_defaults(func=inspect)
+
+    p = subparsers.add_parser(
+        "convert",
+        help="convert between LAS files and LAS stores",
+        description="The destination is written as a LAS file if its name ends "
+        "with '.las', and as a LAS store directory otherwise.",
+    )
+    p.add_argument("source", help="LAS file or LAS store directory")
+    p.add_argument("destination", help="LAS file or LAS store directory")
+    p.set_defaults(func=convert)
+
+    p = subparsers.add_parser("validate", help="check LAS files")
+    p.add_argument("paths", nargs="+", help="LAS files")
+    p.add_argument("--repair-dir", help="write repaired copies to this directory")
+    p.add_argument("--workers", type=int, help="number of worker processes")
+    p.add_argument("--json", action="store_true", help="print the reports as JSON")
+    p.set_defaults(func=validate)
+
+    p = subparsers.add_parser("render", help="render a log plot")
+    p.add_argument("lasfile", help="LAS file or LAS store directory")
+    p.add_argument("template", help="template file ('.appy' or '.json')")
+    p.add_argument(
+        "-o", "--output", help="image file to write, shown in a window if omitted"
+    )
+    p.add_argument("--markers", help="CSV file with the markers of the well")
+    p.add_argument("--top", type=float, help="top of the depth window")
+    p.add_argument("--bottom", type=float, help="bottom of the depth window")
+    p.add_argument("--dpi", type=float, help="resolution of the image file")
+    p.set_defaults(func=render)
 
-lasfilepath = config["lasfile"].pop("path")
-templatepath = config["template"].pop("path")
-templateformat = templatepath.split(".")[-1]
+    p = subparsers.add_parser("report", help="render many wells into a PDF file")
+    p.add_argument("output", help="PDF file to write")
+    p.add_argument("template", help="template file ('.appy' or '.json')")
+    p.add_argument("lasfiles", nargs="+", help="LAS files, one page each")
+    p.add_argument("--title", help="title of the PDF document")
+    p.set_defaults(func=report)
 
-print("Reading LAS file.")
+    p = subparsers.add_parser(
+        "vertices", help="export the plot geometry for web clients"
+    )
+    p.add_argument("lasfile", help="LAS file or LAS store directory")
+    p.add_argument("template", help="template file ('.appy' or '.json')")
+    p.add_argument("directory", help="directory of the manifest and binary files")
+    p.add_argument("--markers", help="CSV file with the markers of the well")
+    p.add_argument(
+        "--chunk-size", type=int, default=8192, help="maximum vertices per chunk"
+    )
+    p.set_defaults(func=vertices)
 
-lasfile = las2.read(lasfilepath)
+    p = subparsers.add_parser(
+        "serve", help="render log plots on request, keeping the data in memory"
+    )
+    p.add_argument("--host", default="127.0.0.1", help="default is 127.0.0.1")
+    p.add_argument("--port", type=int, default=8765, help="default is 8765")
+    p.add_argument("--root", help="directory of the files, default is the current one")
+    p.add_argument("--workers", type=int, help="number of requests rendered at once")
+    p.add_argument(
+        "--max-lasfiles", type=int, default=8, help="LAS files kept in memory"
+    )
+    p.add_argument(
+        "--max-plots", type=int, default=16, help="prepared plots kept in memory"
+    )
+    p.set_defaults(func=serve)
 
-print("Reading template file.")
+    p = subparsers.add_parser("view", help="show the log plot set up in a config file")
+    p.add_argument(
+        "config", nargs="?", default="config.json", help="default is 'config.json'"
+    )
+    p.set_defaults(func=view)
 
-if templateformat == "appy":
-    with open(templatepath, "r") as f:
-        template = yaml.safe_load(f)
-elif templateformat == "json":
-    with open(templatepath, "r") as f:
-        template = json.load(f)
-else:
-    raise NotImplementedError(f"Not valid template file format: {templateformat}")
+    return parser
 
-dataprovider = DataProvider(lasfile)
-template = parse_template(template)
 
-well_name = get_well_name(lasfile)
+def main(argv=None):
+    start = time.perf_counter()
 
-print("Loading the view.")
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        args.func = view
+        args.config = "config.json"
 
-fig = plt.figure()
-plt.gcf().canvas.manager.set_window_title(well_name)
-try:
-    logplot = LogPlot(dataprovider, template, fig)
-    logplot.draw()
+    try:
+        return args.func(args)
+    finally:
+        if args.timings:
+            total = time.perf_counter() - start
+            print(
+                f"Imports: {_timings['import']:.3f} s, total: {total:.3f} s",
+                file=sys.stderr,
+            )
 
-    plt.show()
-except Exception:
-    raise
-finally:
-    plt.close(fig)
 
-print("Closing program.")
+if __name__ == "__main__":
+    sys.exit(main())
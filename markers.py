@@ -0,0 +1,40 @@
+import csv
+
+import numpy as np
+
+
+def from_records(records):
+    """Builds the markers of a well from a list of dicts with the 'name' and
+    'depth' keys, and optionally 'family'.
+
+    Returns
+    -------
+    dict
+        The columns 'name', 'depth' and 'family' as numpy arrays, sorted by
+        depth, as expected in the 'markers' entry of the LAS file contents
+        given to `DataProvider`.
+    """
+    depth = np.array([float(r["depth"]) for r in records], dtype=float)
+    # Fixed width strings rather than objects, so the data can be hashed
+    name = np.array([str(r["name"]) for r in records], dtype=str)
+    family = np.array([str(r.get("family", "") or "") for r in records], dtype=str)
+
+    order = np.argsort(depth, kind="stable")
+    return {"name": name[order], "depth": depth[order], "family": family[order]}
+
+
+def read(path):
+    """Reads the markers (e.g. formation tops) of a well from a CSV file.
+
+    The file must have a header row with the 'name' and 'depth' columns, and
+    may have a 'family' column. Rows without depth are ignored.
+
+    Examples
+    --------
+    >>> import las2, markers
+    >>> lasfile = las2.read('path/to/the/las/file')
+    >>> lasfile['markers'] = markers.read('path/to/the/tops.csv')
+    """
+    with open(path, "r", newline="") as f:
+        records = [row for row in csv.DictReader(f) if row.get("depth", "").strip()]
+    return from_records(records)
@@ -0,0 +1,329 @@
+import hashlib
+import math
+import os
+import uuid
+
+import matplotlib
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.image import imsave
+
+from depth_index import DepthIndex
+from logplot import LogPlot
+from tiling import get_depth_extent
+
+# Bump when the rendering changes in a way that invalidates cached images
+_CACHE_VERSION = 3
+
+_CACHE_EXTENSION = ".npy"
+
+
+def _hash_update(h, obj):
+    # Only plain data is hashed, so the keys are the same in every process
+    if isinstance(obj, np.ma.MaskedArray):
+        h.update(b"masked")
+        _hash_update(h, obj.data)
+        _hash_update(h, np.ma.getmaskarray(obj))
+    elif isinstance(obj, np.ndarray):
+        if obj.dtype.hasobject:
+            msg = "Cannot hash arrays of Python objects"
+            raise TypeError(msg)
+        h.update(f"ndarray{obj.dtype.str}{obj.shape}".encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, DepthIndex):
+        # The depth itself is hashed with the rest of the prepared data
+        _hash_update(h, ("DepthIndex", obj.size, obj.step))
+    elif isinstance(obj, dict):
+        h.update(b"dict")
+        for key in sorted(obj, key=str):
+            _hash_update(h, key)
+            _hash_update(h, obj[key])
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"list{len(obj)}".encode())
+        for el in obj:
+            _hash_update(h, el)
+    elif obj is None or isinstance(obj, (str, bool, int, float, np.generic)):
+        h.update(f"{type(obj).__name__}:{obj!r};".encode())
+    else:
+        msg = f"Cannot hash objects of type {type(obj).__name__}"
+        raise TypeError(msg)
+
+
+def get_track_key(template, track_index, track_prepared, window):
+    """Content hash of everything that affects the image of a track.
+
+    The key covers the parsed track template (including its layers, legends
+    and axes rectangles), the figure properties, the y grids of all tracks
+    (which set the shared depth ticks), the depth window and the prepared data
+    of each layer, so any change in the curves used by the track produces a
+    different key.
+    """
+    h = hashlib.sha256()
+    _hash_update(
+        h,
+        {
+            "version": _CACHE_VERSION,
+            "figure": template["figure"],
+            "track": template["tracks"][track_index],
+            # The depth axis is shared, so its ticks depend on the y grids of
+            # all the tracks
+            "ygrids": [
+                track.get("grid", {}).get("y", None) for track in template["tracks"]
+            ],
+            "window": [float(a) for a in window],
+            "data": track_prepared,
+        },
+    )
+    return h.hexdigest()
+
+
+def get_track_bbox(template, track_index, width, height, margin=2):
+    """Pixel bounding box (rows, columns) of a track and its legends, grown by
+    `margin` pixels on each side."""
+    track = template["tracks"][track_index]
+    rects = [track["rect"]]
+    for layer in track["layers"]:
+        rects.append(layer["rect"])
+        if layer.get("legend", None) is not None:
+            rects.append(layer["legend"]["rect"])
+
+    left = min(r[0] for r in rects)
+    right = max(r[0] + r[2] for r in rects)
+    bottom = min(r[1] for r in rects)
+    top = max(r[1] + r[3] for r in rects)
+
+    x0 = max(int(math.floor(left * width)) - margin, 0)
+    x1 = min(int(math.ceil(right * width)) + margin, width)
+    y0 = max(int(math.floor((1.0 - top) * height)) - margin, 0)
+    y1 = min(int(math.ceil((1.0 - bottom) * height)) + margin, height)
+
+    return slice(y0, y1), slice(x0, x1)
+
+
+class TrackRenderCache:
+    """Content-addressed on-disk cache of rendered track images.
+
+    Images are stored as RGBA arrays in `.npy` files named after their keys.
+    When the total size of the cache exceeds `max_bytes`, the least recently
+    used images are removed.
+
+    Parameters
+    ----------
+    directory : string
+        Directory where the images are stored. Created if needed.
+    max_bytes : int, optional
+        Maximum total size of the stored images. Default is 256 MiB.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 2**20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + _CACHE_EXTENSION)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            image = np.load(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        # Mark as recently used
+        os.utime(path)
+        self.hits += 1
+        return image
+
+    def put(self, key, image):
+        path = self._path(key)
+        tmppath = os.path.join(self.directory, uuid.uuid4().hex + ".tmp")
+        with open(tmppath, "wb") as f:
+            np.save(f, image)
+        os.replace(tmppath, path)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(_CACHE_EXTENSION):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(_CACHE_EXTENSION):
+                os.remove(os.path.join(self.directory, name))
+
+
+def _get_tick_margin(dpi):
+    # The ticks of the tracks are drawn outside of their axes
+    sizes = [
+        matplotlib.rcParams[f"{axis}tick.{which}.size"]
+        for axis in "xy"
+        for which in ("major", "minor")
+    ]
+    return int(math.ceil(max(sizes) * dpi / 72.0)) + 2
+
+
+def _render_rgba(dataprovider, template, prepared, window, transparent=False, **kwargs):
+    logplot = LogPlot(dataprovider, template, Figure())
+    canvas = FigureCanvasAgg(logplot.fig)
+    logplot.draw(prepared, **kwargs)
+    logplot.set_ylim(window[1], window[0])
+    if transparent:
+        # Transparent background, so the image can be composited
+        logplot.fig.patch.set_visible(False)
+    canvas.draw()
+    return np.array(canvas.buffer_rgba())
+
+
+def _render_tracks_rgba(dataprovider, template, prepared, window, tracks):
+    # Yields the image of each track of `tracks` on a transparent background.
+    # All the tracks are drawn and the others are hidden, so the state they
+    # share (the depth axis ticks) is the same as in a full render.
+    logplot = LogPlot(dataprovider, template, Figure())
+    canvas = FigureCanvasAgg(logplot.fig)
+    logplot.draw(prepared, header=False)
+    logplot.set_ylim(window[1], window[0])
+    logplot.fig.patch.set_visible(False)
+
+    track_axes = []
+    for k in range(len(logplot.drawn_tracks)):
+        ax_ids = (
+            [logplot.track_axes_map[k]]
+            + logplot.layer_axes_map[k]
+            + logplot.legend_axes_map[k]
+        )
+        track_axes.append([logplot.axes[a] for a in ax_ids if a is not None])
+
+    for i in tracks:
+        for k, axes in enumerate(track_axes):
+            for ax in axes:
+                ax.set_visible(logplot.drawn_tracks[k] == i)
+        canvas.draw()
+        yield i, np.array(canvas.buffer_rgba())
+
+
+def _composite(dst, src):
+    # Draws the RGBA image `src` (0-255) over the RGBA image `dst` (0-1), in
+    # place
+    src = src / 255.0
+    alpha = src[..., 3:]
+    dst[..., :3] = src[..., :3] * alpha + dst[..., :3] * (1.0 - alpha)
+    dst[..., 3:] = alpha + dst[..., 3:] * (1.0 - alpha)
+
+
+def render_cached(
+    dataprovider,
+    template,
+    cache,
+    path=None,
+    top=None,
+    bottom=None,
+    parallel=True,
+    max_workers=None,
+):
+    """Renders a log plot, reusing cached images of unchanged tracks.
+
+    The layers data is always prepared (it is needed to compute the keys), but
+    only the tracks whose key is not in the cache are drawn. The figure
+    background and the header are drawn on every call, and the track images
+    are composited between them.
+
+    Parameters
+    ----------
+    dataprovider : DataProvider
+        The data provider used by the plot.
+    template : dict
+        A parsed template, as returned by `logplot_template.parse`.
+    cache : TrackRenderCache
+        The cache of track images.
+    path : string, optional
+        If given, the final image is also saved to this path.
+    top, bottom : float, optional
+        Depth window to render. Defaults to the extent of the data.
+    parallel : bool, optional
+        If True (default), layers are prepared in parallel.
+    max_workers : int, optional
+        Maximum number of threads used when `parallel` is True.
+
+    Returns
+    -------
+    numpy.ndarray
+        The RGBA image of the plot, with shape (height, width, 4).
+    """
+    logplot = LogPlot(dataprovider, template, parallel=parallel, max_workers=max_workers)
+    prepared = logplot.prepare()
+
+    data_top, data_bottom = get_depth_extent(prepared)
+    if top is None:
+        top = data_top
+    if bottom is None:
+        bottom = data_bottom
+    window = (top, bottom)
+    prepared = logplot.window(prepared, top, bottom)
+
+    width, height = template["figure"]["size"]
+    width = int(round(width))
+    height = int(round(height))
+    margin = _get_tick_margin(template["figure"]["dpi"])
+
+    image = _render_rgba(
+        dataprovider, template, prepared, window, tracks=[], header=False
+    )
+    image = image / 255.0
+
+    keys = [
+        get_track_key(template, i, prepared[i], window)
+        for i in range(len(template["tracks"]))
+    ]
+    track_images = [cache.get(key) for key in keys]
+
+    missing = [i for i, track_image in enumerate(track_images) if track_image is None]
+    if missing:
+        rendered = _render_tracks_rgba(
+            dataprovider, template, prepared, window, missing
+        )
+        for i, track_image in rendered:
+            rows, cols = get_track_bbox(template, i, width, height, margin)
+            track_images[i] = track_image[rows, cols]
+            cache.put(keys[i], track_images[i])
+
+    for i, track_image in enumerate(track_images):
+        rows, cols = get_track_bbox(template, i, width, height, margin)
+        _composite(image[rows, cols], track_image)
+
+    if "header" in template:
+        # The header is drawn after the tracks, as in `LogPlot.draw`
+        header_image = _render_rgba(
+            dataprovider, template, prepared, window, transparent=True, tracks=[]
+        )
+        _composite(image, header_image)
+
+    image = np.round(image * 255.0).astype(np.uint8)
+
+    if path is not None:
+        imsave(path, image)
+
+    return image
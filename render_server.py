@@ -0,0 +1,332 @@
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from matplotlib.figure import Figure
+
+import las2
+import markers
+from data_provider import DataProvider
+from logplot import LogPlot
+from logplot_template import load as load_template
+from tiling import get_depth_extent
+
+_CONTENT_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+class LRUCache:
+    """Thread-safe mapping that keeps at most `maxsize` entries, dropping the
+    least recently used one when full."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, factory):
+        """Returns the entry of `key`, creating it with `factory()` if it is
+        not cached. The factory runs outside of the lock, so slow entries do
+        not block the others, and only once per key: concurrent calls for a
+        key being created wait for it (and get its exception, if it fails)."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            pending = self._pending.get(key, None)
+            if pending is None:
+                self.misses += 1
+                pending = self._pending[key] = Future()
+                owner = True
+            else:
+                self.hits += 1
+                owner = False
+
+        if not owner:
+            return pending.result()
+
+        try:
+            value = factory()
+        except BaseException as e:
+            with self._lock:
+                del self._pending[key]
+            pending.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._pending[key]
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        pending.set_result(value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class _PreparedPlot:
+    # A log plot whose layers data is prepared for the whole depth range, so
+    # each request only windows it and draws a new figure
+    def __init__(self, dataprovider, template):
+        self.logplot = LogPlot(dataprovider, template, parallel=False)
+        self.prepared = self.logplot.prepare()
+        self.window = self.logplot.get_depth_window()
+        if self.window is None:
+            self.window = get_depth_extent(self.prepared)
+
+
+class RenderService:
+    """Renders log plots while keeping the parsed LAS files, the compiled
+    templates and the prepared layers data in memory between calls.
+
+    Files are identified by their path, modification time and size, so a
+    changed file is read again on the next call. Each cache is bounded and
+    drops its least recently used entries.
+
+    Parameters
+    ----------
+    root : string, optional
+        Only files inside this directory can be read. Relative paths are
+        relative to it. Defaults to the current directory.
+    max_lasfiles : int, optional
+        Number of LAS files kept in memory. Default is 8.
+    max_templates : int, optional
+        Number of templates kept in memory. Default is 32.
+    max_plots : int, optional
+        Number of prepared (LAS file, template) pairs kept in memory. Default
+        is 16.
+    """
+
+    def __init__(self, root=None, max_lasfiles=8, max_templates=32, max_plots=16):
+        self.root = os.path.realpath(root if root is not None else os.getcwd())
+        self.lasfiles = LRUCache(max_lasfiles)
+        self.templates = LRUCache(max_templates)
+        self.plots = LRUCache(max_plots)
+
+    def _resolve(self, path):
+        path = os.path.realpath(os.path.join(self.root, path))
+        if os.path.commonpath([self.root, path]) != self.root:
+            msg = f"{path} is outside of {self.root}"
+            raise ValueError(msg)
+        return path
+
+    def _get_file_key(self, path):
+        path = self._resolve(path)
+        stat = os.stat(path)
+        return (path, stat.st_mtime_ns, stat.st_size)
+
+    def get_dataprovider(self, lasfile, markersfile=None):
+        key = self._get_file_key(lasfile)
+        if markersfile is not None:
+            key = key + self._get_file_key(markersfile)
+
+        def factory():
+            contents = las2.read(key[0])
+            if markersfile is not None:
+                contents["markers"] = markers.read(key[3])
+            return DataProvider(contents)
+
+        return key, self.lasfiles.get(key, factory)
+
+    def get_template(self, template):
+        key = self._get_file_key(template)
+        return key, self.templates.get(key, lambda: load_template(key[0]))
+
+    def get_plot(self, lasfile, template, markersfile=None):
+        las_key, dataprovider = self.get_dataprovider(lasfile, markersfile)
+        template_key, template = self.get_template(template)
+        return self.plots.get(
+            (las_key, template_key), lambda: _PreparedPlot(dataprovider, template)
+        )
+
+    def render(
+        self,
+        lasfile,
+        template,
+        top=None,
+        bottom=None,
+        format="png",
+        dpi=None,
+        markersfile=None,
+    ):
+        """Renders a log plot.
+
+        Parameters
+        ----------
+        lasfile : string
+            Path of the LAS file.
+        template : string
+            Path of the template file.
+        top, bottom : float, optional
+            Depth window to render. Defaults to the window of the template,
+            or to the extent of the data.
+        format : string, optional
+            'png' (default) or 'svg'.
+        dpi : float, optional
+            Resolution of the image. Defaults to the one of the template.
+        markersfile : string, optional
+            Path of a CSV file with the markers of the well.
+
+        Returns
+        -------
+        bytes
+            The image file contents.
+        """
+        if format not in _CONTENT_TYPES:
+            raise ValueError(f"Unknown format: {format}")
+
+        plot = self.get_plot(lasfile, template, markersfile)
+        if top is None:
+            top = plot.window[0]
+        if bottom is None:
+            bottom = plot.window[1]
+
+        logplot = LogPlot(plot.logplot.dataprovider, plot.logplot.template, Figure())
+        logplot.draw(plot.logplot.window(plot.prepared, top, bottom))
+        logplot.set_ylim(bottom, top)
+
+        buffer = io.BytesIO()
+        logplot.fig.savefig(buffer, format=format, dpi=dpi)
+        return buffer.getvalue()
+
+    def stats(self):
+        return {
+            "lasfiles": self.lasfiles.stats(),
+            "templates": self.templates.stats(),
+            "plots": self.plots.stats(),
+        }
+
+
+class _RenderRequestHandler(BaseHTTPRequestHandler):
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, obj):
+        self._send(status, json.dumps(obj).encode("utf-8"), "application/json")
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        if url.path == "/stats":
+            self._send_json(200, self.server.service.stats())
+            return
+        if url.path != "/render":
+            self._send_json(404, {"error": f"Unknown path: {url.path}"})
+            return
+
+        try:
+            for key in ["las", "template"]:
+                if key not in query:
+                    raise ValueError(f"Missing parameter: {key}")
+            format = query.get("format", "png")
+            image = self.server.service.render(
+                query["las"],
+                query["template"],
+                top=float(query["top"]) if "top" in query else None,
+                bottom=float(query["bottom"]) if "bottom" in query else None,
+                format=format,
+                dpi=float(query["dpi"]) if "dpi" in query else None,
+                markersfile=query.get("markers", None),
+            )
+        except FileNotFoundError as e:
+            self._send_json(404, {"error": str(e)})
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+        else:
+            self._send(200, image, _CONTENT_TYPES[format])
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class RenderServer(HTTPServer):
+    """HTTP server of a `RenderService`, with the requests handled by a pool
+    of worker threads.
+
+    The threads share the caches of the service, but drawing with matplotlib
+    holds the GIL, so concurrent requests are served one render at a time:
+    the pool keeps slow requests from blocking the connections, it does not
+    render faster. Run several servers to use more CPUs.
+
+    Endpoints
+    ---------
+    GET /render?las=<path>&template=<path>
+        Returns the image of a log plot. Optional parameters are 'top',
+        'bottom', 'format' ('png' or 'svg'), 'dpi' and 'markers' (path of a
+        CSV file). Errors are returned as JSON with a 400 (bad parameters),
+        404 (missing file) or 500 status.
+    GET /stats
+        Returns the sizes, hits and misses of the caches, as JSON.
+
+    Parameters
+    ----------
+    address : tuple, optional
+        The (host, port) to listen on. Default is ('127.0.0.1', 8765).
+    service : RenderService, optional
+        Defaults to a `RenderService` of the current directory.
+    max_workers : int, optional
+        Maximum number of requests handled at the same time.
+    verbose : bool, optional
+        Whether each request is logged to stderr.
+
+    Examples
+    --------
+    >>> server = RenderServer(("127.0.0.1", 8765), RenderService("path/to/data"))
+    >>> server.serve_forever()
+
+    The server is then called with e.g.
+    'http://127.0.0.1:8765/render?las=well.las&template=tpl.appy&top=1000'.
+    """
+
+    def __init__(
+        self, address=("127.0.0.1", 8765), service=None, max_workers=None, verbose=False
+    ):
+        super().__init__(address, _RenderRequestHandler)
+        self.service = service if service is not None else RenderService()
+        self.verbose = verbose
+        self.executor = ThreadPoolExecutor(max_workers)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process_request, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True)
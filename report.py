@@ -0,0 +1,84 @@
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+
+import las2
+from data_provider import DataProvider
+from logplot import LogPlot
+
+
+def _get_dataprovider(source):
+    if isinstance(source, DataProvider):
+        return source
+    return DataProvider(las2.read(source))
+
+
+def export_pdf(path, sources, template, metadata=None, parallel=True, max_workers=None):
+    """Renders the log plots of many wells into a single multi-page PDF file,
+    one page per well.
+
+    The first well is drawn on a new figure, and the following ones only
+    replace its layers, legends and header (see `LogPlot.replace_data`), so
+    the tracks are created once for the whole report. Each page is written
+    to the file as soon as it is drawn and the data of a well is released
+    before the next one is read, so the memory used does not grow with the
+    number of pages. Fonts are embedded once, when the file is closed.
+
+    Parameters
+    ----------
+    path : string
+        Path of the PDF file.
+    sources : iterable
+        Paths of LAS files or `DataProvider` objects, one for each page. May
+        be a generator.
+    template : dict
+        A parsed template, as returned by `logplot_template.parse`.
+    metadata : dict, optional
+        Document information of the PDF file, e.g. {'Title': 'Field X'}.
+    parallel : bool, optional
+        If True (default), the layers of each page are prepared in parallel.
+    max_workers : int, optional
+        Maximum number of threads used when `parallel` is True.
+
+    Returns
+    -------
+    int
+        The number of pages written. Wells whose LAS file cannot be read or
+        that lack data used by the template are skipped with a warning.
+
+    Examples
+    --------
+    >>> import glob, report
+    >>> from logplot_template import load
+    >>> paths = sorted(glob.glob('wells/*.las'))
+    >>> report.export_pdf('wells.pdf', paths, load('template.appy'))
+    200
+    """
+    logplot = None
+    pages = 0
+
+    with PdfPages(path, metadata=metadata) as pdf:
+        for source in sources:
+            try:
+                dataprovider = _get_dataprovider(source)
+                if logplot is None:
+                    logplot = LogPlot(
+                        dataprovider,
+                        template,
+                        Figure(),
+                        parallel=parallel,
+                        max_workers=max_workers,
+                    )
+                    logplot.draw()
+                else:
+                    logplot.replace_data(dataprovider)
+            except (OSError, KeyError, ValueError, las2.LAS2Error) as e:
+                msg = f"WARNING: Skipping {source}: {type(e).__name__}: {e}"
+                print(msg)
+                # The figure may be partly drawn, start over on the next well
+                logplot = None
+                continue
+
+            pdf.savefig(logplot.fig)
+            pages += 1
+
+    return pages
@@ -0,0 +1,161 @@
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from matplotlib.figure import Figure
+
+from layer_data import get_depth_extent
+from logplot import LogPlot
+from logplot_template import get_depth_span
+
+
+def _render_tile(dataprovider, template, prepared, top, bottom, path, dpi):
+    # `prepared` is already restricted to the depth window of the tile
+    tile = LogPlot(dataprovider, template, Figure())
+    tile.draw(prepared)
+    tile.set_ylim(bottom, top)
+    tile.fig.savefig(path, dpi=dpi)
+
+
+# Data of the plot in a worker process, set once by _init_tile_worker
+_worker_plot = None
+
+
+def _init_tile_worker(dataprovider, template):
+    global _worker_plot
+    _worker_plot = (dataprovider, template)
+
+
+def _render_tile_job(job):
+    _render_tile(*_worker_plot, *job)
+
+
+def render_tiles(
+    dataprovider,
+    template,
+    directory,
+    depth=None,
+    scale=None,
+    unit="m",
+    top=None,
+    bottom=None,
+    format="png",
+    parallel=False,
+    max_workers=None,
+):
+    """Renders a log plot as a sequence of fixed-height tiles.
+
+    Each tile is a figure with the size given by the template, showing a
+    consecutive depth window. The layers data is prepared once and each tile
+    only receives the samples inside its window.
+
+    Parameters
+    ----------
+    dataprovider : DataProvider
+        The data provider used by the plot.
+    template : dict
+        A parsed template, as returned by `logplot_template.parse`.
+    directory : string
+        Directory where the tiles and the 'manifest.json' file are written.
+    depth : float, optional
+        Depth covered by each tile. Either `depth` or `scale` must be given.
+    scale : float, optional
+        Depth scale of the tracks, e.g. 200 for 1:200.
+    unit : string, optional
+        Depth unit, 'm' (default) or 'ft'. Only used with `scale`.
+    top, bottom : float, optional
+        Depth range to render. Defaults to the extent of the data.
+    format : string, optional
+        Image format of the tiles, as accepted by `Figure.savefig`.
+    parallel : bool, optional
+        If True, layers are prepared in parallel threads and tiles are
+        rendered in worker processes, since matplotlib is not thread-safe.
+        The data provider and the template are sent once to each worker, so
+        they must be picklable. Default is False.
+    max_workers : int, optional
+        Maximum number of threads, and of processes, used when `parallel` is
+        True.
+
+    Returns
+    -------
+    dict
+        The tiles manifest, also written to 'manifest.json'.
+    """
+    if depth is None:
+        if scale is None:
+            raise ValueError("Either depth or scale must be given")
+        depth = get_depth_span(template, scale, unit)
+
+    logplot = LogPlot(dataprovider, template, parallel=parallel, max_workers=max_workers)
+    prepared = logplot.prepare()
+
+    if top is None or bottom is None:
+        data_top, data_bottom = get_depth_extent(prepared)
+        if top is None:
+            top = data_top
+        if bottom is None:
+            bottom = data_bottom
+
+    n_tiles = max(int(math.ceil((bottom - top) / depth)), 1)
+    dpi = template["figure"]["dpi"]
+
+    os.makedirs(directory, exist_ok=True)
+
+    tiles = []
+    for i in range(n_tiles):
+        tile_top = top + i * depth
+        tiles.append(
+            {
+                "index": i,
+                "path": f"tile_{i:05d}.{format}",
+                "top": tile_top,
+                "bottom": tile_top + depth,
+            }
+        )
+
+    jobs = []
+    for tile in tiles:
+        jobs.append(
+            (
+                logplot.window(prepared, tile["top"], tile["bottom"]),
+                tile["top"],
+                tile["bottom"],
+                os.path.join(directory, tile["path"]),
+                dpi,
+            )
+        )
+
+    if parallel and n_tiles > 1:
+        with ProcessPoolExecutor(
+            max_workers,
+            initializer=_init_tile_worker,
+            initargs=(dataprovider, template),
+        ) as executor:
+            list(executor.map(_render_tile_job, jobs))
+    else:
+        for job in jobs:
+            _render_tile(dataprovider, template, *job)
+
+    manifest = {
+        "schema": "appy-logplot-tiles",
+        "format": format,
+        "size": list(template["figure"]["size"]),
+        "dpi": dpi,
+        "depth": {
+            "top": float(top),
+            "bottom": float(bottom),
+            "tile": float(depth),
+            "scale": scale,
+            "unit": unit,
+        },
+        "tiles": [
+            dict(tile, top=float(tile["top"]), bottom=float(tile["bottom"]))
+            for tile in tiles
+        ],
+    }
+
+    with open(os.path.join(directory, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=4)
+
+    return manifest
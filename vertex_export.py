@@ -0,0 +1,413 @@
+import json
+import math
+import os
+
+import numpy as np
+
+from layer_data import (
+    LogPlotData,
+    get_depth_extent,
+    _TR_LINE_MATPLOTLIB_LINE,
+    _TR_PATCH_MATPLOTLIB_PATCH,
+)
+
+SCHEMA = "appy-logplot-vertices"
+
+_DTYPE = "<f4"
+
+
+def _to_template_style(kwargs, translation):
+    # Inverse of the template to matplotlib translation done by the artists
+    return {k: kwargs[v] for k, v in translation.items() if v in kwargs}
+
+
+def _get_step(y):
+    steps = np.abs(np.diff(y))
+    steps = steps[np.isfinite(steps) & (steps > 0)]
+    if len(steps) == 0:
+        return None
+    return float(np.median(steps))
+
+
+def decimate_minmax(x, y, factor):
+    """Keeps, in each block of `factor` consecutive samples, the samples with
+    the minimum and the maximum x, in their original order.
+
+    This preserves the envelope of the curve, so spikes stay visible at any
+    zoom level. Blocks without valid samples are kept as a single NaN, so gaps
+    wider than a block are preserved.
+    """
+    n = len(x)
+    if factor <= 1 or n == 0:
+        return x, y
+
+    m = int(math.ceil(n / factor))
+    padded = np.full(m * factor, np.nan)
+    padded[:n] = x
+    blocks = padded.reshape(m, factor)
+    isnan = np.isnan(blocks)
+
+    imin = np.argmin(np.where(isnan, np.inf, blocks), axis=1)
+    imax = np.argmax(np.where(isnan, -np.inf, blocks), axis=1)
+    # Blocks without valid samples give the first one, which is NaN
+    first = np.minimum(imin, imax)
+    second = np.maximum(imin, imax)
+
+    starts = np.arange(m) * factor
+    indexes = np.stack((starts + first, starts + second), axis=1).ravel()
+    keep = np.ones(2 * m, dtype=bool)
+    keep[1::2] = second != first
+    indexes = indexes[keep]
+    return x[indexes], y[indexes]
+
+
+def decimate_mean(y, columns, factor):
+    """Averages blocks of `factor` consecutive samples of `y` and of each array
+    of `columns`, ignoring NaNs."""
+    n = len(y)
+    if factor <= 1 or n == 0:
+        return y, columns
+
+    starts = np.arange(0, n, factor)
+    averaged = []
+    for a in [y] + list(columns):
+        valid = ~np.isnan(a)
+        sums = np.add.reduceat(np.where(valid, a, 0.0), starts)
+        counts = np.add.reduceat(valid.astype(int), starts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            averaged.append(sums / counts)
+    return averaged[0], averaged[1:]
+
+
+def insert_crossovers(y, left, right):
+    """Inserts the points where the left and right curves of a fill cross, so
+    each segment between two consecutive points is filled with one color."""
+    d = left - right
+    with np.errstate(invalid="ignore"):
+        i = np.flatnonzero(d[:-1] * d[1:] < 0)
+    t = d[i] / (d[i] - d[i + 1])
+    yc = y[i] + t * (y[i + 1] - y[i])
+    xc = left[i] + t * (left[i + 1] - left[i])
+    return (
+        np.insert(y, i + 1, yc),
+        np.insert(left, i + 1, xc),
+        np.insert(right, i + 1, xc),
+    )
+
+
+def _normalize(x, xlim, scale):
+    # Maps the layer limits to [0, 1], as the client draws in track coordinates
+    a, b = xlim
+    if scale == "log":
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (np.log10(x) - np.log10(a)) / (np.log10(b) - np.log10(a))
+    return (x - a) / (b - a)
+
+
+class _TrackWriter:
+    # Appends float32 arrays to the binary file of a track and describes the
+    # chunks of each level in the manifest
+    def __init__(self, path):
+        self.file = open(path, "wb")
+        self.offset = 0
+
+    def write(self, array):
+        data = np.ascontiguousarray(array, dtype=_DTYPE).tobytes()
+        self.file.write(data)
+        offset = self.offset
+        self.offset += len(data)
+        return offset
+
+    def write_chunks(self, y, arrays, chunk_size, bounds=None):
+        # Consecutive chunks share one vertex so lines stay connected
+        if bounds is None:
+            bounds = (y, y)
+        chunks = []
+        n = len(y)
+        for start in range(0, n, chunk_size):
+            stop = min(start + chunk_size + 1, n)
+            tops = bounds[0][start:stop]
+            bottoms = bounds[1][start:stop]
+            finite = np.isfinite(tops) & np.isfinite(bottoms)
+            if not finite.any():
+                continue
+            chunks.append(
+                {
+                    "top": float(min(np.min(tops[finite]), np.min(bottoms[finite]))),
+                    "bottom": float(
+                        max(np.max(tops[finite]), np.max(bottoms[finite]))
+                    ),
+                    "count": stop - start,
+                    "arrays": {
+                        k: self.write(v[start:stop]) for k, v in arrays.items()
+                    },
+                }
+            )
+            if stop == n:
+                break
+        return chunks
+
+    def close(self):
+        self.file.close()
+
+
+def _get_factors(n, per_block, min_vertices, max_levels):
+    # Each level has about half the vertices of the previous one, knowing
+    # that decimation keeps `per_block` samples of each block
+    factors = [1]
+    factor = per_block
+    while len(factors) < max_levels and per_block * n // factors[-1] > min_vertices:
+        factor *= 2
+        factors.append(factor)
+    return factors
+
+
+def _encode_line(writer, prepared, layer, track, options):
+    scale = prepared["scale"]
+    x = _normalize(prepared["x"], prepared["xlim"], scale)
+    y = prepared["y"]
+    step = _get_step(y)
+
+    levels = []
+    factors = _get_factors(len(y), 2, options["min_vertices"], options["max_levels"])
+    for factor in factors:
+        xd, yd = decimate_minmax(x, y, factor)
+        levels.append(
+            {
+                "factor": factor,
+                "step": None if step is None else step * factor,
+                "chunks": writer.write_chunks(
+                    yd, {"x": xd, "y": yd}, options["chunk_size"]
+                ),
+            }
+        )
+
+    return {
+        "xlim": list(prepared["xlim"]),
+        "scale": scale,
+        "style": _to_template_style(prepared["kwargs"], _TR_LINE_MATPLOTLIB_LINE),
+        "levels": levels,
+    }
+
+
+def _encode_fillbetween(writer, prepared, layer, track, options):
+    # The curves are already normalized to the layer limits by `prepare`
+    y = prepared["y"]
+    step = _get_step(y)
+
+    levels = []
+    factors = _get_factors(len(y), 1, options["min_vertices"], options["max_levels"])
+    for factor in factors:
+        yd, (left, right) = decimate_mean(
+            y, [prepared["left"], prepared["right"]], factor
+        )
+        yd, left, right = insert_crossovers(yd, left, right)
+        levels.append(
+            {
+                "factor": factor,
+                "step": None if step is None else step * factor,
+                "chunks": writer.write_chunks(
+                    yd,
+                    {"y": yd, "left": left, "right": right},
+                    options["chunk_size"],
+                ),
+            }
+        )
+
+    return {
+        "style": {
+            side: _to_template_style(
+                prepared["patches"][side], _TR_PATCH_MATPLOTLIB_PATCH
+            )
+            for side in ["left", "right"]
+        },
+        "levels": levels,
+    }
+
+
+def _encode_lithology(writer, prepared, layer, track, options):
+    # Runs are already compact, so there is a single level
+    codes = [np.full(len(tops), code) for code, _, tops, _ in prepared["codes"]]
+    tops = [tops for _, _, tops, _ in prepared["codes"]]
+    bottoms = [bottoms for _, _, _, bottoms in prepared["codes"]]
+    if codes:
+        codes = np.concatenate(codes)
+        tops = np.concatenate(tops)
+        bottoms = np.concatenate(bottoms)
+    else:
+        codes = tops = bottoms = np.empty(0)
+    order = np.argsort(tops, kind="stable")
+    arrays = {"top": tops[order], "bottom": bottoms[order], "code": codes[order]}
+
+    return {
+        "codes": [
+            {
+                "code": code,
+                "patch": _to_template_style(patchkwargs, _TR_PATCH_MATPLOTLIB_PATCH),
+            }
+            for code, patchkwargs, _, _ in prepared["codes"]
+        ],
+        "levels": [
+            {
+                "factor": 1,
+                "step": None,
+                "chunks": writer.write_chunks(
+                    arrays["top"],
+                    arrays,
+                    options["chunk_size"],
+                    (arrays["top"], arrays["bottom"]),
+                ),
+            }
+        ],
+    }
+
+
+def _encode_markers(writer, prepared, layer, track, options):
+    depth = prepared["depth"]
+    return {
+        "style": _to_template_style(prepared["kwargs"], _TR_LINE_MATPLOTLIB_LINE),
+        "text": prepared["text"],
+        "names": [str(a) for a in prepared["name"]],
+        "levels": [
+            {
+                "factor": 1,
+                "step": None,
+                "chunks": writer.write_chunks(depth, {"y": depth}, len(depth) or 1),
+            }
+        ],
+    }
+
+
+_encoders = {
+    "line": _encode_line,
+    "fillbetween": _encode_fillbetween,
+    "lithology": _encode_lithology,
+    "markers": _encode_markers,
+}
+
+
+def export_vertices(
+    dataprovider,
+    template,
+    directory,
+    chunk_size=8192,
+    min_vertices=2048,
+    max_levels=8,
+    parallel=True,
+    max_workers=None,
+):
+    """Exports the plot-ready geometry of a log plot, for clients that draw it
+    themselves (e.g. with WebGL) instead of showing a rendered image.
+
+    The layers data goes through the same preparation as `LogPlot.draw` (NaN
+    trimming, depth window, fill crossovers, lithology runs), with
+    `layer_data.LogPlotData`, so matplotlib is not imported. The x values are
+    mapped to [0, 1] of the layer limits (in log10 for logarithmic tracks), so
+    the client only has to scale them to the track width.
+
+    Curves are written at several zoom levels, each with about half the
+    vertices of the previous one, until a level has less than `min_vertices`
+    vertices. Lines keep the samples with the minimum and maximum value of
+    each block of samples, so spikes stay visible, and fills average them.
+    Each level is split in chunks of at most `chunk_size` vertices, with
+    their depth range, so the client only fetches the visible ones.
+
+    Parameters
+    ----------
+    dataprovider : DataProvider
+        The data provider used by the plot.
+    template : dict
+        A parsed template, as returned by `logplot_template.parse`.
+    directory : string
+        Directory where the 'manifest.json' file and one binary file per
+        track are written.
+    chunk_size : int, optional
+        Maximum number of vertices of a chunk. Default is 8192.
+    min_vertices : int, optional
+        Levels are added until one has less vertices than this. Default is
+        2048.
+    max_levels : int, optional
+        Maximum number of levels. Default is 8.
+    parallel : bool, optional
+        If True (default), layers are prepared in parallel.
+    max_workers : int, optional
+        Maximum number of threads used when `parallel` is True.
+
+    Returns
+    -------
+    dict
+        The manifest, also written to 'manifest.json'.
+
+    Notes
+    -----
+    The binary files are sequences of little-endian float32 arrays. Each
+    chunk of the manifest gives its number of vertices ('count') and, in
+    'arrays', the byte offset of each of its arrays in the file of its
+    track, which can be read directly as a `Float32Array`. Consecutive
+    chunks share a vertex. NaN marks a gap in a curve.
+
+    The arrays are 'x' and 'y' for lines, 'y', 'left' and 'right' for fills
+    (filled with the left style where left > right), 'top', 'bottom' and
+    'code' for lithology and 'y' for markers. Styles use the same keys as
+    the template. Layers of other types are skipped with a warning.
+    """
+    plotdata = LogPlotData(
+        dataprovider, template, parallel=parallel, max_workers=max_workers
+    )
+    prepared = plotdata.prepare()
+
+    window = plotdata.get_depth_window()
+    if window is None:
+        window = get_depth_extent(prepared)
+
+    options = {
+        "chunk_size": chunk_size,
+        "min_vertices": min_vertices,
+        "max_levels": max_levels,
+    }
+
+    os.makedirs(directory, exist_ok=True)
+
+    tracks = []
+    for i, track in enumerate(template["tracks"]):
+        filename = f"track_{i:03d}.bin"
+        writer = _TrackWriter(os.path.join(directory, filename))
+        layers = []
+        try:
+            for j, layer in enumerate(track["layers"]):
+                encoder = _encoders.get(layer["type"], None)
+                if encoder is None:
+                    msg = f"WARNING: Cannot export layers of type {layer['type']}"
+                    print(msg)
+                    continue
+                if prepared[i][j] is None:
+                    continue
+                encoded = encoder(writer, prepared[i][j], layer, track, options)
+                encoded.update(index=j, type=layer["type"], rect=layer["rect"])
+                layers.append(encoded)
+        finally:
+            writer.close()
+
+        tracks.append(
+            {
+                "index": i,
+                "rect": track["rect"],
+                "scale": track.get("scale", "linear"),
+                "file": filename,
+                "layers": layers,
+            }
+        )
+
+    manifest = {
+        "schema": SCHEMA,
+        "dtype": _DTYPE,
+        "size": list(template["figure"]["size"]),
+        "dpi": template["figure"]["dpi"],
+        "depth": {"top": float(window[0]), "bottom": float(window[1])},
+        "tracks": tracks,
+    }
+
+    with open(os.path.join(directory, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=4)
+
+    return manifest
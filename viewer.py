@@ -0,0 +1,176 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import las2
+from data_provider import AsyncDataProvider, DataProvider
+from logplot import LogPlot
+
+
+class AsyncViewer:
+    """Shows a log plot while its LAS file is loaded on a background thread.
+
+    The template skeleton (tracks, grids and header) is drawn right away.
+    Once the data is loaded, the layers and legends are built a few at a
+    time from a timer of the figure canvas, so the GUI event loop keeps
+    running between them.
+
+    Parameters
+    ----------
+    lasfile : string or file-like object
+        The LAS file, as accepted by `las2.read`.
+    template : dict
+        A parsed template, as returned by `logplot_template.parse`.
+    figure : matplotlib.figure.Figure
+        The figure of the viewer, attached to an interactive canvas.
+    interval : int, optional
+        Milliseconds between two timer callbacks. Default is 50.
+    count : int, optional
+        Number of axes (layers or legends) built per timer callback. Default
+        is 2.
+    """
+
+    def __init__(self, lasfile, template, figure, interval=50, count=2):
+        self.lasfile = lasfile
+        self.template = template
+        self.figure = figure
+        self.interval = interval
+        self.count = count
+        self.executor = None
+        self.dataprovider = None
+        self.logplot = None
+        self.timer = None
+        self.finished = False
+        self._ylim_set = False
+
+    def start(self):
+        self.executor = ThreadPoolExecutor(1)
+        future = self.executor.submit(las2.read, self.lasfile)
+        self.dataprovider = AsyncDataProvider(future)
+
+        self.logplot = LogPlot(self.dataprovider, self.template, self.figure, lazy=True)
+        # Layers are built from the timer, not all at once on the next draw
+        self.logplot.auto_build = False
+        self.logplot.draw()
+
+        self.timer = self.figure.canvas.new_timer(interval=self.interval)
+        self.timer.add_callback(self._update)
+        self.timer.start()
+
+    def stop(self):
+        if self.timer is not None:
+            self.timer.stop()
+            self.timer = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    def _update(self):
+        if not self.dataprovider.ready():
+            return
+        if self.dataprovider.future.exception() is not None:
+            self.stop()
+            raise self.dataprovider.future.exception()
+
+        if not self._ylim_set:
+            window = self.logplot.get_depth_window()
+            if window is None:
+                window = self.dataprovider.get_depth_range()
+            self.logplot.set_ylim(window[1], window[0])
+            self._ylim_set = True
+
+        remaining = self.logplot.build(self.count)
+        if remaining == 0:
+            self.logplot.auto_build = True
+            self.finished = True
+            self.stop()
+        self.figure.canvas.draw_idle()
+
+
+class FollowViewer:
+    """Shows a log plot of a LAS file that is still being written.
+
+    The file is polled from a timer of the figure canvas with a
+    `las2.TailReader`, which only parses the appended rows. The new samples
+    are pushed into the existing artists with `LogPlot.update`. While the
+    bottom of the view is at the bottom of the data, the view is extended to
+    follow the new samples.
+
+    Parameters
+    ----------
+    lasfile : string
+        The path of the LAS file.
+    template : dict
+        A parsed template, as returned by `logplot_template.parse`.
+    figure : matplotlib.figure.Figure
+        The figure of the viewer, attached to an interactive canvas.
+    interval : int, optional
+        Milliseconds between two polls. Default is 1000.
+    """
+
+    def __init__(self, lasfile, template, figure, interval=1000):
+        self.lasfile = lasfile
+        self.template = template
+        self.figure = figure
+        self.interval = interval
+        self.reader = None
+        self.dataprovider = None
+        self.logplot = None
+        self.timer = None
+        self._bottom = None
+
+    def start(self):
+        self.reader = las2.TailReader(self.lasfile)
+        if not self.reader.update():
+            msg = f"The header of {self.lasfile} is incomplete"
+            raise ValueError(msg)
+        self._draw()
+
+        self.timer = self.figure.canvas.new_timer(interval=self.interval)
+        self.timer.add_callback(self.update)
+        self.timer.start()
+
+    def stop(self):
+        if self.timer is not None:
+            self.timer.stop()
+            self.timer = None
+
+    def _draw(self):
+        self.figure.clear()
+        self.dataprovider = DataProvider(self.reader.lasfile)
+        self.logplot = LogPlot(self.dataprovider, self.template, self.figure)
+        self.logplot.draw()
+        _, self._bottom = self.dataprovider.get_depth_range()
+
+    def update(self, final=False):
+        """Reads the appended rows and updates the plot.
+
+        Parameters
+        ----------
+        final : bool, optional
+            Whether the LAS file is complete, see `las2.TailReader.update`.
+
+        Returns
+        -------
+        bool
+            Whether the plot changed.
+        """
+        lasfile = self.reader.lasfile
+        if not self.reader.update(final):
+            return False
+
+        if self.reader.lasfile is not lasfile:
+            # The file was replaced, nothing can be reused
+            self._draw()
+            self.figure.canvas.draw_idle()
+            return True
+
+        if not self.logplot.update():
+            return False
+
+        _, bottom = self.dataprovider.get_depth_range()
+        ymax, ymin = self.logplot.get_ylim()
+        if self.logplot.get_depth_window() is None and ymax >= self._bottom:
+            self.logplot.set_ylim(bottom, ymin)
+        self._bottom = bottom
+
+        self.figure.canvas.draw_idle()
+        return True
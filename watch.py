@@ -0,0 +1,180 @@
+import json
+import os
+
+import las2
+from data_provider import DataProvider
+from logplot import LogPlot
+from logplot_template import load as load_template
+
+
+def _get_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def diff_templates(old, new):
+    """Compares two parsed templates.
+
+    Returns
+    -------
+    tuple or None
+        The indexes of the tracks that differ and whether the header differs,
+        or None if the whole plot must be rebuilt (the figure, the depth
+        window or the number of tracks changed).
+    """
+    if len(old["tracks"]) != len(new["tracks"]):
+        return None
+    for key in set(old) | set(new):
+        if key in ("tracks", "header"):
+            continue
+        if old.get(key, None) != new.get(key, None):
+            return None
+
+    tracks = [i for i, (a, b) in enumerate(zip(old["tracks"], new["tracks"])) if a != b]
+    # The header title defaults to the well of the first track
+    header = old.get("header", None) != new.get("header", None) or 0 in tracks
+
+    return tracks, header
+
+
+class Watcher:
+    """Keeps a log plot up to date with its configuration, template and LAS
+    files.
+
+    The files are polled from a timer of the figure canvas. Only what changed
+    is parsed again: a template edit reuses the LAS data in memory and only
+    the tracks whose parsed template differs are rebuilt.
+
+    Parameters
+    ----------
+    configpath : string
+        Path of the configuration file, as read by `main.py`.
+    figure : matplotlib.figure.Figure
+        The figure of the plot, attached to an interactive canvas.
+    interval : int, optional
+        Milliseconds between two polls. Default is 500.
+    lazy : bool, optional
+        Passed to `LogPlot`. Default is True.
+    """
+
+    def __init__(self, configpath, figure, interval=500, lazy=True):
+        self.configpath = configpath
+        self.figure = figure
+        self.interval = interval
+        self.lazy = lazy
+        self.lasfilepath = None
+        self.templatepath = None
+        self.lasfile = None
+        self.template = None
+        self.logplot = None
+        self.timer = None
+        # Stamps of the files the plot was last built from. They are only
+        # updated once the plot is, so a failed update is retried.
+        self._stamps = {}
+        self._failed = None
+        self._redraw_all = False
+
+    def start(self):
+        stamps = {}
+        self._changed(self.configpath, stamps)
+        self.lasfilepath, self.templatepath = self._read_config()
+        self._changed(self.lasfilepath, stamps)
+        self._changed(self.templatepath, stamps)
+        self.lasfile = las2.read(self.lasfilepath)
+        self.template = load_template(self.templatepath)
+        self._draw()
+        self._stamps = stamps
+
+        self.timer = self.figure.canvas.new_timer(interval=self.interval)
+        self.timer.add_callback(self.check)
+        self.timer.start()
+
+    def stop(self):
+        if self.timer is not None:
+            self.timer.stop()
+            self.timer = None
+
+    def _changed(self, path, stamps):
+        # Whether the file changed since the plot was built. Its current
+        # stamp is stored in `stamps`, taken before the file is read.
+        stamp = _get_stamp(path)
+        stamps[path] = stamp
+        return self._stamps.get(path, None) != stamp
+
+    def _warn(self, error, stamps):
+        # The update is retried on each poll, only warn once per file state
+        if stamps != self._failed:
+            print(f"WARNING: {error}")
+            self._failed = stamps
+
+    def _read_config(self):
+        with open(self.configpath, "r") as f:
+            config = json.load(f)
+        return config["lasfile"]["path"], config["template"]["path"]
+
+    def _draw(self):
+        self.figure.clear()
+        self.logplot = LogPlot(
+            DataProvider(self.lasfile), self.template, self.figure, lazy=self.lazy
+        )
+        self.logplot.draw()
+
+    def check(self):
+        """Polls the files once and updates the plot.
+
+        Returns
+        -------
+        bool
+            Whether the plot was updated.
+        """
+        stamps = {}
+        lasfilepath, templatepath = self.lasfilepath, self.templatepath
+        lasfile, template = self.lasfile, self.template
+        try:
+            if self._changed(self.configpath, stamps):
+                lasfilepath, templatepath = self._read_config()
+            if self._changed(lasfilepath, stamps) or lasfilepath != self.lasfilepath:
+                lasfile = las2.read(lasfilepath)
+            if self._changed(templatepath, stamps) or templatepath != self.templatepath:
+                template = load_template(templatepath)
+        except Exception as e:
+            # Files are often caught half written, retry on the next poll
+            self._warn(e, stamps)
+            return False
+
+        lasfile_changed = lasfile is not self.lasfile
+        template_changed = template is not self.template
+        if not (lasfile_changed or template_changed or self._redraw_all):
+            # e.g. the configuration was saved without changes
+            self._stamps.update(stamps)
+            return False
+
+        diff = None
+        if template_changed and not lasfile_changed and not self._redraw_all:
+            diff = diff_templates(self.template, template)
+
+        previous = self.lasfilepath, self.templatepath, self.lasfile, self.template
+        self.lasfilepath, self.templatepath = lasfilepath, templatepath
+        self.lasfile, self.template = lasfile, template
+        try:
+            if diff is None:
+                self._draw()
+            else:
+                tracks, header = diff
+                self.logplot.template = self.template
+                self.logplot.redraw(tracks, header)
+        except Exception as e:
+            # The plot may be half updated, rebuild it all on the next poll
+            self.lasfilepath, self.templatepath, self.lasfile, self.template = previous
+            self._redraw_all = True
+            self._warn(e, stamps)
+            return False
+
+        self._stamps.update(stamps)
+        self._failed = None
+        self._redraw_all = False
+        self.figure.canvas.draw_idle()
+        return True
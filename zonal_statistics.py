@@ -0,0 +1,194 @@
+import numpy as np
+
+from depth_index import DepthIndex
+
+
+def zones_from_markers(markers, family=None):
+    """Builds zones from markers (e.g. formation tops), each zone going from
+    a marker down to the next one.
+
+    Parameters
+    ----------
+    markers : dict
+        The 'name' and 'depth' columns of the markers, sorted by depth, as
+        returned by `markers.read` or by a 'marker_families' DataProvider
+        query.
+    family : string, optional
+        Only use the markers of this family.
+
+    Returns
+    -------
+    dict
+        The 'name', 'top' and 'bottom' columns of the zones, as numpy arrays.
+    """
+    name = markers["name"]
+    depth = np.asarray(markers["depth"], dtype=float)
+    if family is not None:
+        mask = markers["family"] == family
+        name = name[mask]
+        depth = depth[mask]
+    return {"name": name[:-1], "top": depth[:-1], "bottom": depth[1:]}
+
+
+def _get_sample_thickness(depth):
+    # Each sample covers the depth up to half way to its neighbours
+    if len(depth) < 2:
+        return np.zeros(len(depth))
+    edges = np.concatenate((depth[:1], (depth[1:] + depth[:-1]) / 2.0, depth[-1:]))
+    return np.diff(edges)
+
+
+def _segment_sum(x, bounds):
+    # Sum of x over each [start, stop) in bounds, an increasing array of
+    # interleaved starts and stops
+    padded = np.concatenate((x, np.zeros(1, dtype=x.dtype)))
+    sums = np.add.reduceat(padded, bounds)[0::2]
+    sums[bounds[0::2] == bounds[1::2]] = 0
+    return sums
+
+
+def get_zonal_statistics(dataprovider, zones, data, percentiles=(10, 50, 90), cutoff=None):
+    """Computes statistics of well logs inside depth zones.
+
+    Zones are mapped to samples with a single binary search over the depth,
+    after which each zone is a contiguous segment of samples. Sums are then
+    computed for all zones at once with `np.add.reduceat`, and percentiles
+    from one sort of all the samples by zone and value.
+
+    Parameters
+    ----------
+    dataprovider : DataProvider
+        The data of the well.
+    zones : dict
+        The 'name', 'top' and 'bottom' columns of the zones. Zones must not
+        overlap.
+    data : dict
+        DataProvider query with the depth as 'y' and one key for each curve,
+        e.g. {'GR': {'mnemonic': 'GR'}, 'y': {'mnemonic': 'DEPTH'}}.
+    percentiles : list of float, optional
+        Percentiles computed for each curve, in [0, 100]. Default is
+        (10, 50, 90).
+    cutoff : dict, optional
+        Computes the net thickness of each zone, where the curve under the
+        'curve' key (one of the keys of `data`) is below 'max' and/or above
+        'min'. For example, {'curve': 'VSH', 'max': 0.35}.
+
+    Returns
+    -------
+    dict
+        The columns of the zones, their 'gross' thickness, the 'net'
+        thickness and 'net_to_gross' if `cutoff` is given and, for each curve,
+        a dict with 'count', 'mean', 'min', 'max' and 'p<percentile>' arrays
+        (e.g. 'p10'), NaN for zones without valid samples.
+
+    Examples
+    --------
+    >>> zones = zones_from_markers(dataprovider.get_data(
+    ...     {"source": "marker_families", "family": "tops"}
+    ... ))
+    >>> stats = get_zonal_statistics(
+    ...     dataprovider,
+    ...     zones,
+    ...     {"GR": {"mnemonic": "GR"}, "VSH": {"mnemonic": "VSH"},
+    ...      "y": {"mnemonic": "DEPTH"}},
+    ...     cutoff={"curve": "VSH", "max": 0.35},
+    ... )
+    >>> stats["GR"]["p50"]
+    array([ 65.1, 80.3, ...])
+    """
+    data = dict(data)
+    data.setdefault("source", "well_log")
+    d = dataprovider.get_data(data)
+    depth = d.pop("y")["data"]
+    curves = {k: v["data"] for k, v in d.items()}
+
+    index = DepthIndex(depth)
+    if not index.monotonic:
+        msg = "The depth is not monotonic"
+        raise ValueError(msg)
+    if not index.increasing:
+        depth = depth[::-1]
+        curves = {k: v[::-1] for k, v in curves.items()}
+
+    tops = np.asarray(zones["top"], dtype=float)
+    bottoms = np.asarray(zones["bottom"], dtype=float)
+    nzones = len(tops)
+    if nzones and np.any(tops[1:] < bottoms[:-1]):
+        msg = "Zones must be sorted by depth and must not overlap"
+        raise ValueError(msg)
+
+    # Zone k is made of the samples bounds[2 * k] to bounds[2 * k + 1]
+    boundaries = np.empty(2 * nzones)
+    boundaries[0::2] = tops
+    boundaries[1::2] = bottoms
+    bounds = np.searchsorted(depth, boundaries, side="left")
+    starts = bounds[0::2]
+    stops = bounds[1::2]
+
+    stats = {
+        "name": zones["name"],
+        "top": tops,
+        "bottom": bottoms,
+        "gross": bottoms - tops,
+    }
+    if nzones == 0:
+        return stats
+
+    # Indexes of the samples of all zones, one zone after the other, and the
+    # zone of each of them
+    sizes = stops - starts
+    segment_offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    samples = np.repeat(starts - segment_offsets, sizes) + np.arange(sizes.sum())
+    sample_zones = np.repeat(np.arange(nzones), sizes)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for key, values in curves.items():
+            valid = ~np.isnan(values)
+            count = _segment_sum(valid.astype(int), bounds)
+            total = _segment_sum(np.where(valid, values, 0.0), bounds)
+
+            curve_stats = {"count": count, "mean": total / count}
+
+            # Sort the valid samples of every zone at once, by zone then value
+            zone_values = values[samples]
+            in_zone = ~np.isnan(zone_values)
+            order = np.lexsort((zone_values[in_zone], sample_zones[in_zone]))
+            sorted_values = zone_values[in_zone][order]
+            offsets = np.concatenate(([0], np.cumsum(count)[:-1]))
+
+            nonempty = count > 0
+            first = np.full(nzones, np.nan)
+            last = np.full(nzones, np.nan)
+            first[nonempty] = sorted_values[offsets[nonempty]]
+            last[nonempty] = sorted_values[offsets[nonempty] + count[nonempty] - 1]
+            curve_stats["min"] = first
+            curve_stats["max"] = last
+
+            for q in percentiles:
+                # Same as np.percentile with the default linear interpolation
+                position = (q / 100.0) * (count[nonempty] - 1)
+                lo = np.floor(position).astype(int)
+                hi = np.minimum(lo + 1, count[nonempty] - 1)
+                fraction = position - lo
+                base = offsets[nonempty]
+                result = np.full(nzones, np.nan)
+                result[nonempty] = (
+                    sorted_values[base + lo] * (1.0 - fraction)
+                    + sorted_values[base + hi] * fraction
+                )
+                curve_stats[f"p{q:g}"] = result
+
+            stats[key] = curve_stats
+
+        if cutoff is not None:
+            values = curves[cutoff["curve"]]
+            passes = ~np.isnan(values)
+            if "max" in cutoff:
+                passes &= values < cutoff["max"]
+            if "min" in cutoff:
+                passes &= values > cutoff["min"]
+            thickness = _get_sample_thickness(depth)
+            stats["net"] = _segment_sum(np.where(passes, thickness, 0.0), bounds)
+            stats["net_to_gross"] = stats["net"] / stats["gross"]
+
+    return stats